@@ -0,0 +1,418 @@
+"""
+논문 그림·표 의존성 그래프 빌드
+산출물마다 입력 데이터·상위 산출물·코드(함수 단위)를 선언하고, 내용 해시가 바뀐 산출물만 다시 생성
+서로 독립인 산출물은 프로세스 풀에서 병렬 실행 (예: 이동 창 코드 변경 → fig3_rolling_window.pdf만 재생성)
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import warnings
+warnings.filterwarnings('ignore')
+
+DATA_DIR = 'us_market/paper/Size_Reversal/back_data'
+FIGURE_DIR = 'us_market/paper/Size_Reversal/figures'
+STATE_PATH = f'{DATA_DIR}/.build_state.json'
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+MAX_JOBS = 4
+
+TABLE0 = f'{DATA_DIR}/table0_top200_stocks.csv'
+RETURNS = f'{DATA_DIR}/data1_daily_returns.csv'
+FF_FACTORS = f'{DATA_DIR}/data2_fama_french_factors.csv'
+MARKET_CAP = f'{DATA_DIR}/data3_market_cap.csv'
+LEGACY_BETAS = f'{DATA_DIR}/table1_stage1_betas.csv'
+MEGA_FACTORS = f'{DATA_DIR}/mega_factors.csv'
+SMB_SPECS = ['SMB_50', 'SMB_30', 'SMB_Q5Q1']
+STAGE_DIR = f'{DATA_DIR}/fama_macbeth'
+
+# 공통 Fama-MacBeth 코드 (파일 단위)
+SOLVER_CODE = ['fama_macbeth_core.py', 'fama_macbeth_results.py', 'least_squares.py', 'precision.py', 'panel_validity.py',
+               'gamma_history.py']
+# 모든 산출물 공통: 입력 로드 (단계 실행 함수 자체는 artifact_signature가 'run'에서 추가)
+BUILD_CODE = ['build_artifacts.py:_load_inputs']
+
+
+# ---------------------------------------------------------------------------
+# 단계 실행 함수 (프로세스 풀에서 호출되므로 모듈 최상위 함수)
+# ---------------------------------------------------------------------------
+
+def _load_inputs():
+    import pandas as pd
+    from enhanced_mega_cap_analysis import load_and_prepare_data
+
+    stocks_df, returns_df, ff_df = load_and_prepare_data()
+    mega_factors_df = None
+    if os.path.exists(MEGA_FACTORS):
+        mega_factors_df = pd.read_csv(MEGA_FACTORS, index_col=0, parse_dates=True)
+    return stocks_df, returns_df, ff_df, mega_factors_df
+
+
+def build_mega_factors():
+    """메가캡 순위 구간 포트폴리오·SMB 팩터 (mega_factors.csv)"""
+    from enhanced_mega_cap_analysis import create_enhanced_mega_factors
+    from universe_index import load_universe
+
+    stocks_df, returns_df, ff_df, _ = _load_inputs()
+    mega_factors_df, _ = create_enhanced_mega_factors(stocks_df, returns_df,
+                                                      universe=load_universe(stocks_df, returns_df))
+    mega_factors_df.to_csv(MEGA_FACTORS)
+
+
+def build_portfolio_returns():
+    """주간/월간/연간 복리 포트폴리오 수익률"""
+    from portfolio_aggregation import aggregate_and_save
+
+    _, _, ff_df, mega_factors_df = _load_inputs()
+    aggregate_and_save(mega_factors_df, ff_df)
+
+
+def build_fama_macbeth():
+    """SMB 사양별 Fama-MacBeth (Stage 2 감마, 결과 요약 테이블)"""
+    from enhanced_mega_cap_analysis import enhanced_fama_macbeth, create_results_summary_table
+    from stage_artifacts import save_stage_artifacts
+    from panel_validity import build_validity_mask
+
+    _, returns_df, ff_df, mega_factors_df = _load_inputs()
+    results = enhanced_fama_macbeth(returns_df, ff_df, mega_factors_df, None, build_validity_mask(returns_df))
+    save_stage_artifacts(results)
+    create_results_summary_table(results)
+
+
+def render_figure(name):
+    """그림 하나 생성 (create_paper_figures.py의 해당 함수 호출)"""
+    import pandas as pd
+    import create_paper_figures as figures
+    from portfolio_aggregation import load_portfolio_returns
+
+    if name in PREMIUM_FIGURES:
+        getattr(figures, PREMIUM_FIGURES[name])(figures.load_stage2_gammas())
+        return
+
+    stocks_df, _, ff_df, mega_factors_df = _load_inputs()
+    if name == 'fig_enhanced_portfolio_analysis':
+        figures.figure1_enhanced_portfolio_analysis(mega_factors_df, stocks_df)
+    elif name == 'fig_enhanced_timeseries_analysis':
+        figures.figure3_timeseries_analysis(mega_factors_df, ff_df, load_portfolio_returns())
+    else:
+        old_betas = pd.read_csv(LEGACY_BETAS, index_col=0)
+        enhanced_results = pd.read_csv(f'{DATA_DIR}/enhanced_results_summary.csv')
+        if name == 'fig_enhanced_beta_analysis':
+            figures.figure2_beta_comparison(old_betas, enhanced_results, figures.load_stage_results())
+        else:
+            figures.create_additional_figures(old_betas, enhanced_results)
+
+
+# ---------------------------------------------------------------------------
+# 선언적 산출물 그래프
+# inputs: 데이터 파일 (앞에 '?'면 선택 입력), code: '파일.py' 또는 '파일.py:함수'
+# ---------------------------------------------------------------------------
+
+PREMIUM_FIGURES = {
+    'fig2_premium_timeseries': 'figure_premium_timeseries',
+    'fig3_rolling_window': 'figure_rolling_window',
+    'fig4_cumulative_returns': 'figure_cumulative_returns',
+    'fig5_correlation_matrix': 'figure_correlation_matrix',
+    'fig6_premium_distributions': 'figure_premium_distributions',
+    'fig7_annual_smb_evolution': 'figure_annual_smb_evolution',
+    'fig8_subperiod_comparison': 'figure_subperiod_comparison'
+}
+
+
+def stage_meta(smb_factor, stage):
+    """Stage 1/2 열 단위 산출물의 meta.json (열별 내용 해시 포함 → 데이터 변경 판단에 충분)"""
+    return f'{STAGE_DIR}/{smb_factor}/{stage}/meta.json'
+
+
+LINE_FIGURES = ['fig2_premium_timeseries', 'fig3_rolling_window', 'fig4_cumulative_returns']
+SUBPERIOD_FIGURE_CODE = ['create_paper_figures.py:subperiod_bar_chart', 'create_paper_figures.py:significance_stars',
+                         'create_paper_figures.py:covid_split',
+                         'subperiod_analysis.py']
+
+ARTIFACTS = {
+    'mega_factors': {
+        'outputs': [MEGA_FACTORS],
+        'inputs': [TABLE0, RETURNS, FF_FACTORS, '?' + MARKET_CAP],
+        'code': ['enhanced_mega_cap_analysis.py:load_and_prepare_data',
+                 'enhanced_mega_cap_analysis.py:create_enhanced_mega_factors',
+                 'universe_index.py', 'panel_validity.py', 'precision.py', 'trading_calendar.py'],
+        'run': (build_mega_factors,)
+    },
+    'portfolio_returns': {
+        'outputs': [f'{DATA_DIR}/portfolio_returns{suffix}.csv' for suffix in ['', '_weekly', '_annual']],
+        'inputs': [MEGA_FACTORS, FF_FACTORS],
+        'code': ['portfolio_aggregation.py', 'trading_calendar.py'],
+        'run': (build_portfolio_returns,)
+    },
+    'fama_macbeth': {
+        'outputs': [stage_meta(spec, stage) for spec in SMB_SPECS for stage in ['stage1', 'stage2']]
+                   + [f'{DATA_DIR}/enhanced_results_summary.csv'],
+        'inputs': [RETURNS, FF_FACTORS, MEGA_FACTORS],
+        'code': SOLVER_CODE + ['enhanced_mega_cap_analysis.py:enhanced_fama_macbeth',
+                               'enhanced_mega_cap_analysis.py:create_results_summary_table',
+                               'stage_artifacts.py', 'trading_calendar.py'],
+        'run': (build_fama_macbeth,)
+    },
+    'fig_enhanced_portfolio_analysis': {
+        'outputs': [f'{FIGURE_DIR}/fig_enhanced_portfolio_analysis.pdf', f'{FIGURE_DIR}/fig_enhanced_portfolio_analysis.png'],
+        'inputs': [MEGA_FACTORS, TABLE0],
+        'code': ['create_paper_figures.py:figure1_enhanced_portfolio_analysis', 'plot_decimation.py'],
+        'run': (render_figure, 'fig_enhanced_portfolio_analysis')
+    },
+    'fig_enhanced_beta_analysis': {
+        'outputs': [f'{FIGURE_DIR}/fig_enhanced_beta_analysis.pdf', f'{FIGURE_DIR}/fig_enhanced_beta_analysis.png'],
+        'inputs': [LEGACY_BETAS, f'{DATA_DIR}/enhanced_results_summary.csv', stage_meta('SMB_50', 'stage1'),
+                   stage_meta('SMB_50', 'stage2'), stage_meta('SMB_30', 'stage2')],
+        'code': ['create_paper_figures.py:figure2_beta_comparison', 'create_paper_figures.py:load_stage_results',
+                 'stage_artifacts.py'],
+        'run': (render_figure, 'fig_enhanced_beta_analysis')
+    },
+    'fig_enhanced_timeseries_analysis': {
+        'outputs': [f'{FIGURE_DIR}/fig_enhanced_timeseries_analysis.pdf', f'{FIGURE_DIR}/fig_enhanced_timeseries_analysis.png'],
+        'inputs': [MEGA_FACTORS, FF_FACTORS, f'{DATA_DIR}/portfolio_returns.csv'],
+        'code': ['create_paper_figures.py:figure3_timeseries_analysis', 'plot_decimation.py', 'trading_calendar.py',
+                 'subperiod_analysis.py', 'regime_analysis.py:regime_means', 'regime_analysis.py:regime_masks', 'regime_analysis.py:regime_moments',
+                 'portfolio_aggregation.py:load_portfolio_returns'],
+        'run': (render_figure, 'fig_enhanced_timeseries_analysis')
+    },
+    'fig1_beta_distributions': {
+        'outputs': [f'{FIGURE_DIR}/fig1_beta_distributions.pdf'],
+        'inputs': [LEGACY_BETAS, f'{DATA_DIR}/enhanced_results_summary.csv'],
+        'code': ['create_paper_figures.py:create_additional_figures'],
+        'run': (render_figure, 'fig1_beta_distributions')
+    },
+    **{
+        name: {
+            'outputs': [f'{FIGURE_DIR}/{name}.pdf'],
+            'inputs': [stage_meta('SMB_50', 'stage2')],
+            'code': [f'create_paper_figures.py:{function}', 'create_paper_figures.py:load_stage2_gammas',
+                     'stage_artifacts.py']
+                    + (SUBPERIOD_FIGURE_CODE if name in ('fig7_annual_smb_evolution', 'fig8_subperiod_comparison')
+                       else [])
+                    + (['plot_decimation.py'] if name in LINE_FIGURES else []),
+            'run': (render_figure, name)
+        }
+        for name, function in PREMIUM_FIGURES.items()
+    }
+}
+
+
+# ---------------------------------------------------------------------------
+# 해시·상태
+# ---------------------------------------------------------------------------
+
+def _sha(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def file_hash(path, cache):
+    """파일 내용 해시 (mtime·크기가 같으면 캐시 재사용), 없으면 None"""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    key = [stat.st_mtime_ns, stat.st_size]
+    cached = cache.get(path)
+    if cached and cached[:2] == key:
+        return cached[2]
+    with open(path, 'rb') as f:
+        digest = _sha(f.read())
+    cache[path] = key + [digest]
+    return digest
+
+
+def module_segments(path):
+    """모듈 최상위 문장 소스 [(이름 또는 None, 소스)] (함수·클래스는 이름, 그 외 문장은 None)"""
+    with open(path) as f:
+        lines = f.read().splitlines()
+    segments = []
+    for node in ast.parse('\n'.join(lines)).body:
+        source = '\n'.join(lines[node.lineno - 1:node.end_lineno])
+        named = isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        segments.append((node.name if named else None, source))
+    return segments
+
+
+def code_hash(spec, cache, parsed=None):
+    """
+    코드 의존성 해시: '파일.py'는 파일 전체,
+    '파일.py:함수'는 해당 함수 소스 + 모듈 최상위 문장 (import·전역 설정, 함수·클래스 정의 제외)
+    parsed: 한 빌드 안에서 파일별 파싱 결과 재사용
+    """
+    path, _, name = spec.partition(':')
+    path = os.path.join(CODE_DIR, path)
+    if not name:
+        return file_hash(path, cache)
+    if parsed is None:
+        parsed = {}
+    if path not in parsed:
+        parsed[path] = module_segments(path)
+    preamble = [source for node_name, source in parsed[path] if node_name is None]
+    body = [source for node_name, source in parsed[path] if node_name == name]
+    if not body:
+        raise KeyError(f'{spec}: 함수 없음')
+    return _sha('\n'.join(preamble + body).encode())
+
+
+def artifact_code(artifact):
+    """산출물의 코드 의존성: 선언한 코드 + 이 모듈의 단계 실행 함수·입력 로드"""
+    return artifact['code'] + [f"build_artifacts.py:{artifact['run'][0].__name__}"] + BUILD_CODE
+
+
+def artifact_signature(name, cache, parsed=None):
+    """산출물 입력 서명 {구성 요소: 해시} (입력 파일 내용 + 코드 소스)"""
+    artifact = ARTIFACTS[name]
+    signature = {}
+    for path in artifact['inputs']:
+        path = path.lstrip('?')
+        signature[f'input:{path}'] = file_hash(path, cache)
+    for spec in artifact_code(artifact):
+        signature[f'code:{spec}'] = code_hash(spec, cache, parsed)
+    return signature
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {'files': {}, 'artifacts': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_PATH):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+# ---------------------------------------------------------------------------
+# 그래프
+# ---------------------------------------------------------------------------
+
+def dependency_graph(artifacts=ARTIFACTS):
+    """산출물 → 상위 산출물 집합 (입력 파일이 다른 산출물의 출력이면 의존)"""
+    producers = {path: name for name, a in artifacts.items() for path in a['outputs']}
+    return {
+        name: {producers[p.lstrip('?')] for p in a['inputs'] if p.lstrip('?') in producers} - {name}
+        for name, a in artifacts.items()
+    }
+
+
+def select_targets(targets, graph):
+    """요청 산출물과 그 상위 산출물 전체 (targets가 없으면 전부)"""
+    if not targets:
+        return set(graph)
+    selected, stack = set(), list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in graph:
+            raise KeyError(f'알 수 없는 산출물: {name}')
+        if name not in selected:
+            selected.add(name)
+            stack.extend(graph[name])
+    return selected
+
+
+def stale_reasons(name, signature, state):
+    """재생성 사유 목록 (빈 목록이면 최신)"""
+    missing = [p for p in ARTIFACTS[name]['outputs'] if not os.path.exists(p)]
+    if missing:
+        return [f'출력 없음: {os.path.basename(missing[0])}']
+    previous = state['artifacts'].get(name)
+    if previous is None:
+        return ['빌드 기록 없음']
+    return [key for key in signature if previous.get(key) != signature[key]] \
+        + [key for key in previous if key not in signature]
+
+
+def _run(task):
+    function, *args = task
+    function(*args)
+
+
+def build(targets=None, jobs=MAX_JOBS, force=False, dry_run=False):
+    """
+    오래된 산출물만 의존성 순서대로 생성, 준비된 산출물은 병렬 실행
+    상위 산출물이 다시 만들어져도 출력 내용이 같으면 하위는 건너뜀 (내용 해시 비교)
+    반환: {산출물: 'built' | 'fresh' | 'failed' | 'skipped' | 'stale'}
+    """
+    graph = dependency_graph()
+    selected = select_targets(targets, graph)
+    state = load_state()
+    outcome = {}
+    pending = {name: graph[name] & selected for name in selected}
+
+    def ready():
+        return [n for n, deps in pending.items() if all(outcome.get(d) in ('built', 'fresh') for d in deps)]
+
+    def blocked():
+        return [n for n, deps in pending.items() if any(outcome.get(d) in ('failed', 'skipped', 'stale') for d in deps)]
+
+    running, signatures, parsed = {}, {}, {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for name in blocked():
+                outcome[name] = 'stale' if dry_run else 'skipped'
+                del pending[name]
+            for name in ready():
+                del pending[name]
+                signatures[name] = artifact_signature(name, state['files'], parsed)
+                reasons = ['--force'] if force else stale_reasons(name, signatures[name], state)
+                if not reasons:
+                    outcome[name] = 'fresh'
+                    continue
+                print(f"🔧 {name}: {', '.join(reasons[:3])}{' ...' if len(reasons) > 3 else ''}")
+                if dry_run:
+                    outcome[name] = 'stale'
+                    continue
+                running[pool.submit(_run, ARTIFACTS[name]['run'])] = (name, time.time())
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, start = running.pop(future)
+                try:
+                    future.result()
+                    outcome[name] = 'built'
+                    state['artifacts'][name] = signatures[name]
+                    print(f"   ✅ {name} ({time.time() - start:.1f}초)")
+                except Exception as error:
+                    outcome[name] = 'failed'
+                    print(f"   ⚠️ {name} 실패: {type(error).__name__}: {error}")
+            save_state(state)
+
+    return outcome
+
+
+def main():
+    """명령행: python build_artifacts.py [산출물 ...] [--jobs N] [--force] [--dry-run]"""
+    parser = argparse.ArgumentParser(description='논문 그림·표 증분 빌드')
+    parser.add_argument('targets', nargs='*', help='생성할 산출물 (기본: 전체)')
+    parser.add_argument('--jobs', type=int, default=MAX_JOBS)
+    parser.add_argument('--force', action='store_true', help='해시와 무관하게 모두 재생성')
+    parser.add_argument('--dry-run', action='store_true', help='재생성 대상만 출력')
+    parser.add_argument('--list', action='store_true', help='산출물 그래프 출력')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("논문 산출물 빌드")
+    print("=" * 60)
+
+    if args.list:
+        for name, deps in dependency_graph().items():
+            print(f"   - {name} ← {', '.join(sorted(deps)) or '(데이터)'}")
+        return None
+
+    start = time.time()
+    outcome = build(args.targets, args.jobs, args.force, args.dry_run)
+    counts = {status: sum(v == status for v in outcome.values()) for status in dict.fromkeys(outcome.values())}
+    print(f"\n📊 빌드 결과 ({time.time() - start:.1f}초): "
+          + ', '.join(f'{status} {n}개' for status, n in counts.items()))
+    return outcome
+
+
+if __name__ == "__main__":
+    outcome = main()
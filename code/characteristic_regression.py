@@ -0,0 +1,184 @@
+"""
+특성 기반 Fama-MacBeth (시가총액 직접 회귀)
+날짜마다 수익률을 전일 log 시가총액 등 시점 기준(point-in-time) 특성에 횡단면 회귀
+Stage 1 베타와 함께 또는 베타 대신 사용, 특성 패널(날짜 x 티커)은 날짜 블록 단위로 스트리밍
+"""
+
+import os
+
+import pandas as pd
+import numpy as np
+import warnings
+warnings.filterwarnings('ignore')
+
+from fama_macbeth_core import (
+    run_fama_macbeth, stage2_gammas_panel, stage3_summary, BETA_COLUMNS, STAGE2_DATE_BLOCK
+)
+from least_squares import drop_report, summarize_drops
+from gamma_history import gamma_accumulator, accumulate, accumulator_frame
+from panel_validity import build_validity_mask, align_validity
+from trading_calendar import calendar_for, aligned, align_frame
+
+MARKET_CAP_PATH = 'us_market/paper/Size_Reversal/back_data/data3_market_cap.csv'
+CHARACTERISTIC_LAG = 1   # 특성은 전일 값 사용 (예측 회귀)
+
+
+def market_cap_panel(returns_df, path=MARKET_CAP_PATH):
+    """
+    시점 기준 시가총액 패널 (T x N, 십억 달러), path의 날짜 x 티커 파일을 수익률 패널에 맞춤
+    파일이 없으면 None (table0 현재 시가총액을 과거로 역산하면 미래 수익률이 들어가므로 대체하지 않음)
+    """
+    if not os.path.exists(path):
+        return None
+    panel = pd.read_csv(path, index_col=0)
+    panel.index = pd.to_datetime(panel.index)
+    return panel.reindex(index=returns_df.index, columns=returns_df.columns)
+
+
+def lagged(panel, lag=CHARACTERISTIC_LAG):
+    """날짜 축으로 lag만큼 밀린 패널 (앞쪽 lag개 날짜는 결측)"""
+    out = np.full(panel.shape, np.nan)
+    out[lag:] = panel[:len(panel) - lag]
+    return out
+
+
+def characteristic_design(characteristics, betas=None, beta_ok=None):
+    """
+    블록 단위 설계행렬 생성기 [상수, 베타..., 특성...]
+
+    characteristics: {이름: (T x N) 배열}, np.load(mmap_mode='r') 배열도 가능 (블록 행만 읽음)
+    betas: 선택, 시간 불변 Stage 1 베타 (N x F), beta_ok: (N,)
+    반환: Z(start, stop) → (Tb x N x K), z_ok(start, stop) → (Tb x N)
+    """
+    panels = list(characteristics.values())
+    N = panels[0].shape[1]
+    if betas is None:
+        betas = np.empty((N, 0))
+        beta_ok = np.ones(N, dtype=bool)
+
+    def Z(start, stop):
+        Tb = stop - start
+        return np.concatenate(
+            [np.ones((Tb, N, 1)), np.broadcast_to(betas, (Tb,) + betas.shape)]
+            + [np.asarray(panel[start:stop], dtype=float)[..., None] for panel in panels],
+            axis=2
+        )
+
+    def z_ok(start, stop):
+        ok = np.broadcast_to(beta_ok, (stop - start, N)).copy()
+        for panel in panels:
+            ok &= np.isfinite(panel[start:stop])
+        return ok
+
+    return Z, z_ok
+
+
+def run_characteristic_fama_macbeth(returns_aligned, characteristics, stage1_df=None, validity=None,
+                                    block_size=STAGE2_DATE_BLOCK):
+    """
+    특성(및 선택적 베타) 횡단면 회귀 → Stage 3 요약
+
+    characteristics: {이름: (T x N) 배열 또는 DataFrame}, returns_aligned와 같은 날짜·티커 순서
+    stage1_df: 선택, run_fama_macbeth의 Stage 1 결과 (주면 베타를 함께 회귀)
+    반환: 팩터별 결과 dict, Stage 2 DataFrame, 제외 내역
+    """
+    if validity is None:
+        validity = build_validity_mask(returns_aligned)
+    else:
+        validity = align_validity(validity, returns_aligned.index, returns_aligned.columns)
+
+    # DataFrame 특성은 한 번만 정렬해 배열로 (날짜별 슬라이싱 없음)
+    characteristics = {
+        name: panel.reindex(index=returns_aligned.index, columns=returns_aligned.columns).to_numpy(dtype=float)
+        if isinstance(panel, pd.DataFrame) else panel
+        for name, panel in characteristics.items()
+    }
+
+    gamma_columns = [f'gamma_{name}' for name in characteristics]
+    betas = beta_ok = None
+    if stage1_df is not None:
+        betas = stage1_df.reindex(returns_aligned.columns)[BETA_COLUMNS].to_numpy(dtype=float)
+        beta_ok = np.isfinite(betas).all(axis=1)
+        betas = np.where(beta_ok[:, None], betas, 0.0)
+        gamma_columns = [c.replace('beta', 'gamma') for c in BETA_COLUMNS] + gamma_columns
+
+    Z, z_ok = characteristic_design(characteristics, betas, beta_ok)
+    R = returns_aligned.to_numpy(dtype=float)
+    gammas, n_stocks, status = stage2_gammas_panel(R, validity['valid'], Z, z_ok, block_size=block_size)
+    solved = np.isfinite(gammas).all(axis=1)
+
+    acc = accumulate(gamma_accumulator(returns_aligned.index, ['gamma_0'] + gamma_columns), 0, gammas, n_stocks, status)
+    stage2_df = accumulator_frame(acc)
+
+    mean, std, t_stat, p_value, n = stage3_summary(gammas[solved][:, 1:], axis=0)
+    results = {}
+    for i, factor in enumerate(gamma_columns):
+        results[factor] = {
+            'daily_premium': mean[i],
+            'annual_premium': mean[i] * 252,
+            't_stat': t_stat[i],
+            'p_value': p_value[i],
+            'observations': int(n[i])
+        }
+
+    return results, stage2_df, drop_report(status, returns_aligned.index, 'stage2')
+
+
+def main():
+    """log 시가총액 특성 회귀 (단독 / SMB_50 베타와 함께) 실행 및 저장"""
+    from enhanced_mega_cap_analysis import load_and_prepare_data, create_enhanced_mega_factors
+    from results_store import connect_store, record_run, record_specification
+
+    stocks_df, returns_df, ff_df = load_and_prepare_data()
+    mega_factors_df, ticker_groups = create_enhanced_mega_factors(stocks_df, returns_df)
+    validity = build_validity_mask(returns_df)
+
+    print("\n" + "=" * 60)
+    print("특성 기반 Fama-MacBeth: 전일 log 시가총액")
+    print("=" * 60)
+
+    cap_panel = market_cap_panel(returns_df)
+    if cap_panel is None:
+        print(f"\n⚠️ 시점 기준 시가총액 패널 없음: {MARKET_CAP_PATH}")
+        return None
+
+    calendar = calendar_for(returns_df, ff_df, mega_factors_df)
+    returns_aligned, ff_aligned, mega_aligned = [
+        aligned(calendar, frame, i) for i, frame in enumerate((returns_df, ff_df, mega_factors_df))
+    ]
+
+    caps = align_frame(calendar, cap_panel)
+    characteristics = {'log_mcap': lagged(np.log(caps.to_numpy()))}
+    print(f"\n📊 시가총액 패널: {caps.shape[0]}일 x {caps.shape[1]}개 티커")
+
+    _, stage1_df, _, _ = run_fama_macbeth(returns_aligned, ff_aligned,
+                                          mega_aligned['SMB_50'], validity=validity)
+
+    specifications = {
+        'char_log_mcap': None,
+        'SMB_50+log_mcap': stage1_df
+    }
+    conn = connect_store()
+    run_id = record_run(conn, 'characteristic_regression.py', 'lagged log market cap')
+    rows = []
+    for name, betas in specifications.items():
+        results, stage2_df, drops = run_characteristic_fama_macbeth(
+            returns_aligned, characteristics, betas, validity
+        )
+        print(f"\n🔬 {name}:")
+        for factor, r in results.items():
+            print(f"   - {factor}: {r['annual_premium']:.2%} (t={r['t_stat']:.2f})")
+            rows.append({'specification': name, 'factor': factor, **r})
+        summarize_drops(drops)
+        record_specification(conn, run_id, name, results, stage2_df=stage2_df,
+                             params={'characteristics': list(characteristics), 'lag': CHARACTERISTIC_LAG})
+    conn.close()
+
+    summary = pd.DataFrame(rows)
+    summary.to_csv('us_market/paper/Size_Reversal/back_data/characteristic_premiums.csv', index=False)
+    print(f"\n   ✅ 저장: characteristic_premiums.csv (결과 저장소 run {run_id})")
+    return summary
+
+
+if __name__ == "__main__":
+    summary = main()
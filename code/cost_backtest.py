@@ -0,0 +1,220 @@
+"""
+거래비용 반영 SMB_mega 백테스트 (회전율 계산)
+리밸런싱 사이 보유 비중은 수익률로 표류(drift), 리밸런싱마다 목표 동일가중과의 차이로 회전율·비용 계산
+모든 포트폴리오와 리밸런싱 주기를 한 번의 날짜 블록 einsum으로 처리해 수십 개 주기를 한 번에 비교
+"""
+
+import time
+
+import pandas as pd
+import numpy as np
+import warnings
+warnings.filterwarnings('ignore')
+
+from fama_macbeth_core import stage3_summary
+from panel_validity import build_validity_mask, align_validity
+from sort_factors import rebalance_schedule
+from universe_index import band_memberships, holding_periods
+
+COST_BPS = 10.0     # 편도 거래비용 (bp, 거래 금액 대비)
+# 리밸런싱 주기: 문자열은 달력 주기 (기간 마지막 거래일), 정수는 k 거래일마다
+SCHEDULES = ['W', 'M', 'Q', 'Y', 1, 2, 3, 5, 10, 15, 21, 42, 63, 84, 126, 189, 252]
+SPREADS = {'SMB_50': ('Small_50', 'Big_50'), 'SMB_30': ('Bottom_30', 'Top_30'), 'SMB_Q5Q1': ('Q5', 'Q1')}
+BLOCK_CELLS = 2 ** 22   # 날짜 블록 크기 상한 (블록 날짜 x 티커 x 주기·포트폴리오 원소 수)
+
+
+def schedule_name(schedule):
+    """주기 표기 ('M' 또는 21 → '21d')"""
+    return f'{schedule}d' if isinstance(schedule, (int, np.integer)) else str(schedule)
+
+
+def schedule_ends(dates, schedule):
+    """리밸런싱 위치 (그날 종가에 리밸런싱, 다음 거래일부터 새 비중으로 보유)"""
+    if isinstance(schedule, (int, np.integer)):
+        return np.arange(schedule - 1, len(dates), schedule)
+    ends, _ = rebalance_schedule(dates, schedule)
+    return ends
+
+
+def cost_panel(cost_bps, dates, tickers):
+    """
+    편도 거래비용 (T x N, 비율)
+    cost_bps: 스칼라, 티커별 Series/배열 (N,), 또는 날짜 x 티커 DataFrame (bp)
+    """
+    if isinstance(cost_bps, pd.DataFrame):
+        costs = cost_bps.reindex(index=dates, columns=tickers).ffill().to_numpy(dtype=float)
+    elif isinstance(cost_bps, pd.Series):
+        costs = np.broadcast_to(cost_bps.reindex(tickers).to_numpy(dtype=float), (len(dates), len(tickers)))
+    else:
+        costs = np.broadcast_to(np.asarray(cost_bps, dtype=float), (len(dates), len(tickers)))
+    return np.nan_to_num(costs, nan=COST_BPS) / 1e4
+
+
+def target_weights(memberships, eligible):
+    """리밸런싱별 목표 동일가중 (R x N x P): 소속이면서 그날 관측된 종목"""
+    members = memberships & eligible[:, :, None]
+    counts = members.sum(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, members / counts, 0.0)
+
+
+def rebalance_turnover(weights, growth, costs):
+    """
+    리밸런싱별 회전율과 비용 (R x P)
+
+    weights: 목표 비중 (R x N x P), growth: 직전 리밸런싱 이후 종목별 누적 성장 (R x N)
+    첫 리밸런싱은 편입 매수 (회전율 = 투자 비중 합)
+    """
+    drifted = np.zeros_like(weights)
+    drifted[1:] = weights[:-1] * growth[1:, :, None]
+    total = drifted.sum(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        drifted = np.where(total > 0, drifted / total, 0.0)
+    trades = np.abs(weights - drifted)
+    return trades.sum(axis=1), (trades * costs[:, :, None]).sum(axis=1)
+
+
+def run_cost_backtest(returns_df, universe, bands, schedules=SCHEDULES, cost_bps=COST_BPS, validity=None,
+                      block_cells=BLOCK_CELLS):
+    """
+    순위 구간 포트폴리오 x 리밸런싱 주기 일괄 백테스트
+
+    universe: 유니버스 색인, bands: {포트폴리오: (시작 순위, 끝 순위)}
+    결측 수익률은 가격 변화 없음(0)으로 보유
+    반환: {'gross', 'net', 'turnover', 'cost': (S x T x P) 배열, 'schedules', 'portfolios', 'dates',
+           'rebalances': 주기별 리밸런싱 횟수}
+    turnover·cost는 새 비중 보유 첫날에 기록
+    """
+    if validity is None:
+        validity = build_validity_mask(returns_df)
+    else:
+        validity = align_validity(validity, returns_df.index, returns_df.columns)
+
+    dates, tickers = returns_df.index, returns_df.columns
+    valid = validity['valid']
+    R = np.where(valid, returns_df.to_numpy(dtype=float), 0.0)
+    T, N = R.shape
+    log_level = np.zeros((T + 1, N))
+    np.cumsum(np.log1p(R), axis=0, out=log_level[1:])     # log_level[t+1] = t일 종가 기준 누적
+
+    memberships, portfolios = band_memberships(universe, tickers, bands)
+    costs = cost_panel(cost_bps, dates, tickers)
+    S, P = len(schedules), len(portfolios)
+
+    # 주기별: 리밸런싱 목표 비중을 "리밸런싱 종가 대비 상대 가치" 기준으로 저장
+    # 보유 중 종목 가치 = w0 * exp(L[t-1] - L[f]) → 분자·분모를 exp(L[t-1])과의 행렬곱으로
+    scaled, holding = [], np.full((S, T), -1)
+    turnover = np.zeros((S, T, P))
+    cost = np.zeros((S, T, P))
+    rebalances = []
+    for s, schedule in enumerate(schedules):
+        ends = schedule_ends(dates, schedule)
+        ends = ends[ends < T - 1]
+        rows = holding_periods(universe, dates[ends], inclusive=True)
+        weights = target_weights(np.where(rows[:, None, None] >= 0, memberships[np.maximum(rows, 0)], False),
+                                 valid[ends])
+        growth = np.exp(log_level[ends + 1] - log_level[np.append(ends[0], ends[:-1]) + 1])
+        turnover[s, ends + 1], cost[s, ends + 1] = rebalance_turnover(weights, growth, costs[ends])
+
+        scaled.append(weights * np.exp(-log_level[ends + 1])[:, :, None])
+        holding[s] = np.searchsorted(ends, np.arange(T), side='left') - 1
+        rebalances.append(len(ends))
+
+    # 날짜 블록마다 모든 주기·포트폴리오를 한 번의 einsum으로
+    level = np.exp(log_level[:-1])          # t일 보유 시작 시점 (t-1일 종가) 누적
+    gross = np.full((S, T, P), np.nan)
+    block = max(1, block_cells // max(N * S * P, 1))
+    for start in range(0, T, block):
+        stop = min(start + block, T)
+        h = holding[:, start:stop]
+        w = np.stack([scaled[s][np.maximum(h[s], 0)] for s in range(S)])    # (S x Tb x N x P)
+        value = level[start:stop][None, :, :, None] * w
+        num = np.einsum('tn,stnp->stp', R[start:stop], value)
+        den = value.sum(axis=2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            gross[:, start:stop] = np.where((h[:, :, None] >= 0) & (den > 0), num / den, np.nan)
+
+    return {
+        'gross': gross,
+        'net': gross - cost,
+        'turnover': turnover,
+        'cost': cost,
+        'schedules': [schedule_name(x) for x in schedules],
+        'portfolios': portfolios,
+        'dates': dates,
+        'rebalances': np.array(rebalances)
+    }
+
+
+def backtest_summary(result, spreads=SPREADS):
+    """
+    주기 x 포트폴리오(및 롱숏 스프레드) 요약: 연 회전율, 총·순 연율 수익률, 순수익률 t-통계량, 연 비용
+    스프레드 비용 = 두 다리 비용 합 (롱·숏 모두 거래하므로 순 스프레드 = 총 스프레드 - 비용 합)
+    """
+    names = list(result['portfolios'])
+    gross, net, turnover, cost = result['gross'], result['net'], result['turnover'], result['cost']
+    for name, (long_leg, short_leg) in spreads.items():
+        if long_leg not in names or short_leg not in names:
+            continue
+        i, j = names.index(long_leg), names.index(short_leg)
+        spread_cost = cost[:, :, [i]] + cost[:, :, [j]]
+        spread = gross[:, :, [i]] - gross[:, :, [j]]
+        gross = np.concatenate([gross, spread], axis=2)
+        net = np.concatenate([net, spread - spread_cost], axis=2)
+        turnover = np.concatenate([turnover, turnover[:, :, [i]] + turnover[:, :, [j]]], axis=2)
+        cost = np.concatenate([cost, spread_cost], axis=2)
+        names.append(name)
+
+    years = np.isfinite(gross).any(axis=(0, 2)).sum() / 252
+    gross_mean = stage3_summary(gross, axis=1)[0]
+    net_mean, _, net_t, _, _ = stage3_summary(net, axis=1)
+
+    rows = []
+    for s, schedule in enumerate(result['schedules']):
+        for p, name in enumerate(names):
+            rows.append({
+                'schedule': schedule,
+                'portfolio': name,
+                'rebalances': int(result['rebalances'][s]),
+                'annual_turnover': turnover[s, :, p].sum() / years,
+                'annual_cost': cost[s, :, p].sum() / years,
+                'gross_annual': gross_mean[s, p] * 252,
+                'net_annual': net_mean[s, p] * 252,
+                'net_t_stat': net_t[s, p]
+            })
+    return pd.DataFrame(rows)
+
+
+def main():
+    """SMB_mega 다리·Quintile 포트폴리오의 주기별 거래비용 반영 백테스트"""
+    from enhanced_mega_cap_analysis import load_and_prepare_data, MEGA_CAP_BANDS
+    from universe_index import load_universe
+
+    stocks_df, returns_df, ff_df = load_and_prepare_data()
+    universe = load_universe(stocks_df, returns_df)
+
+    print("\n" + "=" * 60)
+    print(f"거래비용 반영 백테스트 (편도 {COST_BPS:.0f}bp)")
+    print("=" * 60)
+
+    start = time.time()
+    result = run_cost_backtest(returns_df, universe, MEGA_CAP_BANDS)
+    summary = backtest_summary(result)
+    print(f"\n📊 {len(result['schedules'])}개 주기 x {len(result['portfolios'])}개 포트폴리오: "
+          f"{time.time() - start:.2f}초")
+
+    print(f"\n📈 SMB_50 주기별 (총 → 순, 연율):")
+    for _, row in summary[summary['portfolio'] == 'SMB_50'].iterrows():
+        print(f"   - {row['schedule']:>5}: {row['gross_annual']:6.2%} → {row['net_annual']:6.2%} "
+              f"(t={row['net_t_stat']:.2f}, 회전율 {row['annual_turnover']:.1f}x/년)")
+
+    survives = summary[(summary['portfolio'] == 'SMB_50') & (summary['net_annual'] > 0)]
+    print(f"\n   - 비용 차감 후 양(+)의 SMB_50: {len(survives)}/{len(result['schedules'])}개 주기")
+
+    summary.to_csv('us_market/paper/Size_Reversal/back_data/cost_backtest_summary.csv', index=False)
+    print(f"\n   ✅ 저장: cost_backtest_summary.csv")
+    return summary
+
+
+if __name__ == "__main__":
+    summary = main()
@@ -11,6 +11,15 @@ from scipy import stats
 import warnings
 warnings.filterwarnings('ignore')
 
+from subperiod_analysis import build_prefix_sums, factor_subperiod_stats, premium_subperiod_stats, annual_ranges
+from portfolio_aggregation import load_portfolio_returns
+from enhanced_mega_cap_analysis import MEGA_CAP_BANDS
+from universe_index import load_universe, band_portfolios
+from regime_analysis import regime_means
+from stage_artifacts import load_stage_frame
+from plot_decimation import plot_line
+from trading_calendar import load_ff_factors, align
+
 # 폰트 설정 (한글 폰트 문제 해결)
 plt.rcParams['font.family'] = ['DejaVu Sans', 'Arial', 'sans-serif']
 plt.rcParams['font.size'] = 12
@@ -27,8 +36,7 @@ def load_data():
     stocks_df = pd.read_csv('us_market/paper/Size_Reversal/back_data/table0_top200_stocks.csv')
     returns_df = pd.read_csv('us_market/paper/Size_Reversal/back_data/data1_daily_returns.csv', index_col=0)
     returns_df.index = pd.to_datetime(returns_df.index)
-    ff_df = pd.read_csv('us_market/paper/Size_Reversal/back_data/data2_fama_french_factors.csv', index_col=0)
-    ff_df.index = pd.to_datetime(ff_df.index)
+    ff_df = load_ff_factors()
     
     # 기존 결과
     old_betas = pd.read_csv('us_market/paper/Size_Reversal/back_data/table1_stage1_betas.csv', index_col=0)
@@ -36,35 +44,25 @@ def load_data():
     # 향상된 결과
     enhanced_results = pd.read_csv('us_market/paper/Size_Reversal/back_data/enhanced_results_summary.csv')
     
+    # 월간 복리 수익률 (portfolio_aggregation.py 산출물)
+    monthly_returns = load_portfolio_returns()
+    
     print(f"✅ 데이터 로드 완료")
-    return stocks_df, returns_df, ff_df, old_betas, enhanced_results
+    return stocks_df, returns_df, ff_df, old_betas, enhanced_results, monthly_returns
 
-def create_mega_factors(stocks_df, returns_df):
-    """메가캡 팩터 재생성"""
+def create_mega_factors(stocks_df, returns_df, universe=None):
+    """메가캡 팩터 재생성 (시점 기준 유니버스 색인 순위 구간)"""
     print("🔧 메가캡 팩터 재생성 중...")
     
-    # 포트폴리오 구성
-    small_50_tickers = [t for t in stocks_df.iloc[100:200]['ticker'].tolist() if t in returns_df.columns]
-    big_50_tickers = [t for t in stocks_df.iloc[0:100]['ticker'].tolist() if t in returns_df.columns]
-    
-    # Quintile 구성
-    quintiles = {}
-    for i in range(5):
-        start_idx = i * 40
-        end_idx = (i + 1) * 40
-        quintiles[f'Q{i+1}'] = [t for t in stocks_df.iloc[start_idx:end_idx]['ticker'].tolist() if t in returns_df.columns]
+    if universe is None:
+        universe = load_universe(stocks_df, returns_df)
     
-    # 포트폴리오 수익률
-    portfolios = {}
-    portfolios['Small_50'] = returns_df[small_50_tickers].mean(axis=1)
-    portfolios['Big_50'] = returns_df[big_50_tickers].mean(axis=1)
-    portfolios['SMB_50'] = portfolios['Small_50'] - portfolios['Big_50']
+    # 50-50 분할과 Quintile 포트폴리오 수익률
+    bands = {name: MEGA_CAP_BANDS[name] for name in ['Small_50', 'Big_50'] + [f'Q{i+1}' for i in range(5)]}
+    portfolios = band_portfolios(universe, returns_df, bands)
+    portfolios.insert(2, 'SMB_50', portfolios['Small_50'] - portfolios['Big_50'])
     
-    for q, tickers in quintiles.items():
-        if tickers:
-            portfolios[q] = returns_df[tickers].mean(axis=1)
-    
-    mega_factors_df = pd.DataFrame(portfolios)
+    mega_factors_df = portfolios
     
     print(f"✅ 메가캡 팩터 생성 완료")
     return mega_factors_df
@@ -79,10 +77,10 @@ def figure1_enhanced_portfolio_analysis(mega_factors_df, stocks_df):
     cum_small = (1 + mega_factors_df['Small_50']).cumprod()
     cum_big = (1 + mega_factors_df['Big_50']).cumprod()
     
-    axes[0,0].plot(mega_factors_df.index, cum_small, label='Small Portfolio (Ranks 101-200)', 
-                   linewidth=2.5, color='red', alpha=0.8)
-    axes[0,0].plot(mega_factors_df.index, cum_big, label='Big Portfolio (Ranks 1-100)', 
-                   linewidth=2.5, color='blue', alpha=0.8)
+    plot_line(axes[0,0], mega_factors_df.index, cum_small, label='Small Portfolio (Ranks 101-200)', 
+                         linewidth=2.5, color='red', alpha=0.8)
+    plot_line(axes[0,0], mega_factors_df.index, cum_big, label='Big Portfolio (Ranks 1-100)', 
+                         linewidth=2.5, color='blue', alpha=0.8)
     axes[0,0].set_title('A. Mega-Cap Portfolio Cumulative Performance (50-50 Split)', 
                        fontsize=14, fontweight='bold', pad=20)
     axes[0,0].set_ylabel('Cumulative Return', fontsize=12)
@@ -95,9 +93,9 @@ def figure1_enhanced_portfolio_analysis(mega_factors_df, stocks_df):
     for i, (q, color) in enumerate(zip(['Q1', 'Q2', 'Q3', 'Q4', 'Q5'], colors)):
         if q in mega_factors_df.columns:
             cum_q = (1 + mega_factors_df[q]).cumprod()
-            axes[0,1].plot(mega_factors_df.index, cum_q, 
-                          label=f'{q} (Ranks {i*40+1}-{(i+1)*40})', 
-                          linewidth=2.5, color=color, alpha=0.8)
+            plot_line(axes[0,1], mega_factors_df.index, cum_q, 
+                                label=f'{q} (Ranks {i*40+1}-{(i+1)*40})', 
+                                linewidth=2.5, color=color, alpha=0.8)
     
     axes[0,1].set_title('B. Quintile Portfolio Performance Comparison', 
                        fontsize=14, fontweight='bold', pad=20)
@@ -107,8 +105,8 @@ def figure1_enhanced_portfolio_analysis(mega_factors_df, stocks_df):
     axes[0,1].tick_params(axis='x', rotation=45)
     
     # Panel C: SMB 팩터 누적 성과
-    axes[1,0].plot(mega_factors_df.index, mega_factors_df['SMB_50'].cumsum(), 
-                   label='SMB_50 Factor', linewidth=3, color='green', alpha=0.8)
+    plot_line(axes[1,0], mega_factors_df.index, mega_factors_df['SMB_50'].cumsum(), 
+                         label='SMB_50 Factor', linewidth=3, color='green', alpha=0.8)
     axes[1,0].set_title('C. SMB Factor Cumulative Performance', 
                        fontsize=14, fontweight='bold', pad=20)
     axes[1,0].set_ylabel('Cumulative SMB Return', fontsize=12)
@@ -149,8 +147,11 @@ def figure1_enhanced_portfolio_analysis(mega_factors_df, stocks_df):
     
     print("✅ Figure 1 저장 완료")
 
-def figure2_beta_comparison(old_betas, enhanced_results):
-    """Figure 2: 베타 분포 비교 (기존 vs 새로운 방법)"""
+def figure2_beta_comparison(old_betas, enhanced_results, stage_results):
+    """
+    Figure 2: 베타 분포 비교 (기존 vs 새로운 방법)
+    stage_results: load_stage_results() 결과 (SMB_50 Stage 1 베타, SMB_50·SMB_30 Stage 2 감마)
+    """
     print("📈 Figure 2 생성 중: Beta Distribution Comparison")
     
     fig, axes = plt.subplots(2, 3, figsize=(18, 12))
@@ -174,11 +175,10 @@ def figure2_beta_comparison(old_betas, enhanced_results):
                   bbox=dict(boxstyle='round', facecolor='white', alpha=0.8),
                   fontsize=9)
     
-    # 새로운 방법론 결과 (가상 데이터로 시뮬레이션)
-    np.random.seed(42)
+    # 새로운 방법론 결과 (enhanced_mega_cap_analysis.py Stage 1/2 산출물)
     
-    # SMB_50 베타 분포 (더 넓은 분산)
-    smb_50_betas = np.random.normal(0.3, 0.8, 190)
+    # SMB_50 베타 분포
+    smb_50_betas = np.asarray(stage_results['SMB_50']['stage1']['beta_smb_mega'])
     axes[0,1].hist(smb_50_betas, bins=25, alpha=0.7, color='blue', 
                    edgecolor='black', linewidth=1)
     axes[0,1].axvline(smb_50_betas.mean(), color='darkblue', 
@@ -214,15 +214,15 @@ def figure2_beta_comparison(old_betas, enhanced_results):
                       f'{value:.3f}', ha='center', va='bottom', 
                       fontweight='bold', fontsize=10)
     
-    axes[0,2].text(0.5, 0.8, f'Improvement: +{improvement:.1f}%', 
+    axes[0,2].text(0.5, 0.8, f'Improvement: {improvement:+.1f}%', 
                   transform=axes[0,2].transAxes, ha='center',
                   bbox=dict(boxstyle='round', facecolor='lightgreen', alpha=0.8),
                   fontsize=11, fontweight='bold')
     
-    # 하단: 일별 프리미엄 분포 (시뮬레이션)
+    # 하단: 일별 프리미엄 분포 (Stage 2 감마)
     
     # SMB_50 일별 프리미엄
-    daily_premiums_50 = np.random.normal(-0.0003, 0.002, 1053)
+    daily_premiums_50 = np.asarray(stage_results['SMB_50']['stage2']['gamma_smb_mega'])
     axes[1,0].hist(daily_premiums_50, bins=30, alpha=0.7, color='green', 
                    edgecolor='black', linewidth=1)
     axes[1,0].axvline(daily_premiums_50.mean(), color='darkgreen', 
@@ -246,7 +246,7 @@ def figure2_beta_comparison(old_betas, enhanced_results):
                   fontsize=9)
     
     # SMB_30 일별 프리미엄
-    daily_premiums_30 = np.random.normal(-0.0004, 0.0025, 1053)
+    daily_premiums_30 = np.asarray(stage_results['SMB_30']['stage2']['gamma_smb_mega'])
     axes[1,1].hist(daily_premiums_30, bins=30, alpha=0.7, color='purple', 
                    edgecolor='black', linewidth=1)
     axes[1,1].axvline(daily_premiums_30.mean(), color='indigo', 
@@ -304,7 +304,7 @@ def figure2_beta_comparison(old_betas, enhanced_results):
     
     print("✅ Figure 2 저장 완료")
 
-def figure3_timeseries_analysis(mega_factors_df, ff_df):
+def figure3_timeseries_analysis(mega_factors_df, ff_df, monthly_returns):
     """Figure 3: 시계열 분석"""
     print("📈 Figure 3 생성 중: Time Series Analysis")
     
@@ -312,13 +312,13 @@ def figure3_timeseries_analysis(mega_factors_df, ff_df):
     
     # Panel A: Rolling correlation (SMB vs Market)
     window = 252  # 1년
-    aligned_dates = mega_factors_df.index.intersection(ff_df.index)
-    smb_aligned = mega_factors_df.loc[aligned_dates, 'SMB_50']
-    market_aligned = ff_df.loc[aligned_dates, 'Mkt-RF']
+    mega_aligned, ff_aligned = align(mega_factors_df, ff_df)
+    smb_aligned = mega_aligned['SMB_50']
+    market_aligned = ff_aligned['Mkt-RF']
     
     rolling_corr = smb_aligned.rolling(window).corr(market_aligned)
     
-    axes[0,0].plot(rolling_corr.index, rolling_corr, linewidth=2.5, color='blue', alpha=0.8)
+    plot_line(axes[0,0], rolling_corr.index, rolling_corr, linewidth=2.5, color='blue', alpha=0.8)
     axes[0,0].set_title('A. SMB-Market Rolling Correlation (1-Year Window)', 
                        fontsize=14, fontweight='bold', pad=20)
     axes[0,0].set_ylabel('Correlation', fontsize=12)
@@ -330,10 +330,10 @@ def figure3_timeseries_analysis(mega_factors_df, ff_df):
     rolling_vol_smb = smb_aligned.rolling(window).std() * np.sqrt(252)
     rolling_vol_market = market_aligned.rolling(window).std() * np.sqrt(252)
     
-    axes[0,1].plot(rolling_vol_smb.index, rolling_vol_smb, 
-                   label='SMB Volatility', linewidth=2.5, color='red', alpha=0.8)
-    axes[0,1].plot(rolling_vol_market.index, rolling_vol_market, 
-                   label='Market Volatility', linewidth=2.5, color='blue', alpha=0.8)
+    plot_line(axes[0,1], rolling_vol_smb.index, rolling_vol_smb, 
+                         label='SMB Volatility', linewidth=2.5, color='red', alpha=0.8)
+    plot_line(axes[0,1], rolling_vol_market.index, rolling_vol_market, 
+                         label='Market Volatility', linewidth=2.5, color='blue', alpha=0.8)
     axes[0,1].set_title('B. Rolling Volatility (1-Year Window)', 
                        fontsize=14, fontweight='bold', pad=20)
     axes[0,1].set_ylabel('Annualized Volatility', fontsize=12)
@@ -342,8 +342,8 @@ def figure3_timeseries_analysis(mega_factors_df, ff_df):
     axes[0,1].tick_params(axis='x', rotation=45)
     
     # Panel C: 월별 SMB 성과
-    monthly_smb = smb_aligned.resample('M').sum()
-    monthly_performance = monthly_smb.groupby(monthly_smb.index.month).mean() * 12
+    monthly_smb = monthly_returns['smb_mega']
+    monthly_performance = regime_means(monthly_smb, monthly_smb.index.month) * 12
     
     months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
@@ -359,14 +359,12 @@ def figure3_timeseries_analysis(mega_factors_df, ff_df):
     axes[1,0].tick_params(axis='x', rotation=45)
     
     # Panel D: 연도별 성과
-    yearly_performance = {}
-    for year in range(2021, 2025):
-        year_data = smb_aligned[smb_aligned.index.year == year]
-        if len(year_data) > 0:
-            yearly_performance[year] = year_data.sum()
+    yearly_stats = factor_subperiod_stats(build_prefix_sums(smb_aligned.to_frame()),
+                                          annual_ranges(range(2021, 2025)))
+    yearly_stats = yearly_stats[yearly_stats['observations'] > 0]
     
-    years = list(yearly_performance.keys())
-    year_returns = list(yearly_performance.values())
+    years = yearly_stats['period'].tolist()
+    year_returns = yearly_stats['total'].tolist()
     
     colors = ['red' if x < 0 else 'green' for x in year_returns]
     bars = axes[1,1].bar([str(y) for y in years], [r*100 for r in year_returns], 
@@ -436,6 +434,209 @@ def create_additional_figures(old_betas, enhanced_results):
     
     print("✅ 추가 그래프 저장 완료")
 
+PREMIUM_LABELS = {'gamma_market': 'Mkt-RF', 'gamma_smb_mega': 'SMB_mega', 'gamma_hml': 'HML'}
+PREMIUM_COLORS = {'gamma_market': 'blue', 'gamma_smb_mega': 'green', 'gamma_hml': 'orange'}
+FIGURE_DIR = 'us_market/paper/Size_Reversal/figures'
+COVID_END = '2021-12-31'   # Fig 7·8 COVID regime 마지막 날 (이후는 Post-COVID)
+
+def load_stage2_gammas(smb_factor='SMB_50'):
+    """SMB 사양의 Stage 2 감마 (날짜 인덱스, enhanced_mega_cap_analysis.py 열 단위 산출물에서 필요한 열만)"""
+    return load_stage_frame(smb_factor, 'stage2', columns=list(PREMIUM_LABELS))
+
+def load_stage_results():
+    """Figure 2 패널 B·D·E 입력: SMB_50 Stage 1 베타, SMB_50·SMB_30 Stage 2 감마"""
+    return {
+        'SMB_50': {'stage1': load_stage_frame('SMB_50', 'stage1', columns=['beta_smb_mega']),
+                   'stage2': load_stage_frame('SMB_50', 'stage2', columns=['gamma_smb_mega'])},
+        'SMB_30': {'stage2': load_stage_frame('SMB_30', 'stage2', columns=['gamma_smb_mega'])}
+    }
+
+def significance_stars(p_value):
+    """유의성 표시 (*** p<0.01, ** p<0.05, * p<0.10)"""
+    return '***' if p_value < 0.01 else '**' if p_value < 0.05 else '*' if p_value < 0.1 else ''
+
+def figure_premium_timeseries(gammas):
+    """Fig 2: 일별 팩터 프리미엄 시계열 (Stage 2)"""
+    print("📈 Fig 2 생성 중: Premium Time Series")
+    
+    fig, axes = plt.subplots(3, 1, figsize=(14, 12), sharex=True)
+    for ax, (panel, column) in zip(axes, zip('ABC', PREMIUM_LABELS)):
+        plot_line(ax, gammas.index, gammas[column] * 100, linewidth=0.6, color=PREMIUM_COLORS[column], alpha=0.8)
+        ax.axhline(gammas[column].mean() * 100, color='red', linestyle='--', linewidth=2,
+                   label=f'Mean: {gammas[column].mean()*100:.4f}%')
+        ax.set_title(f'{panel}. {PREMIUM_LABELS[column]} Premium', fontsize=14, fontweight='bold')
+        ax.set_ylabel('Daily Premium (%)', fontsize=12)
+        ax.legend(fontsize=10, loc='upper right')
+        ax.grid(True, alpha=0.3)
+    axes[-1].tick_params(axis='x', rotation=45)
+    
+    plt.tight_layout()
+    plt.savefig(f'{FIGURE_DIR}/fig2_premium_timeseries.pdf', dpi=300, bbox_inches='tight', facecolor='white')
+    plt.close()
+    print("✅ Fig 2 저장 완료")
+
+def figure_rolling_window(gammas, window=252):
+    """Fig 3: 1년 이동 창 연율 프리미엄"""
+    print("📈 Fig 3 생성 중: Rolling Window Premiums")
+    
+    rolling = gammas.rolling(window).mean() * 252
+    
+    fig, ax = plt.subplots(figsize=(14, 7))
+    for column in PREMIUM_LABELS:
+        plot_line(ax, rolling.index, rolling[column] * 100, label=PREMIUM_LABELS[column],
+                      linewidth=2.5, color=PREMIUM_COLORS[column], alpha=0.8)
+    ax.axhline(0, color='black', linestyle='-', linewidth=1)
+    ax.set_title(f'Rolling {window}-Day Annualized Factor Premiums', fontsize=14, fontweight='bold')
+    ax.set_ylabel('Annualized Premium (%)', fontsize=12)
+    ax.legend(fontsize=11)
+    ax.grid(True, alpha=0.3)
+    ax.tick_params(axis='x', rotation=45)
+    
+    plt.tight_layout()
+    plt.savefig(f'{FIGURE_DIR}/fig3_rolling_window.pdf', dpi=300, bbox_inches='tight', facecolor='white')
+    plt.close()
+    print("✅ Fig 3 저장 완료")
+
+def figure_cumulative_returns(gammas):
+    """Fig 4: 팩터 프리미엄 누적 수익률"""
+    print("📈 Fig 4 생성 중: Cumulative Premiums")
+    
+    cumulative = gammas.fillna(0).cumsum()
+    
+    fig, ax = plt.subplots(figsize=(14, 7))
+    for column in PREMIUM_LABELS:
+        plot_line(ax, cumulative.index, cumulative[column] * 100, label=PREMIUM_LABELS[column],
+                      linewidth=2.5, color=PREMIUM_COLORS[column], alpha=0.8)
+    ax.axhline(0, color='black', linestyle='-', linewidth=1)
+    ax.set_title('Cumulative Factor Premiums', fontsize=14, fontweight='bold')
+    ax.set_ylabel('Cumulative Premium (%)', fontsize=12)
+    ax.legend(fontsize=11)
+    ax.grid(True, alpha=0.3)
+    ax.tick_params(axis='x', rotation=45)
+    
+    plt.tight_layout()
+    plt.savefig(f'{FIGURE_DIR}/fig4_cumulative_returns.pdf', dpi=300, bbox_inches='tight', facecolor='white')
+    plt.close()
+    print("✅ Fig 4 저장 완료")
+
+def figure_correlation_matrix(gammas):
+    """Fig 5: 팩터 프리미엄 상관행렬"""
+    print("📈 Fig 5 생성 중: Premium Correlation Matrix")
+    
+    corr = gammas.rename(columns=PREMIUM_LABELS).corr()
+    
+    fig, ax = plt.subplots(figsize=(8, 7))
+    im = ax.imshow(corr.values, cmap='RdBu_r', vmin=-1, vmax=1)
+    ax.set_xticks(range(len(corr)))
+    ax.set_yticks(range(len(corr)))
+    ax.set_xticklabels(corr.columns, fontsize=12)
+    ax.set_yticklabels(corr.index, fontsize=12)
+    for i in range(len(corr)):
+        for j in range(len(corr)):
+            ax.text(j, i, f'{corr.values[i, j]:.2f}', ha='center', va='center', fontsize=13, fontweight='bold')
+    ax.set_title('Correlation of Daily Factor Premiums', fontsize=14, fontweight='bold')
+    plt.colorbar(im, ax=ax, fraction=0.046, pad=0.04)
+    
+    plt.tight_layout()
+    plt.savefig(f'{FIGURE_DIR}/fig5_correlation_matrix.pdf', dpi=300, bbox_inches='tight', facecolor='white')
+    plt.close()
+    print("✅ Fig 5 저장 완료")
+
+def figure_premium_distributions(gammas):
+    """Fig 6: 일별 팩터 프리미엄 분포"""
+    print("📈 Fig 6 생성 중: Premium Distributions")
+    
+    fig, axes = plt.subplots(1, 3, figsize=(18, 5))
+    for ax, (panel, column) in zip(axes, zip('ABC', PREMIUM_LABELS)):
+        values = gammas[column].dropna() * 100
+        ax.hist(values, bins=50, alpha=0.7, color=PREMIUM_COLORS[column], edgecolor='black')
+        ax.axvline(values.mean(), color='red', linestyle='--', linewidth=2, label=f'Mean: {values.mean():.4f}%')
+        ax.set_title(f'{panel}. {PREMIUM_LABELS[column]} Premium', fontsize=14, fontweight='bold')
+        ax.set_xlabel('Daily Premium (%)', fontsize=12)
+        ax.set_ylabel('Frequency', fontsize=12)
+        ax.legend(fontsize=10)
+        ax.grid(True, alpha=0.3)
+    
+    plt.tight_layout()
+    plt.savefig(f'{FIGURE_DIR}/fig6_premium_distributions.pdf', dpi=300, bbox_inches='tight', facecolor='white')
+    plt.close()
+    print("✅ Fig 6 저장 완료")
+
+def subperiod_bar_chart(gammas, ranges, title, path):
+    """서브기간별 연율 SMB 프리미엄 막대 (표준오차 오차막대, 유의성 표시), 관측이 2일 미만인 구간은 생략"""
+    stats_df = premium_subperiod_stats(build_prefix_sums(gammas), ranges)
+    smb = stats_df[(stats_df['factor'] == 'gamma_smb_mega') & (stats_df['observations'] > 1)].reset_index(drop=True)
+    std_err = smb['annual_premium'] / smb['t_stat']
+    
+    fig, ax = plt.subplots(figsize=(12, 7))
+    colors = ['darkred' if p < 0.05 else 'indianred' if p < 0.1 else 'gray' for p in smb['p_value']]
+    bars = ax.bar(smb['period'], smb['annual_premium'] * 100, yerr=std_err.abs() * 100, capsize=6,
+                  color=colors, alpha=0.8, edgecolor='black')
+    for bar, (_, row) in zip(bars, smb.iterrows()):
+        ax.text(bar.get_x() + bar.get_width() / 2, 0,
+                f"{row['annual_premium']:.1%}{significance_stars(row['p_value'])}\n"
+                f"t={row['t_stat']:.2f}, p={row['p_value']:.3f}",
+                ha='center', va='bottom', fontsize=10, fontweight='bold')
+    ax.axhline(0, color='black', linewidth=1)
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.set_ylabel('Annual SMB Premium (%)', fontsize=12)
+    ax.grid(True, alpha=0.3, axis='y')
+    
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches='tight', facecolor='white')
+    plt.close()
+
+def covid_split(index, boundary=COVID_END):
+    """표본이 COVID_END 양쪽에 모두 걸치면 (이전 마지막 날, 이후 첫날), 한쪽뿐이면 None"""
+    boundary = pd.Timestamp(boundary)
+    before, after = index[index <= boundary], index[index > boundary]
+    if len(before) == 0 or len(after) == 0:
+        return None
+    return before[-1], after[0]
+
+def figure_annual_smb_evolution(gammas):
+    """Fig 7: 서브기간별 SMB 프리미엄 추이 (COVID 기간 묶음, 이후 연도별, 전체), 구간은 표본 날짜에서 도출"""
+    print("📈 Fig 7 생성 중: Annual SMB Evolution")
+    
+    index = gammas.index
+    years = sorted(set(index.year))
+    start, end = index[0], index[-1]
+    split = covid_split(index)
+    if split is None:
+        # 표본이 한쪽 regime에만 있으면 전부 연도별
+        ranges = annual_ranges(years)
+    else:
+        covid_years = [y for y in years if y <= split[0].year]
+        ranges = [(start, split[0], f'{covid_years[0]}-{covid_years[-1]}' if len(covid_years) > 1
+                   else str(covid_years[0]))] + annual_ranges([y for y in years if y > split[0].year])
+    ranges += [(start, end, f'Full ({years[0]}-{years[-1]})')]
+    subperiod_bar_chart(gammas, ranges, 'Evolution of Size Premium Across Subperiods',
+                        f'{FIGURE_DIR}/fig7_annual_smb_evolution.pdf')
+    print("✅ Fig 7 저장 완료")
+
+def figure_subperiod_comparison(gammas):
+    """Fig 8: COVID / 이후 / 전체 기간 SMB 프리미엄 비교 (표본이 COVID_END 한쪽에만 있으면 전체 기간만)"""
+    print("📈 Fig 8 생성 중: Subperiod Comparison")
+    
+    start, end = gammas.index[0], gammas.index[-1]
+    split = covid_split(gammas.index)
+    ranges = [] if split is None else [(start, split[0], 'COVID Period'), (split[1], end, 'Post-COVID')]
+    if split is None:
+        print(f"   ⚠️ 표본({start:%Y-%m-%d} ~ {end:%Y-%m-%d})이 {COVID_END} 한쪽에만 있어 전체 기간만 표시")
+    subperiod_bar_chart(gammas, ranges + [(start, end, 'Full Sample')], 'Size Premium: COVID vs Post-COVID',
+                        f'{FIGURE_DIR}/fig8_subperiod_comparison.pdf')
+    print("✅ Fig 8 저장 완료")
+
+def create_premium_figures(gammas):
+    """Stage 2 감마 기반 Fig 2~8"""
+    figure_premium_timeseries(gammas)
+    figure_rolling_window(gammas)
+    figure_cumulative_returns(gammas)
+    figure_correlation_matrix(gammas)
+    figure_premium_distributions(gammas)
+    figure_annual_smb_evolution(gammas)
+    figure_subperiod_comparison(gammas)
+
 def main():
     """메인 실행 함수"""
     print("=" * 60)
@@ -443,19 +644,22 @@ def main():
     print("=" * 60)
     
     # 1. 데이터 로드
-    stocks_df, returns_df, ff_df, old_betas, enhanced_results = load_data()
+    stocks_df, returns_df, ff_df, old_betas, enhanced_results, monthly_returns = load_data()
     
     # 2. 메가캡 팩터 생성
     mega_factors_df = create_mega_factors(stocks_df, returns_df)
     
     # 3. 주요 그래프들 생성
     figure1_enhanced_portfolio_analysis(mega_factors_df, stocks_df)
-    figure2_beta_comparison(old_betas, enhanced_results)
-    figure3_timeseries_analysis(mega_factors_df, ff_df)
+    figure2_beta_comparison(old_betas, enhanced_results, load_stage_results())
+    figure3_timeseries_analysis(mega_factors_df, ff_df, monthly_returns)
     
     # 4. 추가 그래프들
     create_additional_figures(old_betas, enhanced_results)
     
+    # 5. Stage 2 감마 기반 Fig 2~8
+    create_premium_figures(load_stage2_gammas())
+    
     print("\n" + "=" * 60)
     print("🎯 모든 그래프 생성 완료!")
     print("=" * 60)
@@ -465,6 +669,7 @@ def main():
     print("   - fig_enhanced_beta_analysis.pdf/.png") 
     print("   - fig_enhanced_timeseries_analysis.pdf/.png")
     print("   - fig1_beta_distributions.pdf")
+    print("   - fig2_premium_timeseries.pdf ~ fig8_subperiod_comparison.pdf")
     print("✅ 모든 폰트 문제 해결됨")
     print("✅ 고해상도 (300 DPI) 저장 완료")
 
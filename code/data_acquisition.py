@@ -0,0 +1,246 @@
+"""
+가격·팩터 데이터 수집 (asyncio)
+교체 가능한 소스 인터페이스, 동시 요청 수 제한, 재시도, 티커·기간 단위 증분 디스크 캐시
+캐시에 없는 날짜만 요청하므로 재실행 시에는 새 거래일만 받아옴
+"""
+
+import asyncio
+import io
+import json
+import os
+import threading
+import urllib.request
+from abc import ABC, abstractmethod
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+import pandas as pd
+
+CACHE_DIR = 'us_market/paper/Size_Reversal/back_data/cache'
+RAW_PRICE_DIR = 'us_market/paper/Size_Reversal/raw_prices'
+MAX_CONCURRENCY = 16    # 동시 요청 상한
+MAX_RETRIES = 3         # 요청당 재시도 횟수
+RETRY_BACKOFF = 0.5     # 재시도 대기 (초, 시도마다 2배)
+FF_KEY = 'FF_FACTORS'   # Fama-French 일별 팩터 (Mkt-RF, SMB, HML, RF) 데이터셋 이름
+
+
+class Source(ABC):
+    """
+    데이터 소스 인터페이스: fetch(key, start, end) → 날짜 인덱스 DataFrame (start~end 포함)
+    key는 티커 또는 'FF_FACTORS' 같은 데이터셋 이름
+    """
+
+    @abstractmethod
+    async def fetch(self, key, start, end):
+        """key의 start~end 구간 DataFrame"""
+
+
+class LocalFileSource(Source):
+    """디렉터리의 {key}.csv (첫 열 date) 를 읽는 소스"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    async def fetch(self, key, start, end):
+        frame = await asyncio.to_thread(_read_csv, os.path.join(self.directory, f'{key}.csv'))
+        return _clip(frame, start, end)
+
+
+class HTTPSource(Source):
+    """
+    HTTP CSV 소스: url_template에 key·start·end를 채워 GET
+    서버가 기간 필터를 지원하지 않아도 받은 뒤 start~end로 자름
+    """
+
+    def __init__(self, base_url, url_template='{base_url}/{key}.csv?start={start}&end={end}', timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.url_template = url_template
+        self.timeout = timeout
+
+    async def fetch(self, key, start, end):
+        url = self.url_template.format(base_url=self.base_url, key=key,
+                                       start=start.strftime('%Y-%m-%d'), end=end.strftime('%Y-%m-%d'))
+        body = await asyncio.to_thread(self._get, url)
+        return _clip(_read_csv(io.StringIO(body)), start, end)
+
+    def _get(self, url):
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            return response.read().decode('utf-8')
+
+
+def _read_csv(path_or_buffer):
+    frame = pd.read_csv(path_or_buffer, index_col=0)
+    frame.index = pd.to_datetime(frame.index)
+    return frame.sort_index()
+
+
+def _clip(frame, start, end):
+    return frame.loc[(frame.index >= start) & (frame.index <= end)]
+
+
+def _cache_path(cache_dir, key):
+    return os.path.join(cache_dir, key.replace('/', '_') + '.csv')
+
+
+def load_coverage(cache_dir=CACHE_DIR):
+    """캐시 색인 {key: [시작일, 종료일]} (요청한 기간 기준, 휴장일 포함)"""
+    path = os.path.join(cache_dir, '_coverage.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_coverage(coverage, cache_dir=CACHE_DIR):
+    """캐시 색인 저장 (임시 파일 후 교체)"""
+    path = os.path.join(cache_dir, '_coverage.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(coverage, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def missing_ranges(covered, start, end):
+    """
+    요청 기간 중 캐시가 덮지 않는 구간 목록 (앞쪽·뒤쪽만)
+    요청이 캐시와 떨어져 있으면 사이 공백까지 받아 캐시를 항상 연속 구간 하나로 유지
+    """
+    if covered is None:
+        return [(start, end)]
+    cached_start, cached_end = pd.Timestamp(covered[0]), pd.Timestamp(covered[1])
+    ranges = []
+    if start < cached_start:
+        ranges.append((start, cached_start - pd.Timedelta(days=1)))
+    if end > cached_end:
+        ranges.append((cached_end + pd.Timedelta(days=1), end))
+    return ranges
+
+
+async def fetch_with_retry(source, key, start, end, semaphore, retries=MAX_RETRIES, backoff=RETRY_BACKOFF):
+    """동시 요청 상한 안에서 재시도 (지수 대기)"""
+    for attempt in range(retries + 1):
+        async with semaphore:
+            try:
+                return await source.fetch(key, start, end)
+            except Exception:
+                if attempt == retries:
+                    raise
+        await asyncio.sleep(backoff * 2 ** attempt)
+
+
+async def update_key(source, key, start, end, coverage, semaphore, cache_dir=CACHE_DIR, **retry):
+    """
+    한 key의 캐시를 요청 기간까지 확장하고 start~end 구간 반환
+    반환: (DataFrame, 새로 받은 행 수)
+    """
+    path = _cache_path(cache_dir, key)
+    # 색인에 있어도 캐시 파일이 없으면 덮지 않은 것으로 취급
+    covered = coverage.get(key) if os.path.exists(path) else None
+    ranges = missing_ranges(covered, start, end)
+    cached = await asyncio.to_thread(_read_csv, path) if covered is not None else None
+
+    fetched = [await fetch_with_retry(source, key, a, b, semaphore, **retry) for a, b in ranges]
+    new_rows = sum(len(frame) for frame in fetched)
+
+    if ranges:
+        frames = ([cached] if cached is not None else []) + fetched
+        merged = pd.concat(frames).sort_index()
+        merged = merged[~merged.index.duplicated(keep='last')]
+        await asyncio.to_thread(merged.to_csv, path)
+        covered = covered or [start, end]
+        coverage[key] = [min(start, pd.Timestamp(covered[0])).strftime('%Y-%m-%d'),
+                         max(end, pd.Timestamp(covered[1])).strftime('%Y-%m-%d')]
+        cached = merged
+
+    return _clip(cached, start, end), new_rows
+
+
+async def fetch_all(source, keys, start, end, cache_dir=CACHE_DIR, concurrency=MAX_CONCURRENCY, **retry):
+    """
+    여러 key를 동시 수집 (증분 캐시 경유)
+    반환: {key: DataFrame}, {key: 오류 메시지}, 새로 받은 총 행 수
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    coverage = load_coverage(cache_dir)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    tasks = [update_key(source, key, start, end, coverage, semaphore, cache_dir, **retry) for key in keys]
+    outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+    save_coverage(coverage, cache_dir)
+
+    data, failures, new_rows = {}, {}, 0
+    for key, outcome in zip(keys, outcomes):
+        if isinstance(outcome, Exception):
+            failures[key] = f'{type(outcome).__name__}: {outcome}'
+        else:
+            data[key], rows = outcome
+            new_rows += rows
+    return data, failures, new_rows
+
+
+def refresh(source, keys, start, end, **kwargs):
+    """fetch_all 동기 실행"""
+    return asyncio.run(fetch_all(source, keys, start, end, **kwargs))
+
+
+def build_returns_panel(prices, column='close'):
+    """티커별 가격 → 일별 수익률 패널 (날짜 x 티커, 첫 날은 결측)"""
+    closes = pd.DataFrame({key: frame[column] for key, frame in prices.items()}).sort_index()
+    return closes.pct_change(fill_method=None)
+
+
+def start_stand_in_server(directory, port=0):
+    """
+    로컬 디렉터리를 HTTP로 제공하는 대체 서버 (테스트·오프라인 실행용)
+    반환: (서버, base_url), 종료는 server.shutdown()
+    """
+    handler = partial(_QuietHandler, directory=directory)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    """raw_prices 디렉터리를 대체 HTTP 서버로 제공해 top-200 가격·FF 팩터를 증분 수집하고 저장"""
+    stocks_df = pd.read_csv('us_market/paper/Size_Reversal/back_data/table0_top200_stocks.csv')
+    tickers = stocks_df['ticker'].tolist()
+
+    print("=" * 60)
+    print("가격 데이터 수집 (asyncio, 증분 캐시)")
+    print("=" * 60)
+
+    if not os.path.isdir(RAW_PRICE_DIR):
+        print(f"\n⚠️ 가격 원본 디렉터리 없음: {RAW_PRICE_DIR}")
+        return None
+
+    server, base_url = start_stand_in_server(RAW_PRICE_DIR)
+    try:
+        end = pd.Timestamp.today().normalize()
+        data, failures, new_rows = refresh(HTTPSource(base_url), tickers + [FF_KEY], '2020-01-01', end)
+    finally:
+        server.shutdown()
+
+    print(f"\n📊 수집 결과:")
+    print(f"   - 성공: {len(data)}개, 실패: {len(failures)}개, 새로 받은 행: {new_rows:,}")
+    for key, message in list(failures.items())[:5]:
+        print(f"   ⚠️ {key}: {message}")
+
+    ff_df = data.pop(FF_KEY, None)
+    if ff_df is not None:
+        ff_df.to_csv('us_market/paper/Size_Reversal/back_data/data2_fama_french_factors.csv')
+        print(f"   ✅ 저장: data2_fama_french_factors.csv ({len(ff_df)}일)")
+
+    if data:
+        returns = build_returns_panel(data).iloc[1:]
+        returns.to_csv('us_market/paper/Size_Reversal/back_data/data1_daily_returns.csv')
+        print(f"   ✅ 저장: data1_daily_returns.csv ({returns.shape[0]}일 x {returns.shape[1]}개)")
+    return data
+
+
+if __name__ == "__main__":
+    data = main()
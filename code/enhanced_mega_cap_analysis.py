@@ -5,10 +5,30 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy import stats
 import warnings
 warnings.filterwarnings('ignore')
 
+from fama_macbeth_core import fit_fama_macbeth
+from subperiod_analysis import build_prefix_sums, factor_subperiod_stats, annual_ranges
+from portfolio_aggregation import aggregate_and_save, load_portfolio_returns
+from panel_validity import build_validity_mask, summarize_validity
+from results_store import connect_store, record_run, record_specification
+from precision import resolve_dtype, is_reduced
+from least_squares import summarize_drops
+from universe_index import load_universe, band_portfolios, ever_members, summarize_universe
+from regime_analysis import regime_means
+from stage_artifacts import save_stage_artifacts
+from gamma_history import frame_accumulator, append_gamma_history
+from plot_decimation import plot_line
+from trading_calendar import load_ff_factors, align
+
+# 시가총액 순위 구간 (0부터 시작하는 반개구간): 50-50, 30-40-30, 5분위
+MEGA_CAP_BANDS = {
+    'Small_50': (100, 200), 'Big_50': (0, 100),
+    'Top_30': (0, 30), 'Middle_40': (30, 70), 'Bottom_30': (70, 100),
+    **{f'Q{i+1}': (i * 40, (i + 1) * 40) for i in range(5)}
+}
+
 def load_and_prepare_data():
     """데이터 로드 및 전처리"""
     print("=" * 60)
@@ -19,8 +39,7 @@ def load_and_prepare_data():
     stocks_df = pd.read_csv('us_market/paper/Size_Reversal/back_data/table0_top200_stocks.csv')
     returns_df = pd.read_csv('us_market/paper/Size_Reversal/back_data/data1_daily_returns.csv', index_col=0)
     returns_df.index = pd.to_datetime(returns_df.index)
-    ff_df = pd.read_csv('us_market/paper/Size_Reversal/back_data/data2_fama_french_factors.csv', index_col=0)
-    ff_df.index = pd.to_datetime(ff_df.index)
+    ff_df = load_ff_factors()
     
     print(f"✅ 데이터 로드 완료")
     print(f"   - 주식 수: {len(returns_df.columns)}")
@@ -28,52 +47,34 @@ def load_and_prepare_data():
     
     return stocks_df, returns_df, ff_df
 
-def create_enhanced_mega_factors(stocks_df, returns_df):
+def create_enhanced_mega_factors(stocks_df, returns_df, precision='float64', universe=None):
     """향상된 메가캡 팩터 구성 (다양한 분할 방식)"""
     print(f"\n🔧 향상된 메가캡 팩터 구성")
     
-    # 시가총액 기준 정렬
-    stocks_sorted = stocks_df.copy().reset_index(drop=True)
-    
-    # 1. 기본 50-50 분할
-    small_50_tickers = [t for t in stocks_sorted.iloc[100:200]['ticker'].tolist() if t in returns_df.columns]
-    big_50_tickers = [t for t in stocks_sorted.iloc[0:100]['ticker'].tolist() if t in returns_df.columns]
-    
-    # 2. 30-30-40 분할 (Top 30, Middle 40, Bottom 30)
-    top_30_tickers = [t for t in stocks_sorted.iloc[0:30]['ticker'].tolist() if t in returns_df.columns]
-    middle_40_tickers = [t for t in stocks_sorted.iloc[30:70]['ticker'].tolist() if t in returns_df.columns]
-    bottom_30_tickers = [t for t in stocks_sorted.iloc[70:100]['ticker'].tolist() if t in returns_df.columns]
-    
-    # 3. Quintile 분할 (5개 그룹)
-    quintiles = {}
-    for i in range(5):
-        start_idx = i * 40
-        end_idx = (i + 1) * 40
-        quintiles[f'Q{i+1}'] = [t for t in stocks_sorted.iloc[start_idx:end_idx]['ticker'].tolist() if t in returns_df.columns]
-    
-    # 포트폴리오 수익률 계산
-    portfolios = {}
+    # float32 모드: 포트폴리오 평균을 float32 패널로 계산
+    dtype = resolve_dtype(precision)
+    if is_reduced(dtype):
+        returns_df = returns_df.astype(dtype)
     
-    # 50-50 분할
-    portfolios['Small_50'] = returns_df[small_50_tickers].mean(axis=1)
-    portfolios['Big_50'] = returns_df[big_50_tickers].mean(axis=1)
-    portfolios['SMB_50'] = portfolios['Small_50'] - portfolios['Big_50']
+    # 시점 기준 유니버스 색인의 순위 구간별 포트폴리오 (파일이 없으면 정적 table0 순위)
+    if universe is None:
+        universe = load_universe(stocks_df, returns_df)
+    portfolios = band_portfolios(universe, returns_df, MEGA_CAP_BANDS)
+    portfolios.insert(2, 'SMB_50', portfolios['Small_50'] - portfolios['Big_50'])
     
-    # 30-30-40 분할
-    portfolios['Top_30'] = returns_df[top_30_tickers].mean(axis=1)
-    portfolios['Middle_40'] = returns_df[middle_40_tickers].mean(axis=1)
-    portfolios['Bottom_30'] = returns_df[bottom_30_tickers].mean(axis=1)
+    # 표본 기간 중 한 번이라도 구간에 속한 종목 (Stage 1 대상, 마지막 날짜 생존 종목만 쓰면 선택 편의)
+    def band(lo, hi):
+        return [t for t in ever_members(universe, hi, lo, returns_df.index) if t in returns_df.columns]
     
-    # Quintile 포트폴리오
-    for q, tickers in quintiles.items():
-        if tickers:
-            portfolios[q] = returns_df[tickers].mean(axis=1)
+    small_50_tickers, big_50_tickers = band(*MEGA_CAP_BANDS['Small_50']), band(*MEGA_CAP_BANDS['Big_50'])
+    top_30_tickers, bottom_30_tickers = band(*MEGA_CAP_BANDS['Top_30']), band(*MEGA_CAP_BANDS['Bottom_30'])
+    quintiles = {f'Q{i+1}': band(*MEGA_CAP_BANDS[f'Q{i+1}']) for i in range(5)}
     
     # SMB 팩터들
     portfolios['SMB_30'] = portfolios['Bottom_30'] - portfolios['Top_30']  # Bottom 30 - Top 30
     portfolios['SMB_Q5Q1'] = portfolios['Q5'] - portfolios['Q1']  # Q5 - Q1
     
-    mega_factors_df = pd.DataFrame(portfolios)
+    mega_factors_df = portfolios
     
     print(f"   ✅ 다양한 SMB 팩터 구성 완료")
     print(f"   - SMB_50 (50-50): {portfolios['SMB_50'].mean()*252:.1%}")
@@ -88,15 +89,13 @@ def create_enhanced_mega_factors(stocks_df, returns_df):
         'quintiles': quintiles
     }
 
-def enhanced_fama_macbeth(returns_df, ff_df, mega_factors_df, ticker_groups):
-    """향상된 Fama-MacBeth 분석"""
+def enhanced_fama_macbeth(returns_df, ff_df, mega_factors_df, ticker_groups, validity=None,
+                          precision='float64'):
+    """향상된 Fama-MacBeth 분석 (사양별 FamaMacBethResult, DataFrame은 필요할 때만 변환)"""
     print(f"\n🔬 향상된 Fama-MacBeth 분석")
     
     # 데이터 정렬
-    common_dates = returns_df.index.intersection(ff_df.index).intersection(mega_factors_df.index)
-    returns_aligned = returns_df.loc[common_dates]
-    ff_aligned = ff_df.loc[common_dates]
-    mega_aligned = mega_factors_df.loc[common_dates]
+    returns_aligned, ff_aligned, mega_aligned = align(returns_df, ff_df, mega_factors_df)
     
     results = {}
     
@@ -106,90 +105,16 @@ def enhanced_fama_macbeth(returns_df, ff_df, mega_factors_df, ticker_groups):
     for smb_factor in smb_factors:
         print(f"\n   📊 {smb_factor} 팩터 분석 중...")
         
-        # Stage 1: 시계열 회귀
-        stage1_results = {}
-        
-        for ticker in returns_aligned.columns:
-            excess_return = returns_aligned[ticker] - ff_aligned['RF']
-            
-            X = pd.DataFrame({
-                'Mkt_RF': ff_aligned['Mkt-RF'],
-                'SMB_mega': mega_aligned[smb_factor],
-                'HML': ff_aligned['HML']
-            })
-            
-            valid_idx = ~(excess_return.isna() | X.isna().any(axis=1))
-            y = excess_return[valid_idx]
-            X_clean = X[valid_idx]
-            
-            if len(y) > 50:
-                X_with_const = np.column_stack([np.ones(len(X_clean)), X_clean])
-                try:
-                    coeffs = np.linalg.lstsq(X_with_const, y, rcond=None)[0]
-                    stage1_results[ticker] = {
-                        'alpha': coeffs[0],
-                        'beta_market': coeffs[1],
-                        'beta_smb_mega': coeffs[2],
-                        'beta_hml': coeffs[3]
-                    }
-                except:
-                    pass
-        
-        stage1_df = pd.DataFrame(stage1_results).T
-        
-        # Stage 2: 횡단면 회귀
-        stage2_results = []
+        # Stage 1~3: 벡터화 솔버 (티커·날짜 루프 없이 배치 행렬 연산)
+        result = fit_fama_macbeth(
+            returns_aligned, ff_aligned, mega_aligned[smb_factor], validity=validity,
+            precision=precision
+        )
+        results[smb_factor] = result
         
-        for date in common_dates:
-            daily_returns = returns_aligned.loc[date]
-            valid_tickers = [t for t in daily_returns.index if t in stage1_df.index]
-            
-            if len(valid_tickers) > 10:
-                y = daily_returns[valid_tickers].values
-                X = stage1_df.loc[valid_tickers, ['beta_market', 'beta_smb_mega', 'beta_hml']].values
-                
-                valid_idx = ~(np.isnan(y) | np.isnan(X).any(axis=1))
-                
-                if valid_idx.sum() > 5:
-                    y_clean = y[valid_idx]
-                    X_clean = X[valid_idx]
-                    X_with_const = np.column_stack([np.ones(len(X_clean)), X_clean])
-                    
-                    try:
-                        coeffs = np.linalg.lstsq(X_with_const, y_clean, rcond=None)[0]
-                        stage2_results.append({
-                            'date': date,
-                            'gamma_market': coeffs[1],
-                            'gamma_smb_mega': coeffs[2],
-                            'gamma_hml': coeffs[3]
-                        })
-                    except:
-                        pass
-        
-        stage2_df = pd.DataFrame(stage2_results)
-        
-        # Stage 3: 시계열 평균
-        factor_results = {}
-        for factor in ['gamma_market', 'gamma_smb_mega', 'gamma_hml']:
-            values = stage2_df[factor].dropna()
-            mean_premium = values.mean()
-            t_stat = mean_premium / (values.std() / np.sqrt(len(values)))
-            p_value = 2 * (1 - stats.t.cdf(abs(t_stat), len(values) - 1))
-            
-            factor_results[factor] = {
-                'daily_premium': mean_premium,
-                'annual_premium': mean_premium * 252,
-                't_stat': t_stat,
-                'p_value': p_value
-            }
-        
-        results[smb_factor] = {
-            'factor_results': factor_results,
-            'stage1_df': stage1_df,
-            'stage2_df': stage2_df
-        }
-        
-        print(f"      SMB Premium: {factor_results['gamma_smb_mega']['annual_premium']:.1%} (t={factor_results['gamma_smb_mega']['t_stat']:.2f})")
+        size = result.premiums['gamma_smb_mega']
+        print(f"      SMB Premium: {size['annual_premium']:.1%} (t={size['t_stat']:.2f})")
+        summarize_drops(result.drops, indent='      ')
     
     return results
 
@@ -209,8 +134,8 @@ def create_comprehensive_visualizations(mega_factors_df, results, ticker_groups)
     cum_small = (1 + mega_factors_df['Small_50']).cumprod()
     cum_big = (1 + mega_factors_df['Big_50']).cumprod()
     
-    axes[0,0].plot(mega_factors_df.index, cum_small, label='Small Portfolio (101-200위)', linewidth=2, color='red')
-    axes[0,0].plot(mega_factors_df.index, cum_big, label='Big Portfolio (1-100위)', linewidth=2, color='blue')
+    plot_line(axes[0,0], mega_factors_df.index, cum_small, label='Small Portfolio (101-200위)', linewidth=2, color='red')
+    plot_line(axes[0,0], mega_factors_df.index, cum_big, label='Big Portfolio (1-100위)', linewidth=2, color='blue')
     axes[0,0].set_title('A. 메가캡 포트폴리오 누적 성과 (50-50 분할)', fontweight='bold')
     axes[0,0].set_ylabel('Cumulative Return')
     axes[0,0].legend()
@@ -221,8 +146,8 @@ def create_comprehensive_visualizations(mega_factors_df, results, ticker_groups)
     for i, (q, color) in enumerate(zip(['Q1', 'Q2', 'Q3', 'Q4', 'Q5'], colors)):
         if q in mega_factors_df.columns:
             cum_q = (1 + mega_factors_df[q]).cumprod()
-            axes[0,1].plot(mega_factors_df.index, cum_q, label=f'{q} (순위 {i*40+1}-{(i+1)*40})', 
-                          linewidth=2, color=color)
+            plot_line(axes[0,1], mega_factors_df.index, cum_q, label=f'{q} (순위 {i*40+1}-{(i+1)*40})', 
+                                linewidth=2, color=color)
     
     axes[0,1].set_title('B. Quintile 포트폴리오 성과 비교', fontweight='bold')
     axes[0,1].set_ylabel('Cumulative Return')
@@ -230,12 +155,12 @@ def create_comprehensive_visualizations(mega_factors_df, results, ticker_groups)
     axes[0,1].grid(True, alpha=0.3)
     
     # 1-3: SMB 팩터들 비교
-    axes[1,0].plot(mega_factors_df.index, mega_factors_df['SMB_50'].cumsum(), 
-                   label='SMB_50 (50-50 분할)', linewidth=2, color='green')
-    axes[1,0].plot(mega_factors_df.index, mega_factors_df['SMB_30'].cumsum(), 
-                   label='SMB_30 (Bottom30-Top30)', linewidth=2, color='purple')
-    axes[1,0].plot(mega_factors_df.index, mega_factors_df['SMB_Q5Q1'].cumsum(), 
-                   label='SMB_Q5Q1 (Q5-Q1)', linewidth=2, color='orange')
+    plot_line(axes[1,0], mega_factors_df.index, mega_factors_df['SMB_50'].cumsum(), 
+                         label='SMB_50 (50-50 분할)', linewidth=2, color='green')
+    plot_line(axes[1,0], mega_factors_df.index, mega_factors_df['SMB_30'].cumsum(), 
+                         label='SMB_30 (Bottom30-Top30)', linewidth=2, color='purple')
+    plot_line(axes[1,0], mega_factors_df.index, mega_factors_df['SMB_Q5Q1'].cumsum(), 
+                         label='SMB_Q5Q1 (Q5-Q1)', linewidth=2, color='orange')
     
     axes[1,0].set_title('C. 다양한 SMB 팩터 누적 성과', fontweight='bold')
     axes[1,0].set_ylabel('Cumulative SMB Return')
@@ -276,7 +201,7 @@ def create_comprehensive_visualizations(mega_factors_df, results, ticker_groups)
     
     for i, (smb_factor, title) in enumerate(zip(smb_factors, titles)):
         if smb_factor in results:
-            stage1_df = results[smb_factor]['stage1_df']
+            stage1_df = results[smb_factor].stage1_df
             
             # 베타 분포
             axes[0,i].hist(stage1_df['beta_smb_mega'], bins=20, alpha=0.7, 
@@ -292,7 +217,7 @@ def create_comprehensive_visualizations(mega_factors_df, results, ticker_groups)
                           bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
             
             # 일별 프리미엄 분포
-            stage2_df = results[smb_factor]['stage2_df']
+            stage2_df = results[smb_factor].stage2_df
             axes[1,i].hist(stage2_df['gamma_smb_mega'], bins=30, alpha=0.7, 
                           color=['green', 'purple', 'orange'][i], edgecolor='black')
             axes[1,i].axvline(stage2_df['gamma_smb_mega'].mean(), color='red', 
@@ -302,7 +227,7 @@ def create_comprehensive_visualizations(mega_factors_df, results, ticker_groups)
             axes[1,i].set_ylabel('Frequency')
             
             # 통계 정보
-            factor_results = results[smb_factor]['factor_results']['gamma_smb_mega']
+            factor_results = results[smb_factor].premiums['gamma_smb_mega']
             axes[1,i].text(0.05, 0.95, f'연간: {factor_results["annual_premium"]:.1%}\n'
                                       f't-stat: {factor_results["t_stat"]:.2f}\n'
                                       f'p-value: {factor_results["p_value"]:.3f}', 
@@ -320,10 +245,9 @@ def create_comprehensive_visualizations(mega_factors_df, results, ticker_groups)
     # 3-1: Rolling correlation (SMB vs Market)
     window = 252  # 1년
     rolling_corr = mega_factors_df['SMB_50'].rolling(window).corr(
-        pd.read_csv('us_market/paper/Size_Reversal/back_data/data2_fama_french_factors.csv', 
-                   index_col=0, parse_dates=True)['Mkt-RF'])
+        load_ff_factors()['Mkt-RF'])
     
-    axes[0,0].plot(rolling_corr.index, rolling_corr, linewidth=2, color='blue')
+    plot_line(axes[0,0], rolling_corr.index, rolling_corr, linewidth=2, color='blue')
     axes[0,0].set_title('A. SMB-Market 1년 Rolling Correlation', fontweight='bold')
     axes[0,0].set_ylabel('Correlation')
     axes[0,0].grid(True, alpha=0.3)
@@ -331,19 +255,18 @@ def create_comprehensive_visualizations(mega_factors_df, results, ticker_groups)
     
     # 3-2: Rolling volatility
     rolling_vol_smb = mega_factors_df['SMB_50'].rolling(window).std() * np.sqrt(252)
-    rolling_vol_market = pd.read_csv('us_market/paper/Size_Reversal/back_data/data2_fama_french_factors.csv', 
-                                   index_col=0, parse_dates=True)['Mkt-RF'].rolling(window).std() * np.sqrt(252)
+    rolling_vol_market = load_ff_factors()['Mkt-RF'].rolling(window).std() * np.sqrt(252)
     
-    axes[0,1].plot(rolling_vol_smb.index, rolling_vol_smb, label='SMB Volatility', linewidth=2, color='red')
-    axes[0,1].plot(rolling_vol_market.index, rolling_vol_market, label='Market Volatility', linewidth=2, color='blue')
+    plot_line(axes[0,1], rolling_vol_smb.index, rolling_vol_smb, label='SMB Volatility', linewidth=2, color='red')
+    plot_line(axes[0,1], rolling_vol_market.index, rolling_vol_market, label='Market Volatility', linewidth=2, color='blue')
     axes[0,1].set_title('B. 1년 Rolling Volatility', fontweight='bold')
     axes[0,1].set_ylabel('Annualized Volatility')
     axes[0,1].legend()
     axes[0,1].grid(True, alpha=0.3)
     
     # 3-3: 월별 SMB 성과
-    monthly_smb = mega_factors_df['SMB_50'].resample('M').sum()
-    monthly_performance = monthly_smb.groupby(monthly_smb.index.month).mean() * 12
+    monthly_smb = load_portfolio_returns()['smb_mega']
+    monthly_performance = regime_means(monthly_smb, monthly_smb.index.month) * 12
     
     months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
@@ -356,14 +279,12 @@ def create_comprehensive_visualizations(mega_factors_df, results, ticker_groups)
     axes[1,0].axhline(y=0, color='black', linestyle='-', alpha=0.8)
     
     # 3-4: 연도별 성과
-    yearly_performance = {}
-    for year in range(2021, 2025):
-        year_data = mega_factors_df[mega_factors_df.index.year == year]['SMB_50']
-        if len(year_data) > 0:
-            yearly_performance[year] = year_data.sum()
+    yearly_stats = factor_subperiod_stats(build_prefix_sums(mega_factors_df[['SMB_50']]),
+                                          annual_ranges(range(2021, 2025)))
+    yearly_stats = yearly_stats[yearly_stats['observations'] > 0]
     
-    years = list(yearly_performance.keys())
-    year_returns = list(yearly_performance.values())
+    years = yearly_stats['period'].tolist()
+    year_returns = yearly_stats['total'].tolist()
     
     bars = axes[1,1].bar([str(y) for y in years], [r*100 for r in year_returns], 
                         color=['red' if x < 0 else 'blue' for x in year_returns])
@@ -397,7 +318,7 @@ def create_results_summary_table(results):
     
     for smb_factor in ['SMB_50', 'SMB_30', 'SMB_Q5Q1']:
         if smb_factor in results:
-            factor_results = results[smb_factor]['factor_results']
+            factor_results = results[smb_factor].premiums
             
             for factor_name, factor_key in [('Market', 'gamma_market'), 
                                           ('Size', 'gamma_smb_mega'), 
@@ -444,11 +365,26 @@ def main():
     # 1. 데이터 준비
     stocks_df, returns_df, ff_df = load_and_prepare_data()
     
-    # 2. 향상된 팩터 구성
-    mega_factors_df, ticker_groups = create_enhanced_mega_factors(stocks_df, returns_df)
+    # 2. 향상된 팩터 구성 (시점 기준 유니버스 색인)
+    universe = load_universe(stocks_df, returns_df)
+    summarize_universe(universe)
+    mega_factors_df, ticker_groups = create_enhanced_mega_factors(stocks_df, returns_df, universe=universe)
+    
+    # 2-1. 월간 복리 집계 (portfolio_returns.csv)
+    aggregate_and_save(mega_factors_df, ff_df)
     
-    # 3. 향상된 Fama-MacBeth 분석
-    results = enhanced_fama_macbeth(returns_df, ff_df, mega_factors_df, ticker_groups)
+    # 3. 향상된 Fama-MacBeth 분석 (유효성 비트맵은 한 번만 계산해 모든 SMB 사양이 공유)
+    validity = build_validity_mask(returns_df)
+    summarize_validity(validity)
+    results = enhanced_fama_macbeth(returns_df, ff_df, mega_factors_df, ticker_groups, validity)
+    save_stage_artifacts(results)
+    
+    # 3-1. 사양별 감마 이력 (연도 분할 저장소, 표본 날짜는 이번 실행 값으로 교체 → 더 이상 풀리지 않는 날짜는 삭제)
+    common_dates = align(returns_df, ff_df, mega_factors_df)[0].index
+    written = set()
+    for smb_factor, result in results.items():
+        written.update(append_gamma_history(frame_accumulator(result.stage2_df, common_dates), smb_factor))
+    print(f"   ✅ 감마 이력 갱신: {', '.join(results)} ({len(written)}개 연도)")
     
     # 4. 종합 시각화
     create_comprehensive_visualizations(mega_factors_df, results, ticker_groups)
@@ -456,6 +392,14 @@ def main():
     # 5. 결과 요약
     summary_df = create_results_summary_table(results)
     
+    # 6. 결과 저장소 기록 (사양별 Stage 1/2/3)
+    conn = connect_store()
+    run_id = record_run(conn, 'enhanced_mega_cap_analysis.py', 'SMB_50 / SMB_30 / SMB_Q5Q1')
+    for smb_factor, result in results.items():
+        record_specification(conn, run_id, smb_factor, result.premiums, result.stage1_df, result.stage2_df)
+    conn.close()
+    print(f"   ✅ 결과 저장소 기록: run {run_id}")
+    
     print(f"\n" + "=" * 60)
     print(f"🎯 향상된 분석 완료")
     print(f"=" * 60)
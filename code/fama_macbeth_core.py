@@ -0,0 +1,476 @@
+"""
+Fama-MacBeth 벡터화 솔버
+티커·날짜별 루프 없이 Stage 1/2/3을 배치 행렬 연산으로 계산
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from panel_validity import build_validity_mask, align_validity, restrict_rows
+from least_squares import batched_least_squares, drop_report, SOLVED, QR_FALLBACK
+from gamma_history import gamma_accumulator, accumulate
+from fama_macbeth_results import PremiumTable, Stage1Result, Stage2Result, FamaMacBethResult
+from precision import (
+    resolve_dtype, is_reduced, accumulate_product, accumulate_matmul, sample_indices, check_precision
+)
+
+# 기존 스크립트와 동일한 표본 조건
+MIN_STAGE1_OBS = 50     # Stage 1: 유효 관측치 50개 초과 티커만
+MIN_STAGE2_BETAS = 10   # Stage 2: 베타가 있는 주식 10개 초과인 날짜만
+MIN_STAGE2_VALID = 5    # Stage 2: 결측치 제거 후 5개 초과인 날짜만
+STAGE2_BATCH = 64       # Stage 2 배치 행렬곱 한 번에 묶는 설계행렬 수 (메모리 상한)
+STAGE2_DATE_BLOCK = 256 # 날짜별 설계행렬(특성 패널) Stage 2를 한 번에 처리하는 날짜 수
+
+BETA_COLUMNS = ['beta_market', 'beta_smb_mega', 'beta_hml']
+GAMMA_COLUMNS = ['gamma_market', 'gamma_smb_mega', 'gamma_hml']
+
+
+def build_design(ff_aligned, smb_factor):
+    """
+    Stage 1 설계행렬 [상수, Mkt-RF, SMB_mega, HML] (T x 4)와 유효 행 마스크
+    """
+    X = np.column_stack([
+        np.ones(len(ff_aligned)),
+        ff_aligned['Mkt-RF'].to_numpy(dtype=float),
+        np.asarray(smb_factor, dtype=float),
+        ff_aligned['HML'].to_numpy(dtype=float)
+    ])
+    row_valid = np.isfinite(X).all(axis=1)
+    return X, row_valid
+
+
+def stage1_moments(excess, valid, X, dtype=np.float64):
+    """
+    티커별 X'X (N x K x K)와 X'y (N x K)를 한 번의 행렬곱으로
+    X'X = Σ_t m_tn x_t x_t'  →  (T x N)' @ (T x K²)
+    """
+    T, K = X.shape
+    weights = valid.astype(dtype)
+    y = np.where(valid, excess, 0.0).astype(dtype, copy=False)
+    X0 = np.where(np.isfinite(X), X, 0.0).astype(dtype, copy=False)
+
+    outer = (X0[:, :, None] * X0[:, None, :]).reshape(T, K * K)
+    gram = accumulate_product(weights, outer, dtype).reshape(-1, K, K)
+    rhs = accumulate_product(y, X0, dtype)
+    return gram, rhs
+
+
+def stage1_betas(excess, valid, X, observations=None, dtype=np.float64):
+    """
+    Stage 1 시계열 회귀를 모든 티커에 대해 한 번에 계산
+
+    excess: 초과수익률 (T x N, 결측치 포함), valid: 유효 관측치 마스크 (T x N)
+    X: 공통 설계행렬 (T x K), 결측 행은 valid에서 미리 제외되어 있어야 함
+    observations: 선택, 유효성 비트맵에서 미리 계산한 티커별 관측 수
+    dtype: 패널 연산 정밀도 (Gram 누적과 풀이는 항상 float64)
+    반환: 계수 (N x K), 관측치 수 (N,), 추정 성공 여부 (N,), 상태 코드 (N,)
+    """
+    gram, rhs = stage1_moments(excess, valid, X, dtype)
+
+    if observations is None:
+        observations = valid.sum(axis=0)
+    def fallback(n):
+        rows = valid[:, n]
+        return X[rows].astype(float), np.asarray(excess[rows, n], dtype=float)
+
+    ok = observations > MIN_STAGE1_OBS
+    coeffs, status = batched_least_squares(gram, rhs, ok, fallback)
+    ok = (status == SOLVED) | (status == QR_FALLBACK)
+
+    return coeffs, observations, ok, status
+
+
+def stage1_betas_varying(excess, valid, X_shared, F, position, observations=None, dtype=np.float64):
+    """
+    한 열만 다른 B개의 설계행렬에 대한 Stage 1 배치 계산 (순열 검정 등)
+
+    X_shared: 공통 열 (T x Ks), 결측 행은 valid에서 미리 제외되어 있어야 함
+    F: 바뀌는 열의 후보들 (T x B), 결측인 (날짜, 후보)는 그 후보의 표본에서만 제외 (배치 구성과 무관)
+    position: 전체 설계행렬에서 바뀌는 열의 위치
+    observations: 선택, 유효성 비트맵에서 미리 계산한 티커별 관측 수
+    dtype: 패널 연산 정밀도 (Gram 누적과 풀이는 항상 float64)
+    반환: 계수 (B x N x K), 관측치 수 (B x N), 추정 성공 여부 (B x N), 상태 코드 (B x N)
+    """
+    T, Ks = X_shared.shape
+    B = F.shape[1]
+    K = Ks + 1
+    weights = valid.astype(dtype)
+    y = np.where(valid, excess, 0.0).astype(dtype, copy=False)
+    X_shared = X_shared.astype(dtype, copy=False)
+    F0 = np.where(np.isfinite(F), F, 0.0).astype(dtype, copy=False)
+
+    # 공통 블록: 모든 순열이 공유
+    outer = (X_shared[:, :, None] * X_shared[:, None, :]).reshape(T, Ks * Ks)
+    shared_gram = accumulate_product(weights, outer, dtype).reshape(-1, Ks, Ks)   # N x Ks x Ks
+    shared_rhs = accumulate_product(y, X_shared, dtype)                           # N x Ks
+
+    # 교차 블록: 공통 열 j마다 (m * x_j)' @ F 한 번의 행렬곱
+    cross = np.stack([accumulate_product(weights * X_shared[:, [j]], F0, dtype)
+                      for j in range(Ks)], axis=-1)                               # N x B x Ks
+    var_gram = accumulate_product(weights, F0 ** 2, dtype)                       # N x B
+    var_rhs = accumulate_product(y, F0, dtype)                                    # N x B
+
+    # 일부 후보만 결측인 날짜: 공통 블록에서 후보별로 그 날짜 기여분 차감 (교차·분산 블록은 F0 = 0)
+    missing = ~np.isfinite(F)
+    rows = np.flatnonzero(missing.any(axis=1))
+    D = missing[rows].astype(float)                                               # P x B
+    shared_gram = shared_gram[None] - np.einsum('pn,pb,pk->bnk', weights[rows].astype(float), D,
+                                                outer[rows].astype(float)).reshape(B, -1, Ks, Ks)
+    shared_rhs = shared_rhs[None] - np.einsum('pn,pb,pk->bnk', y[rows].astype(float), D,
+                                              X_shared[rows].astype(float))
+
+    # 전체 K x K 행렬 조립 (바뀌는 열을 position 위치에 삽입)
+    idx = [i for i in range(K) if i != position]
+    gram = np.empty((B, shared_gram.shape[1], K, K))
+    gram[:, :, np.ix_(idx, idx)[0], np.ix_(idx, idx)[1]] = shared_gram
+    gram[:, :, position, idx] = cross.transpose(1, 0, 2)
+    gram[:, :, idx, position] = cross.transpose(1, 0, 2)
+    gram[:, :, position, position] = var_gram.T
+
+    rhs = np.empty((B, shared_rhs.shape[1], K))
+    rhs[:, :, idx] = shared_rhs
+    rhs[:, :, position] = var_rhs.T
+
+    if observations is None:
+        observations = valid.sum(axis=0)
+    observations = observations[None, :] - (D.T @ valid[rows]).astype(observations.dtype)
+    N = observations.shape[1]
+
+    def fallback(i):
+        b, n = divmod(i, N)
+        rows = valid[:, n] & np.isfinite(F[:, b])
+        design = np.insert(X_shared[rows].astype(float), position, F[rows, b], axis=1)
+        return design, np.asarray(excess[rows, n], dtype=float)
+
+    ok = observations > MIN_STAGE1_OBS
+    coeffs, status = batched_least_squares(gram, rhs, ok, fallback)
+    ok = (status == SOLVED) | (status == QR_FALLBACK)
+
+    return coeffs, observations, ok, status
+
+
+def rolling_stage1_betas(excess, valid, X, window, block_size=STAGE2_DATE_BLOCK):
+    """
+    날짜마다 직전 window 거래일 [t - window, t)로 추정한 Stage 1 계수 (표본 외 이동 베타)
+
+    X'X, X'y의 날짜 누적합 차로 창별 Gram을 만들고 날짜 블록마다 배치 풀이 (창 재합산 없음)
+    반환: 계수 (T x N x K, 추정 실패·첫 window일은 NaN), 추정 성공 여부 (T x N)
+    """
+    T, K = X.shape
+    N = excess.shape[1]
+    y = np.where(valid, excess, 0.0)
+    X0 = np.where(np.isfinite(X), X, 0.0)
+    outer = (X0[:, :, None] * X0[:, None, :]).reshape(T, K * K)
+
+    cum_gram = np.zeros((T + 1, N, K * K))
+    np.cumsum(valid[:, :, None] * outer[:, None, :], axis=0, out=cum_gram[1:])
+    cum_rhs = np.zeros((T + 1, N, K))
+    np.cumsum(y[:, :, None] * X0[:, None, :], axis=0, out=cum_rhs[1:])
+    cum_obs = np.zeros((T + 1, N), dtype=np.int64)
+    np.cumsum(valid, axis=0, out=cum_obs[1:])
+
+    coeffs = np.full((T, N, K), np.nan)
+    ok = np.zeros((T, N), dtype=bool)
+    for start in range(window, T, block_size):
+        stop = min(start + block_size, T)
+        lo = np.arange(start, stop) - window
+        gram = (cum_gram[start:stop] - cum_gram[lo]).reshape(-1, N, K, K)
+        rhs = cum_rhs[start:stop] - cum_rhs[lo]
+        observations = cum_obs[start:stop] - cum_obs[lo]
+
+        def fallback(i, start=start):
+            t, n = divmod(i, N)
+            rows = slice(start + t - window, start + t)
+            keep = valid[rows, n]
+            return X[rows][keep].astype(float), np.asarray(excess[rows, n][keep], dtype=float)
+
+        coeffs[start:stop], status = batched_least_squares(gram, rhs, observations > MIN_STAGE1_OBS, fallback)
+        ok[start:stop] = (status == SOLVED) | (status == QR_FALLBACK)
+
+    return coeffs, ok
+
+
+def stage2_gammas(returns, valid, betas, beta_ok, dtype=np.float64):
+    """
+    Stage 2 횡단면 회귀를 모든 날짜(및 배치)에 대해 한 번에 계산
+
+    returns: 수익률 (T x N), valid: 유효 관측치 마스크 (T x N)
+    betas: Stage 1 베타 (N x F) 또는 배치 (B x N x F), beta_ok: (N,) 또는 (B x N)
+    dtype: 패널 연산 정밀도 (횡단면 곱은 dtype, 티커 블록 부분합 누적과 풀이는 float64)
+    반환: 감마 (T x K) 또는 (B x T x K), 날짜별 주식 수 (T,) 또는 (B x T), 상태 코드 (T,) 또는 (B x T)
+    """
+    single = betas.ndim == 2
+    if single:
+        betas = betas[None]
+        beta_ok = beta_ok[None]
+
+    B, N, F = betas.shape
+    K = F + 1
+    T = returns.shape[0]
+
+    # 상수항 추가, 베타가 없는 티커는 0으로 두어 합계에 기여하지 않게 함
+    Z = np.concatenate([np.ones((B, N, 1)), betas], axis=2)
+    Z = np.where(beta_ok[..., None], Z, 0.0).astype(dtype, copy=False)
+
+    weights = valid.astype(dtype)
+    y = np.where(valid, returns, 0.0).astype(dtype, copy=False)
+    counts = (valid.astype(float) @ beta_ok.T.astype(float)).T.astype(int)   # B x T
+    ok = (counts > MIN_STAGE2_VALID) & (beta_ok.sum(axis=1) > MIN_STAGE2_BETAS)[:, None]
+
+    gammas = np.full((B, T, K), np.nan)
+    status = np.empty((B, T), dtype=int)
+    for start in range(0, B, STAGE2_BATCH):
+        stop = min(start + STAGE2_BATCH, B)
+        Zb = Z[start:stop]
+
+        # 날짜별 Z'Z = Σ_n m_tn z_n z_n'  →  배치 전체를 (T x N) @ (N x B·K²) 한 번의 행렬곱으로
+        outer = (Zb[..., :, None] * Zb[..., None, :]).reshape(stop - start, N, K * K)
+        outer = outer.transpose(1, 0, 2).reshape(N, -1)
+        gram = accumulate_product(weights.T, outer, dtype).reshape(T, stop - start, K, K).transpose(1, 0, 2, 3)
+        rhs = accumulate_product(y.T, Zb.transpose(1, 0, 2).reshape(N, -1), dtype)
+        rhs = rhs.reshape(T, stop - start, K).transpose(1, 0, 2)
+
+        def fallback(i, start=start):
+            b, t = divmod(i, T)
+            rows = valid[t] & beta_ok[start + b]
+            return Z[start + b][rows].astype(float), np.asarray(returns[t, rows], dtype=float)
+
+        gammas[start:stop], status[start:stop] = batched_least_squares(gram, rhs, ok[start:stop], fallback)
+
+    n_stocks = np.where(ok, counts, 0)
+    if single:
+        return gammas[0], n_stocks[0], status[0]
+    return gammas, n_stocks, status
+
+
+def industry_codes(industries, tickers):
+    """
+    티커별 산업 번호 (N,) 와 산업 이름 목록
+    industries: 티커 → 산업 라벨 Series (또는 tickers와 같은 순서의 배열), 결측·미등록 티커는 -1
+    """
+    if isinstance(industries, pd.Series):
+        labels = industries.reindex(tickers)
+    else:
+        labels = pd.Series(np.asarray(industries, dtype=object), index=tickers)
+    codes, names = pd.factorize(labels, sort=True)
+    return codes.astype(np.int64), list(names)
+
+
+def stage2_industry_gammas(returns, valid, betas, beta_ok, codes, dtype=np.float64):
+    """
+    산업 고정효과를 포함한 Stage 2 (날짜별 산업 내 평균 차감, Frisch-Waugh-Lovell)
+
+    산업 더미를 설계행렬에 펼치지 않고, 희소 산업 지시행렬 D (N x G) 와의 행렬곱으로
+    날짜별 산업 합계만 구해 Z'Z, Z'y에서 산업 평균 성분을 빼므로 비용은 O(T·N·F + T·G·F²)
+    codes: 티커별 산업 번호 (N,), -1인 티커는 회귀에서 제외
+    반환: stage2_gammas와 같은 형식, gamma_0은 산업 절편의 종목 수 가중 평균 (= 평균 수익률 - 평균 베타'γ)
+    """
+    from scipy import sparse
+
+    N, F = betas.shape
+    T = returns.shape[0]
+    member = beta_ok & (codes >= 0)
+    G = int(codes.max()) + 1 if member.any() else 0
+
+    # 산업 내 차감은 전체 상수 이동에 불변 → 베타를 전체 평균으로 중심화해 상쇄 오차 축소
+    center = betas[member].mean(axis=0) if member.any() else np.zeros(F)
+    Z = np.where(member[:, None], betas - center, 0.0).astype(dtype, copy=False)
+
+    rows = valid & member[None, :]
+    weights = rows.astype(dtype)
+    y = np.where(rows, returns, 0.0).astype(dtype, copy=False)
+
+    # 산업 지시행렬과 산업별 베타 합 행렬 (N x G, N x G·F) — 종목마다 비영 원소 1개·F개
+    # float64 희소행렬이라 산업별 합계는 dtype과 무관하게 float64로 누적
+    tickers = np.flatnonzero(member)
+    D = sparse.csr_matrix((np.ones(len(tickers)), (tickers, codes[tickers])), shape=(N, G))
+    DZ = sparse.csr_matrix((Z[tickers].astype(float).ravel(),
+                            (np.repeat(tickers, F), (codes[tickers][:, None] * F + np.arange(F)).ravel())),
+                           shape=(N, G * F))
+
+    counts_g = np.asarray((D.T @ weights.T).T, dtype=float)                     # T x G
+    sum_zg = np.asarray((DZ.T @ weights.T).T, dtype=float).reshape(T, G, F)     # T x G x F
+    sum_yg = np.asarray((D.T @ y.T).T, dtype=float)                             # T x G
+    inverse = np.divide(1.0, counts_g, out=np.zeros_like(counts_g), where=counts_g > 0)
+
+    # 전체 합계 - 산업 평균 성분
+    outer = (Z[:, :, None] * Z[:, None, :]).reshape(N, F * F)
+    gram = accumulate_product(weights.T, outer, dtype).reshape(T, F, F)
+    gram -= np.einsum('tgf,tgh,tg->tfh', sum_zg, sum_zg, inverse)
+    rhs = accumulate_product(y.T, Z, dtype) - np.einsum('tgf,tg,tg->tf', sum_zg, sum_yg, inverse)
+
+    counts = rows.sum(axis=1)
+    industries = (counts_g > 0).sum(axis=1)
+    ok = (counts > MIN_STAGE2_VALID) & (counts - industries > F) & (member.sum() > MIN_STAGE2_BETAS)
+
+    def fallback(t):
+        code, z, r = codes[rows[t]], Z[rows[t]].astype(float), returns[t, rows[t]].astype(float)
+        n = np.bincount(code, minlength=G)[code]
+        z_mean = np.stack([np.bincount(code, weights=z[:, f], minlength=G)[code] for f in range(F)], axis=1)
+        z_mean /= n[:, None]
+        r_mean = np.bincount(code, weights=r, minlength=G)[code] / n
+        return z - z_mean, r - r_mean
+
+    slopes, status = batched_least_squares(gram, rhs, ok, fallback)
+
+    # 평균 절편: (Σy - Σ(β)'γ) / n, 중심화 전 베타 기준
+    mean_y = y.sum(axis=1).astype(float) / np.maximum(counts, 1)
+    mean_z = accumulate_product(weights.T, Z, dtype) / np.maximum(counts, 1)[:, None] + center
+    gammas = np.concatenate([(mean_y - (mean_z * slopes).sum(axis=1))[:, None], slopes], axis=1)
+    return gammas, np.where(ok, counts, 0), status
+
+
+def stage2_gammas_panel(returns, valid, Z, z_ok, dtype=np.float64, block_size=STAGE2_DATE_BLOCK):
+    """
+    날짜마다 설계행렬이 다른 Stage 2 (특성 회귀): 날짜 블록 단위로 스트리밍
+
+    returns: 수익률 (T x N), valid: 유효 관측치 마스크 (T x N)
+    Z: 회귀변수 (T x N x K, 상수항 포함) 또는 블록 → (Tb x N x K)를 돌려주는 함수 Z(start, stop)
+    z_ok: 회귀변수가 모두 관측된 셀 (T x N) 또는 Z와 같은 형태의 함수
+    반환: 감마 (T x K), 날짜별 주식 수 (T,), 상태 코드 (T,)
+    """
+    T = returns.shape[0]
+    gammas = status = n_stocks = None
+
+    for start in range(0, T, block_size):
+        stop = min(start + block_size, T)
+        Zb = Z(start, stop) if callable(Z) else Z[start:stop]
+        zb_ok = z_ok(start, stop) if callable(z_ok) else z_ok[start:stop]
+        if gammas is None:
+            K = Zb.shape[-1]
+            gammas = np.full((T, K), np.nan)
+            status = np.empty(T, dtype=int)
+            n_stocks = np.zeros(T, dtype=int)
+
+        # 제외 셀을 0으로 둔 뒤 날짜별 Z'Z, Z'y를 배치 행렬곱 한 번으로 (Tb x K x K)
+        rows = valid[start:stop] & zb_ok
+        Zb = np.where(rows[..., None], Zb, 0.0).astype(dtype, copy=False)
+        y = np.where(rows, returns[start:stop], 0.0).astype(dtype, copy=False)
+        Zt = Zb.transpose(0, 2, 1)
+        gram = accumulate_matmul(Zt, Zb, dtype)
+        rhs = accumulate_matmul(Zt, y[..., None], dtype)[..., 0]
+
+        counts = rows.sum(axis=1)
+        ok = counts > max(MIN_STAGE2_VALID, K)
+
+        def fallback(t, Zb=Zb, rows=rows, y=y):
+            return Zb[t][rows[t]].astype(float), y[t][rows[t]].astype(float)
+
+        gammas[start:stop], status[start:stop] = batched_least_squares(gram, rhs, ok, fallback)
+        n_stocks[start:stop] = np.where(ok, counts, 0)
+
+    return gammas, n_stocks, status
+
+
+def stage3_summary(gammas, axis=-2):
+    """
+    Stage 3: 감마 시계열 평균, t-통계량, p-value (NaN 날짜 제외)
+    평균·분산은 입력 정밀도와 무관하게 float64로 누적
+    """
+    gammas = np.asarray(gammas, dtype=float)
+    finite = np.isfinite(gammas)
+    n = finite.sum(axis=axis)
+    g0 = np.where(finite, gammas, 0.0)
+    mean = g0.sum(axis=axis) / n
+    dev = np.where(finite, gammas - np.expand_dims(mean, axis), 0.0)
+    std = np.sqrt((dev ** 2).sum(axis=axis) / (n - 1))
+    t_stat = mean / (std / np.sqrt(n))
+    p_value = 2 * (1 - stats.t.cdf(np.abs(t_stat), n - 1))
+    return mean, std, t_stat, p_value, n
+
+
+def verify_reduced_precision(excess, returns, stage1_valid, valid, X, observations,
+                             coeffs, ok, gammas, codes=None):
+    """
+    float32 결과를 float64 표본(일부 티커의 Stage 1, 일부 날짜의 Stage 2와 그 날짜들의 프리미엄)과 비교
+    반환: {'stage1': 상대오차, 'stage2': 상대오차, 'premium': 상대오차}
+    """
+    cols = sample_indices(excess.shape[1])
+    exact, _, exact_ok, _ = stage1_betas(excess[:, cols], stage1_valid[:, cols], X, observations[cols])
+    both = exact_ok & ok[cols]
+    stage1_error = check_precision(coeffs[cols][both], exact[both], 'Stage 1 베타')
+
+    # Stage 2는 같은 베타로 표본 날짜만 float64 재계산
+    rows = sample_indices(returns.shape[0])
+    if codes is None:
+        exact, _, _ = stage2_gammas(returns[rows], valid[rows], coeffs[:, 1:], ok)
+    else:
+        exact, _, _ = stage2_industry_gammas(returns[rows], valid[rows], coeffs[:, 1:], ok, codes)
+    stage2_error = check_precision(gammas[rows], exact, 'Stage 2 감마')
+    premium_error = check_precision(stage3_summary(gammas[rows])[0], stage3_summary(exact)[0], 'Stage 3 프리미엄')
+
+    return {'stage1': stage1_error, 'stage2': stage2_error, 'premium': premium_error}
+
+
+def run_fama_macbeth(returns_aligned, ff_aligned, smb_factor, tickers=None, validity=None,
+                     precision='float64', industries=None):
+    """
+    정렬된 데이터로 3단계 Fama-MacBeth 실행, 기존 스크립트와 같은 형식으로 반환
+    (factor_results, stage1_df, stage2_df, drops) — 인자는 fit_fama_macbeth와 같음
+    """
+    return fit_fama_macbeth(returns_aligned, ff_aligned, smb_factor, tickers, validity,
+                            precision, industries).as_tuple()
+
+
+def fit_fama_macbeth(returns_aligned, ff_aligned, smb_factor, tickers=None, validity=None,
+                     precision='float64', industries=None):
+    """
+    정렬된 데이터로 3단계 Fama-MacBeth 실행, 배열 결과 컨테이너 (FamaMacBethResult)로 반환
+    (drops: Stage 1 티커·Stage 2 날짜의 제외/QR 대체 내역, least_squares.drop_report)
+
+    validity: 선택, 전체 패널에서 한 번 만든 유효성 비트맵 (panel_validity.build_validity_mask)
+    precision: 'float64'(기본) 또는 'float32' (대용량 반복용, float64 표본 검증 후 오차 초과 시 경고)
+    industries: 선택, 티커 → 산업 라벨 Series. 주면 Stage 2에 산업 고정효과 포함 (stage2_industry_gammas,
+                산업 라벨이 없는 티커는 Stage 2에서 제외)
+    """
+    dtype = resolve_dtype(precision)
+
+    if tickers is not None:
+        returns_aligned = returns_aligned[[t for t in returns_aligned.columns if t in set(tickers)]]
+
+    if validity is None:
+        validity = build_validity_mask(returns_aligned)
+    else:
+        validity = align_validity(validity, returns_aligned.index, returns_aligned.columns)
+
+    R = returns_aligned.to_numpy(dtype=float)
+    rf = ff_aligned['RF'].to_numpy(dtype=float)
+    X, row_valid = build_design(ff_aligned, smb_factor)
+    row_valid &= np.isfinite(rf)
+
+    # Stage 1: 초과수익률 시계열 회귀 (설계행렬 결측 행만 비트맵에서 제외)
+    excess = R - rf[:, None]
+    stage1_mask = restrict_rows(validity, row_valid)
+    coeffs, observations, ok, stage1_status = stage1_betas(excess, stage1_mask['valid'], X,
+                                                           stage1_mask['ticker_counts'], dtype=dtype)
+
+    stage1 = Stage1Result(returns_aligned.columns[ok], ['alpha'] + BETA_COLUMNS, coeffs[ok], observations[ok])
+
+    # Stage 2: 수익률의 횡단면 회귀 (선택: 산업 고정효과)
+    codes = None
+    if industries is None:
+        gammas, n_stocks, stage2_status = stage2_gammas(R, validity['valid'], coeffs[:, 1:], ok, dtype=dtype)
+    else:
+        codes, _ = industry_codes(industries, returns_aligned.columns)
+        gammas, n_stocks, stage2_status = stage2_industry_gammas(R, validity['valid'], coeffs[:, 1:], ok, codes,
+                                                                 dtype=dtype)
+
+    if is_reduced(dtype):
+        verify_reduced_precision(excess, R, stage1_mask['valid'], validity['valid'], X,
+                                 observations, coeffs, ok, gammas, codes)
+
+    acc = accumulate(gamma_accumulator(returns_aligned.index, ['gamma_0'] + GAMMA_COLUMNS), 0,
+                     gammas, n_stocks, stage2_status)
+    stage2 = Stage2Result.from_accumulator(acc)
+
+    # Stage 3: 시계열 평균 및 t-검정
+    mean, std, t_stat, p_value, n = stage3_summary(stage2.gammas[:, 1:], axis=0)
+    premiums = PremiumTable(GAMMA_COLUMNS, mean, t_stat, p_value, n)
+
+    drops = pd.concat([
+        drop_report(stage1_status, returns_aligned.columns, 'stage1'),
+        drop_report(stage2_status, returns_aligned.index, 'stage2')
+    ], ignore_index=True)
+
+    return FamaMacBethResult(premiums, stage1, stage2, drops)
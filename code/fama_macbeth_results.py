@@ -0,0 +1,166 @@
+"""
+Fama-MacBeth 결과 컨테이너 (__slots__, 연속 numpy 배열 + 라벨 인덱스)
+사양 수천 개를 메모리에 둘 때 dict·DataFrame 객체 부담 없이 배열만 보관하고,
+기존 형식 (factor_results dict, stage1_df, stage2_df)은 필요할 때만 변환
+"""
+
+import pandas as pd
+import numpy as np
+
+
+class PremiumTable:
+    """
+    Stage 3 요약: 팩터별 일별 프리미엄·t·p·관측 수 배열
+    기존 factor_results dict와 같은 조회 지원 (table['gamma_smb_mega']['annual_premium'], items())
+    """
+
+    __slots__ = ('factors', 'daily', 't_stat', 'p_value', 'observations', 'periods_per_year')
+
+    def __init__(self, factors, daily, t_stat, p_value, observations, periods_per_year=252):
+        self.factors = list(factors)
+        self.daily = np.asarray(daily, dtype=np.float64)
+        self.t_stat = np.asarray(t_stat, dtype=np.float64)
+        self.p_value = np.asarray(p_value, dtype=np.float64)
+        self.observations = np.asarray(observations, dtype=np.int64)
+        self.periods_per_year = periods_per_year
+
+    @property
+    def annual(self):
+        return self.daily * self.periods_per_year
+
+    def __getitem__(self, factor):
+        i = self.factors.index(factor)
+        return {
+            'daily_premium': float(self.daily[i]),
+            'annual_premium': float(self.daily[i] * self.periods_per_year),
+            't_stat': float(self.t_stat[i]),
+            'p_value': float(self.p_value[i]),
+            'observations': int(self.observations[i])
+        }
+
+    def __contains__(self, factor):
+        return factor in self.factors
+
+    def __iter__(self):
+        return iter(self.factors)
+
+    def __len__(self):
+        return len(self.factors)
+
+    def keys(self):
+        return list(self.factors)
+
+    def items(self):
+        return [(factor, self[factor]) for factor in self.factors]
+
+    def to_dict(self):
+        """기존 형식 {팩터: {daily_premium, annual_premium, t_stat, p_value, observations}}"""
+        return dict(self.items())
+
+    def frame(self):
+        """팩터 x 통계량 DataFrame"""
+        return pd.DataFrame({
+            'daily_premium': self.daily, 'annual_premium': self.annual, 't_stat': self.t_stat,
+            'p_value': self.p_value, 'observations': self.observations
+        }, index=pd.Index(self.factors, name='factor'))
+
+
+class Stage1Result:
+    """Stage 1 추정 성공 티커의 계수 (N x K)와 관측 수 (N,)"""
+
+    __slots__ = ('tickers', 'columns', 'coeffs', 'observations')
+
+    def __init__(self, tickers, columns, coeffs, observations):
+        self.tickers = pd.Index(tickers)
+        self.columns = list(columns)
+        self.coeffs = np.ascontiguousarray(coeffs, dtype=np.float64)
+        self.observations = np.asarray(observations, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def column(self, name):
+        """계수 한 열 (복사 없는 배열 뷰)"""
+        return self.coeffs[:, self.columns.index(name)]
+
+    def frame(self):
+        """기존 stage1_df 형식 (티커 인덱스, alpha·beta_*·observations)"""
+        stage1_df = pd.DataFrame(self.coeffs, index=self.tickers, columns=self.columns)
+        stage1_df['observations'] = self.observations
+        return stage1_df
+
+    @property
+    def nbytes(self):
+        return self.coeffs.nbytes + self.observations.nbytes
+
+
+class Stage2Result:
+    """Stage 2 풀린 날짜의 감마 (T x K)와 횡단면 주식 수 (T,)"""
+
+    __slots__ = ('dates', 'columns', 'gammas', 'n_stocks')
+
+    def __init__(self, dates, columns, gammas, n_stocks):
+        self.dates = pd.DatetimeIndex(dates)
+        self.columns = list(columns)
+        self.gammas = np.ascontiguousarray(gammas, dtype=np.float64)
+        self.n_stocks = np.asarray(n_stocks, dtype=np.int64)
+
+    @classmethod
+    def from_accumulator(cls, acc):
+        """gamma_history 누적기의 풀린 날짜만"""
+        solved = np.isfinite(acc['gammas']).all(axis=1)
+        return cls(acc['dates'][solved], acc['columns'], acc['gammas'][solved], acc['n_stocks'][solved])
+
+    def __len__(self):
+        return len(self.dates)
+
+    def column(self, name):
+        """감마 한 열 (복사 없는 배열 뷰)"""
+        return self.gammas[:, self.columns.index(name)]
+
+    def frame(self):
+        """기존 stage2_df 형식 (date, gamma_*, n_stocks)"""
+        stage2_df = pd.DataFrame(self.gammas, columns=self.columns)
+        stage2_df.insert(0, 'date', self.dates)
+        stage2_df['n_stocks'] = self.n_stocks
+        return stage2_df
+
+    @property
+    def nbytes(self):
+        return self.gammas.nbytes + self.n_stocks.nbytes + self.dates.nbytes
+
+
+class FamaMacBethResult:
+    """
+    한 사양의 Stage 1/2/3 결과
+    premiums: PremiumTable, stage1: Stage1Result, stage2: Stage2Result, drops: 제외/QR 대체 내역 DataFrame
+    stage1_df, stage2_df는 접근할 때마다 배열에서 새로 만듦 (보관하지 않음)
+    """
+
+    __slots__ = ('premiums', 'stage1', 'stage2', 'drops')
+
+    def __init__(self, premiums, stage1, stage2, drops=None):
+        self.premiums = premiums
+        self.stage1 = stage1
+        self.stage2 = stage2
+        self.drops = drops
+
+    @property
+    def factor_results(self):
+        return self.premiums
+
+    @property
+    def stage1_df(self):
+        return self.stage1.frame()
+
+    @property
+    def stage2_df(self):
+        return self.stage2.frame()
+
+    def as_tuple(self):
+        """run_fama_macbeth 형식 (factor_results, stage1_df, stage2_df, drops)"""
+        return self.premiums, self.stage1_df, self.stage2_df, self.drops
+
+    @property
+    def nbytes(self):
+        return self.stage1.nbytes + self.stage2.nbytes
@@ -0,0 +1,172 @@
+"""
+Stage 2 감마 이력: 사전 할당 배열 누적기와 날짜(연도) 분할 바이너리 저장소
+누적기는 (날짜 x 계수) float 배열 + 주식 수 int 배열, 저장소는 사양별 연도 파일 하나(구조화 .npy)씩
+추가(append)는 누적기 날짜가 걸친 연도 파일만 병합해 다시 쓰고, 기간 조회는 겹치는 연도 파일만 mmap으로 읽음
+"""
+
+import json
+import os
+
+import pandas as pd
+import numpy as np
+
+from least_squares import INSUFFICIENT_OBS
+
+HISTORY_DIR = 'us_market/paper/Size_Reversal/back_data/gamma_history'
+META_FILE = 'meta.json'
+
+
+def gamma_accumulator(dates, columns):
+    """
+    Stage 2 결과 누적기 (날짜 전체를 미리 할당, 풀리지 않은 날짜는 NaN)
+    columns: 계수 이름 (gamma_0 포함)
+    """
+    dates = pd.DatetimeIndex(dates)
+    return {
+        'dates': dates,
+        'columns': list(columns),
+        'gammas': np.full((len(dates), len(columns)), np.nan),
+        'n_stocks': np.zeros(len(dates), dtype=np.int64),
+        'status': np.full(len(dates), INSUFFICIENT_OBS)
+    }
+
+
+def accumulate(acc, start, gammas, n_stocks, status=None):
+    """날짜 블록 [start, start + len(gammas)) 결과 기록"""
+    stop = start + len(gammas)
+    acc['gammas'][start:stop] = gammas
+    acc['n_stocks'][start:stop] = n_stocks
+    if status is not None:
+        acc['status'][start:stop] = status
+    return acc
+
+
+def accumulator_frame(acc):
+    """풀린 날짜만 기존 stage2_df 형식 (date, gamma_*, n_stocks) DataFrame으로"""
+    solved = np.isfinite(acc['gammas']).all(axis=1)
+    stage2_df = pd.DataFrame(acc['gammas'][solved], columns=acc['columns'])
+    stage2_df.insert(0, 'date', acc['dates'][solved])
+    stage2_df['n_stocks'] = acc['n_stocks'][solved]
+    return stage2_df
+
+
+def frame_accumulator(stage2_df, dates=None):
+    """
+    stage2_df → 누적기 (저장용)
+    dates: 주면 그 날짜 전체로 누적기 (stage2_df에 없는 날짜는 풀리지 않은 NaN), 없으면 stage2_df 날짜만
+    """
+    columns = [c for c in stage2_df.columns if c.startswith('gamma')]
+    if dates is None:
+        dates = stage2_df['date']
+    acc = gamma_accumulator(dates, columns)
+    rows = acc['dates'].get_indexer(pd.DatetimeIndex(stage2_df['date']))
+    if (rows < 0).any():
+        raise ValueError(f"stage2_df 날짜 {int((rows < 0).sum())}개가 dates에 없음")
+    acc['gammas'][rows] = stage2_df[columns].to_numpy(dtype=float)
+    acc['n_stocks'][rows] = stage2_df['n_stocks'].to_numpy()
+    acc['status'][rows] = 0
+    return acc
+
+
+def _record_dtype(K):
+    """분할 파일 레코드: 날짜, 주식 수, 계수 K개 (mmap 가능한 고정 폭)"""
+    return np.dtype([('date', 'M8[ns]'), ('n_stocks', '<i8'), ('gammas', '<f8', (K,))])
+
+
+def _spec_dir(spec, data_dir):
+    return os.path.join(data_dir, spec)
+
+
+def _partition_path(spec, year, data_dir):
+    return os.path.join(_spec_dir(spec, data_dir), f'{year}.npy')
+
+
+def history_columns(spec, data_dir=HISTORY_DIR):
+    """저장된 계수 이름 (이력이 없으면 None)"""
+    path = os.path.join(_spec_dir(spec, data_dir), META_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)['columns']
+
+
+def history_partitions(spec, data_dir=HISTORY_DIR):
+    """저장된 연도 목록 (오름차순)"""
+    path = _spec_dir(spec, data_dir)
+    if not os.path.isdir(path):
+        return []
+    return sorted(int(name[:-4]) for name in os.listdir(path) if name.endswith('.npy') and name[:-4].isdigit())
+
+
+def append_gamma_history(acc, spec, data_dir=HISTORY_DIR):
+    """
+    누적기를 사양 이력에 추가
+    누적기 날짜가 걸친 연도 파일마다 기존 행 중 누적기 날짜와 겹치는 행만 버리고 새 풀린 행과 병합
+    (같은 날짜는 새 값으로 교체, 이번에 풀리지 않은 날짜는 삭제, 누적기 밖 날짜는 유지)
+    날짜 순 정렬 후 임시 파일 → os.replace, 남는 행이 없으면 파일 삭제
+    반환: 다시 쓴 연도 목록
+    """
+    columns = history_columns(spec, data_dir)
+    if columns is not None and columns != acc['columns']:
+        raise ValueError(f"{spec}: 저장된 계수 {columns}와 다름 {acc['columns']}")
+
+    os.makedirs(_spec_dir(spec, data_dir), exist_ok=True)
+    if columns is None:
+        with open(os.path.join(_spec_dir(spec, data_dir), META_FILE), 'w') as f:
+            json.dump({'columns': acc['columns']}, f, indent=1)
+
+    solved = np.isfinite(acc['gammas']).all(axis=1)
+    records = np.empty(int(solved.sum()), dtype=_record_dtype(len(acc['columns'])))
+    records['date'] = acc['dates'][solved].to_numpy(dtype='datetime64[ns]')
+    records['n_stocks'] = acc['n_stocks'][solved]
+    records['gammas'] = acc['gammas'][solved]
+
+    replaced = acc['dates'].to_numpy(dtype='datetime64[ns]')
+    years = acc['dates'][solved].year.to_numpy()
+    written = []
+    for year in np.unique(acc['dates'].year):
+        path = _partition_path(spec, int(year), data_dir)
+        merged = records[years == year]
+        if os.path.exists(path):
+            existing = np.load(path)
+            merged = np.concatenate([merged, existing[~np.isin(existing['date'], replaced)]])
+        if len(merged) == 0:
+            if not os.path.exists(path):
+                continue
+            os.remove(path)
+        else:
+            np.save(path + '.tmp.npy', merged[np.argsort(merged['date'], kind='stable')], allow_pickle=False)
+            os.replace(path + '.tmp.npy', path)
+        written.append(int(year))
+    return written
+
+
+def read_gamma_history(spec, start=None, end=None, columns=None, data_dir=HISTORY_DIR):
+    """
+    기간 [start, end] 감마 이력 (stage2_df 형식 DataFrame)
+    겹치는 연도 파일만 mmap으로 열어 기간 행·요청 열만 복사
+    """
+    names = history_columns(spec, data_dir)
+    if names is None:
+        raise FileNotFoundError(f"{spec}: 감마 이력 없음 ({data_dir})")
+    first_year = None if start is None else pd.Timestamp(start).year
+    last_year = None if end is None else pd.Timestamp(end).year
+    start = None if start is None else np.datetime64(pd.Timestamp(start), 'ns')
+    end = None if end is None else np.datetime64(pd.Timestamp(end), 'ns')
+    columns = names if columns is None else list(columns)
+    picks = [names.index(c) for c in columns]
+
+    parts = []
+    for year in history_partitions(spec, data_dir):
+        if (first_year is not None and year < first_year) or (last_year is not None and year > last_year):
+            continue
+        records = np.load(_partition_path(spec, year, data_dir), mmap_mode='r')
+        lo = 0 if start is None else records['date'].searchsorted(start, side='left')
+        hi = len(records) if end is None else records['date'].searchsorted(end, side='right')
+        parts.append(np.array(records[lo:hi]))
+
+    records = np.concatenate(parts) if parts else np.empty(0, dtype=_record_dtype(len(names)))
+    stage2_df = pd.DataFrame(records['gammas'][:, picks], columns=columns)
+    stage2_df.insert(0, 'date', pd.DatetimeIndex(records['date']))
+    stage2_df['n_stocks'] = records['n_stocks']
+    return stage2_df
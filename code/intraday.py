@@ -0,0 +1,225 @@
+"""
+장중(분봉) 수익률 패널 지원: 임의 봉 크기 재표본화, 일별 FF 팩터의 장중 시각 정렬, 거래일 묶음 단위 처리
+Stage 1은 묶음별 X'X, X'y를 더해 한 번에 풀고 (Gram은 시간에 대해 가법적), Stage 2는 묶음별로 풀어
+패널 전체를 메모리에 올리지 않고 수십억 행 규모의 분봉 이력을 처리
+"""
+
+import glob
+import os
+import time
+
+import pandas as pd
+import numpy as np
+import warnings
+warnings.filterwarnings('ignore')
+
+from fama_macbeth_core import (
+    build_design, stage1_moments, stage2_gammas, stage3_summary, MIN_STAGE1_OBS, BETA_COLUMNS, GAMMA_COLUMNS
+)
+from least_squares import batched_least_squares, drop_report, SOLVED, QR_FALLBACK
+from panel_validity import build_validity_mask, restrict_rows
+from universe_index import band_portfolios
+from gamma_history import gamma_accumulator, accumulate, append_gamma_history
+from fama_macbeth_results import PremiumTable, Stage1Result, Stage2Result, FamaMacBethResult
+
+# 거래일별 분봉 수익률 CSV (YYYY-MM-DD.csv, 첫 열 시각, 열 = 티커)
+INTRADAY_DIR = 'us_market/paper/Size_Reversal/back_data/intraday'
+DAYS_PER_CHUNK = 20     # 한 번에 메모리에 올리는 거래일 수
+DEFAULT_BAR = '5min'
+
+
+def trading_day_bounds(index):
+    """정렬된 시각 인덱스의 거래일 목록과 거래일별 시작 위치 (정수, 마지막에 len(index) 포함)"""
+    days = pd.DatetimeIndex(index).normalize()
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    return days[starts], np.append(starts, len(days))
+
+
+def day_chunks(index, days_per_chunk=DAYS_PER_CHUNK):
+    """거래일 경계에서 자른 (시작, 끝) 위치 목록 — 한 거래일은 항상 같은 묶음"""
+    _, bounds = trading_day_bounds(index)
+    cuts = bounds[::days_per_chunk]
+    if cuts[-1] != bounds[-1]:
+        cuts = np.append(cuts, bounds[-1])
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def resample_returns(returns_df, bar=DEFAULT_BAR):
+    """
+    분봉 수익률을 bar 크기 봉으로 복리 집계 (봉은 거래일 자정 기준으로 나누어 날을 넘지 않음)
+    봉 안에 관측이 하나도 없으면 NaN, 라벨은 봉 시작 시각
+    """
+    stamps = pd.DatetimeIndex(returns_df.index)
+    step = pd.Timedelta(bar).value
+    ns = stamps.asi8
+    day_ns = stamps.normalize().asi8
+    labels = day_ns + (ns - day_ns) // step * step
+
+    # 시각이 정렬되어 있으므로 같은 봉은 연속 구간 → reduceat 한 번
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    values = returns_df.to_numpy(dtype=float)
+    finite = np.isfinite(values)
+    logs = np.add.reduceat(np.where(finite, np.log1p(np.where(finite, values, 0.0)), 0.0), starts, axis=0)
+    counts = np.add.reduceat(finite, starts, axis=0)
+    return pd.DataFrame(np.where(counts > 0, np.expm1(logs), np.nan),
+                        index=pd.DatetimeIndex(labels[starts]), columns=returns_df.columns)
+
+
+def align_daily_factors(ff_df, timestamps):
+    """
+    일별 FF 팩터를 장중 시각에 정렬 (정수 위치 조회, 교집합 없음)
+    각 봉에는 그날 팩터 수익률을 그날 봉 수로 기하 균등 배분: (1 + f)^(1/n) - 1
+    → 하루 봉을 복리로 합치면 원래 일별 값, 팩터 파일에 없는 거래일은 NaN
+    """
+    stamps = pd.DatetimeIndex(timestamps)
+    days, bounds = trading_day_bounds(stamps)
+    bars = np.repeat(np.diff(bounds), np.diff(bounds)).astype(float)
+
+    rows = ff_df.index.searchsorted(days)
+    found = rows < len(ff_df.index)
+    found[found] = ff_df.index[rows[found]] == days[found]
+    daily = np.where(found[:, None], ff_df.to_numpy(dtype=float)[np.minimum(rows, len(ff_df) - 1)], np.nan)
+    daily = np.repeat(daily, np.diff(bounds), axis=0)
+
+    with np.errstate(invalid='ignore'):
+        values = np.power(1.0 + daily, 1.0 / bars[:, None]) - 1.0
+    return pd.DataFrame(values, index=stamps, columns=ff_df.columns)
+
+
+def iter_intraday_chunks(path=INTRADAY_DIR, days_per_chunk=DAYS_PER_CHUNK, bar=None, tickers=None,
+                         start=None, end=None):
+    """
+    거래일 파일을 days_per_chunk개씩 읽어 (시각 x 티커) 묶음 생성 (bar를 주면 파일마다 재표본화)
+    tickers: 열 순서 고정 (묶음마다 같은 열, 없는 티커는 NaN)
+    """
+    files = sorted(glob.glob(os.path.join(path, '*.csv')))
+    days = pd.to_datetime([os.path.basename(f)[:-4] for f in files])
+    keep = np.ones(len(files), dtype=bool)
+    if start is not None:
+        keep &= days >= pd.Timestamp(start)
+    if end is not None:
+        keep &= days <= pd.Timestamp(end)
+    files = [f for f, k in zip(files, keep) if k]
+
+    for first in range(0, len(files), days_per_chunk):
+        frames = []
+        for f in files[first:first + days_per_chunk]:
+            frame = pd.read_csv(f, index_col=0, parse_dates=True).sort_index()
+            if tickers is not None:
+                frame = frame.reindex(columns=tickers)
+            frames.append(resample_returns(frame, bar) if bar is not None else frame)
+        yield pd.concat(frames)
+
+
+def _chunk_inputs(chunk, ff_df, universe, bands):
+    """묶음 하나의 유효성 비트맵, 구간 포트폴리오 SMB, 장중 정렬 팩터"""
+    validity = build_validity_mask(chunk)
+    legs = band_portfolios(universe, chunk, bands, validity)
+    smb = legs.iloc[:, 0] - legs.iloc[:, 1]
+    return validity, smb, align_daily_factors(ff_df, chunk.index)
+
+
+def intraday_fama_macbeth(load_chunks, ff_df, universe, bands, tickers, history_spec=None):
+    """
+    묶음 단위 2회 통과 Fama-MacBeth (SMB = bands의 첫 구간 - 둘째 구간, 장중 봉 기준)
+
+    load_chunks: 인자 없이 호출하면 (시각 x 티커) 묶음 반복자를 돌려주는 함수 (예: iter_intraday_chunks)
+    1회차: 묶음별 Stage 1 X'X, X'y 누적 → 전 기간 베타 한 번 풀이 / 2회차: 묶음별 Stage 2
+    history_spec: 주면 Stage 2 감마를 묶음마다 감마 이력 저장소에 추가
+    반환: FamaMacBethResult (프리미엄은 거래일 기준으로 환산), 봉 단위 SMB 시계열
+    묶음이 하나도 없으면 ValueError
+    """
+    tickers = pd.Index(tickers)
+    K = len(BETA_COLUMNS) + 1
+    gram = np.zeros((len(tickers), K, K))
+    rhs = np.zeros((len(tickers), K))
+    observations = np.zeros(len(tickers), dtype=np.int64)
+    factor_parts = []
+
+    # 1회차: Stage 1 적률 누적
+    for chunk in load_chunks():
+        chunk = chunk.reindex(columns=tickers)
+        validity, smb, ff_bars = _chunk_inputs(chunk, ff_df, universe, bands)
+        X, row_valid = build_design(ff_bars, smb)
+        rf = ff_bars['RF'].to_numpy(dtype=float)
+        row_valid &= np.isfinite(rf)
+        mask = restrict_rows(validity, row_valid)
+        g, r = stage1_moments(chunk.to_numpy(dtype=float) - rf[:, None], mask['valid'], X)
+        gram += g
+        rhs += r
+        observations += mask['ticker_counts']
+        factor_parts.append(smb)
+
+    if not factor_parts:
+        raise ValueError("장중 묶음 없음: load_chunks가 빈 반복자를 돌려줌 (봉 파일 또는 기간 필터 확인)")
+
+    # 원자료가 메모리에 없으므로 조건수 초과 티커는 QR 대체 없이 제외
+    coeffs, stage1_status = batched_least_squares(gram, rhs, observations > MIN_STAGE1_OBS)
+    ok = (stage1_status == SOLVED) | (stage1_status == QR_FALLBACK)
+    stage1 = Stage1Result(tickers[ok], ['alpha'] + BETA_COLUMNS, coeffs[ok], observations[ok])
+
+    # 2회차: 묶음별 Stage 2
+    pieces = []
+    for chunk in load_chunks():
+        chunk = chunk.reindex(columns=tickers)
+        validity = build_validity_mask(chunk)
+        gammas, n_stocks, status = stage2_gammas(chunk.to_numpy(dtype=float), validity['valid'], coeffs[:, 1:], ok)
+        acc = accumulate(gamma_accumulator(chunk.index, ['gamma_0'] + GAMMA_COLUMNS), 0, gammas, n_stocks, status)
+        if history_spec is not None:
+            append_gamma_history(acc, history_spec)
+        pieces.append(acc)
+
+    parts = [Stage2Result.from_accumulator(acc) for acc in pieces]
+    stage2 = Stage2Result(np.concatenate([part.dates.to_numpy() for part in parts]), parts[0].columns,
+                          np.concatenate([part.gammas for part in parts]),
+                          np.concatenate([part.n_stocks for part in parts]))
+    stage2_status = np.concatenate([acc['status'] for acc in pieces])
+    stamps = pd.DatetimeIndex(np.concatenate([acc['dates'].to_numpy() for acc in pieces]))
+
+    # Stage 3: 봉 평균을 거래일당 평균 봉 수로 환산 (일별 프리미엄, 연율화는 252일)
+    bars_per_day = len(stamps) / max(len(trading_day_bounds(stamps)[0]), 1)
+    mean, std, t_stat, p_value, n = stage3_summary(stage2.gammas[:, 1:], axis=0)
+    premiums = PremiumTable(GAMMA_COLUMNS, mean * bars_per_day, t_stat, p_value, n)
+
+    drops = pd.concat([
+        drop_report(stage1_status, tickers, 'stage1'),
+        drop_report(stage2_status, stamps, 'stage2')
+    ], ignore_index=True)
+    return FamaMacBethResult(premiums, stage1, stage2, drops), pd.concat(factor_parts)
+
+
+def main():
+    """분봉 SMB_50 장중 Fama-MacBeth (INTRADAY_DIR에 거래일 파일이 있을 때)"""
+    from enhanced_mega_cap_analysis import load_and_prepare_data, MEGA_CAP_BANDS
+    from universe_index import load_universe
+    from least_squares import summarize_drops
+
+    if not glob.glob(os.path.join(INTRADAY_DIR, '*.csv')):
+        print(f"⚠️ 장중 데이터 없음: {INTRADAY_DIR}/YYYY-MM-DD.csv (시각 x 티커 분봉 수익률)")
+        return None
+
+    stocks_df, returns_df, ff_df = load_and_prepare_data()
+    universe = load_universe(stocks_df, returns_df)
+    bands = {'Small': MEGA_CAP_BANDS['Small_50'], 'Big': MEGA_CAP_BANDS['Big_50']}
+
+    print("\n" + "=" * 60)
+    print(f"장중 SMB_mega Fama-MacBeth ({DEFAULT_BAR} 봉, {DAYS_PER_CHUNK}거래일 묶음)")
+    print("=" * 60)
+
+    start = time.time()
+    result, smb = intraday_fama_macbeth(
+        lambda: iter_intraday_chunks(bar=DEFAULT_BAR, tickers=universe['tickers']),
+        ff_df, universe, bands, universe['tickers'], history_spec=f'SMB_50_{DEFAULT_BAR}'
+    )
+    print(f"\n📊 {len(result.stage2):,}개 봉, {len(result.stage1)}개 종목: {time.time() - start:.1f}초")
+    for factor, r in result.premiums.items():
+        print(f"   - {factor}: {r['annual_premium']:.2%} (t={r['t_stat']:.2f})")
+    summarize_drops(result.drops)
+
+    result.premiums.frame().to_csv('us_market/paper/Size_Reversal/back_data/intraday_premiums.csv')
+    print(f"\n   ✅ 저장: intraday_premiums.csv")
+    return result
+
+
+if __name__ == "__main__":
+    result = main()
@@ -0,0 +1,169 @@
+"""
+SMB_mega 잭나이프 (종목 하나씩 제외) 영향도 분석
+티커 j를 뺀 SMB 시계열은 다리별 합계·종목 수에서 j의 기여만 빼서 (T x N) 한 번에 만들고,
+Stage 1은 SMB 열만 바뀌는 설계행렬 배치 (공통 Gram 블록 재사용, SMB 행·열만 재계산),
+Stage 2는 변형마다 j를 뺀 전체 횡단면을 배치로 다시 풀이 (SMB가 바뀌면 모든 종목의 베타가 바뀌므로
+날짜별 Gram에서 j 행만 빼는 downdate로는 구할 수 없음)
+"""
+
+import time
+
+import pandas as pd
+import numpy as np
+import warnings
+warnings.filterwarnings('ignore')
+
+from fama_macbeth_core import build_design, stage1_betas_varying, stage2_gammas, stage3_summary
+from panel_validity import build_validity_mask, align_validity, restrict_rows
+from universe_index import band_memberships, holding_periods
+from trading_calendar import align
+
+SMB_POSITION = 2        # 설계행렬 [상수, Mkt-RF, SMB_mega, HML]에서 SMB_mega 열 위치
+JACKKNIFE_BATCH = 64    # 한 번에 처리하는 제외 티커 수 (Stage 1/2 배치 메모리 상한)
+
+
+def leg_panels(universe, returns_df, bands, validity):
+    """SMB 두 다리의 날짜별 소속 (T x N, 그날 관측된 종목만) — band_portfolios와 같은 규칙"""
+    memberships, _ = band_memberships(universe, returns_df.columns, bands)
+    holding = holding_periods(universe, returns_df.index)
+    inside = np.where(holding[:, None, None] >= 0, memberships[np.maximum(holding, 0)], False)
+    inside &= validity['valid'][:, :, None]
+    return inside[:, :, 0], inside[:, :, 1]
+
+
+def leave_one_out_smb(returns, small, big):
+    """
+    티커별 제외 SMB (T x N): 다리 합계·종목 수에서 j의 기여만 차감
+    반환: 기준 SMB (T,), 제외 SMB (T x N) — j가 어느 다리에도 없는 날은 기준과 같음
+    """
+    R = np.where(small | big, returns, 0.0)
+    sums = np.stack([(R * small).sum(axis=1), (R * big).sum(axis=1)])         # 2 x T
+    counts = np.stack([small.sum(axis=1), big.sum(axis=1)]).astype(float)      # 2 x T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        base = sums[0] / counts[0] - sums[1] / counts[1]
+        small_mean = (sums[0][:, None] - R * small) / (counts[0][:, None] - small)
+        big_mean = (sums[1][:, None] - R * big) / (counts[1][:, None] - big)
+    return base, small_mean - big_mean
+
+
+def jackknife_smb_premium(returns_df, ff_df, universe, bands, validity=None, batch_size=JACKKNIFE_BATCH):
+    """
+    티커 하나씩 제외한 SMB_mega 시계열과 Fama-MacBeth SMB 프리미엄
+
+    bands: {'Small': (시작, 끝), 'Big': (시작, 끝)} 순서의 두 순위 구간 (예: Small_50, Big_50)
+    제외된 티커는 SMB 구성과 Stage 2 횡단면 모두에서 빠짐 (Stage 2는 변형별 전체 재풀이)
+    반환: {'tickers', 'dates', 'base': 기준 결과 dict, 'smb_mean', 'premium', 't_stat' (N,), 'leg_days' (N x 2)}
+    """
+    returns_aligned, ff_aligned = align(returns_df, ff_df)
+    common_dates = returns_aligned.index
+    if validity is None:
+        validity = build_validity_mask(returns_aligned)
+    else:
+        validity = align_validity(validity, common_dates, returns_aligned.columns)
+
+    R = returns_aligned.to_numpy(dtype=float)
+    small, big = leg_panels(universe, returns_aligned, bands, validity)
+    base_smb, loo_smb = leave_one_out_smb(R, small, big)
+
+    X, row_valid = build_design(ff_aligned, base_smb)
+    row_valid &= np.isfinite(ff_aligned['RF'].to_numpy(dtype=float))
+    excess = R - ff_aligned['RF'].to_numpy(dtype=float)[:, None]
+    stage1_mask = restrict_rows(validity, row_valid)
+    X_shared = np.delete(X, SMB_POSITION, axis=1)
+
+    T, N = R.shape
+    smb_mean = np.full(N + 1, np.nan)
+    premium = np.full(N + 1, np.nan)
+    t_stat = np.full(N + 1, np.nan)
+
+    # 변형 0 = 기준 (제외 없음), 변형 j+1 = 티커 j 제외
+    variants = np.arange(-1, N)
+    for start in range(0, N + 1, batch_size):
+        drop = variants[start:start + batch_size]
+        F = np.where(drop[None, :] >= 0, loo_smb[:, np.maximum(drop, 0)], base_smb[:, None])
+        F = np.where(row_valid[:, None], F, np.nan)
+
+        coeffs, _, ok, _ = stage1_betas_varying(excess, stage1_mask['valid'], X_shared, F,
+                                             SMB_POSITION, stage1_mask['ticker_counts'])
+        ok[drop >= 0, drop[drop >= 0]] = False
+        gammas, _, _ = stage2_gammas(R, validity['valid'], coeffs[:, :, 1:], ok)
+
+        batch = slice(start, start + len(drop))
+        mean, _, t, _, _ = stage3_summary(gammas[:, :, SMB_POSITION], axis=1)
+        premium[batch], t_stat[batch] = mean, t
+        smb_mean[batch] = np.nanmean(np.where(row_valid[:, None], F, np.nan), axis=0)
+
+    return {
+        'tickers': returns_aligned.columns,
+        'dates': common_dates,
+        'base': {'smb_mean': smb_mean[0], 'premium': premium[0], 't_stat': t_stat[0]},
+        'smb_mean': smb_mean[1:],
+        'premium': premium[1:],
+        't_stat': t_stat[1:],
+        'leg_days': np.stack([small.sum(axis=0), big.sum(axis=0)], axis=1)
+    }
+
+
+def influence_ranking(result, periods_per_year=252):
+    """
+    티커별 영향도 순위 (|프리미엄 변화| 내림차순)
+    change = 제외 후 - 기준 (연율), 잭나이프 표준오차는 반환 attrs['jackknife_se']
+    """
+    base = result['base']
+    leg_days = result['leg_days']
+    ranking = pd.DataFrame({
+        'leg': np.select([(leg_days > 0).all(axis=1), leg_days[:, 0] > 0, leg_days[:, 1] > 0],
+                         ['Both', 'Small', 'Big'], '-'),
+        'small_days': leg_days[:, 0],
+        'big_days': leg_days[:, 1],
+        'smb_annual': result['smb_mean'] * periods_per_year,
+        'smb_change': (result['smb_mean'] - base['smb_mean']) * periods_per_year,
+        'premium_annual': result['premium'] * periods_per_year,
+        'premium_change': (result['premium'] - base['premium']) * periods_per_year,
+        't_stat': result['t_stat'],
+        't_change': result['t_stat'] - base['t_stat']
+    }, index=pd.Index(result['tickers'], name='ticker'))
+
+    ranking = ranking.iloc[np.argsort(-ranking['premium_change'].abs().to_numpy(), kind='stable')]
+    ranking.insert(0, 'influence_rank', np.arange(1, len(ranking) + 1))
+
+    # 잭나이프 표준오차: sqrt((n-1)/n Σ(θ_j - θ̄)²)
+    theta = result['premium'][np.isfinite(result['premium'])] * periods_per_year
+    n = len(theta)
+    ranking.attrs['jackknife_se'] = np.sqrt((n - 1) / n * ((theta - theta.mean()) ** 2).sum()) if n > 1 else np.nan
+    return ranking
+
+
+def main():
+    """SMB_50 (101-200위 - 1-100위) 잭나이프 영향도"""
+    from enhanced_mega_cap_analysis import load_and_prepare_data, MEGA_CAP_BANDS
+    from universe_index import load_universe
+
+    stocks_df, returns_df, ff_df = load_and_prepare_data()
+    universe = load_universe(stocks_df, returns_df)
+
+    print("\n" + "=" * 60)
+    print("SMB_mega 잭나이프 (종목 하나씩 제외) 영향도")
+    print("=" * 60)
+
+    start = time.time()
+    bands = {'Small': MEGA_CAP_BANDS['Small_50'], 'Big': MEGA_CAP_BANDS['Big_50']}
+    result = jackknife_smb_premium(returns_df, ff_df, universe, bands)
+    ranking = influence_ranking(result)
+    base = result['base']
+    print(f"\n📊 {len(ranking)}개 티커 제외 재계산: {time.time() - start:.2f}초")
+    print(f"   - 기준 SMB_mega 프리미엄: {base['premium'] * 252:.2%} (t={base['t_stat']:.2f})")
+    print(f"   - 잭나이프 표준오차: {ranking.attrs['jackknife_se']:.2%}")
+
+    print(f"\n📈 영향도 상위 10개 티커 (제외 시 프리미엄 변화):")
+    for ticker, row in ranking.head(10).iterrows():
+        print(f"   {row['influence_rank']:>2}. {ticker:<8} ({row['leg']:<5}) {row['premium_change']:+.2%} "
+              f"→ {row['premium_annual']:.2%} (t={row['t_stat']:.2f}), SMB {row['smb_change']:+.2%}")
+
+    ranking.to_csv('us_market/paper/Size_Reversal/back_data/jackknife_influence.csv')
+    print(f"\n   ✅ 저장: jackknife_influence.csv")
+    return ranking
+
+
+if __name__ == "__main__":
+    ranking = main()
@@ -0,0 +1,224 @@
+"""
+배치 최소제곱 코어 (Cholesky + QR 대체 경로)
+Stage 1·Stage 2·포트폴리오 회귀가 공유: X'X를 Cholesky로 한 번 분해해 여러 우변을 동시에 풀고
+조건수가 나쁜 시스템은 명시적으로 판별해 QR로 다시 풀거나 제외 사유와 함께 보고
+"""
+
+import numpy as np
+import pandas as pd
+
+# 척도 보정한 X'X 조건수 기준
+COND_LIMIT = 1e8    # Cholesky 허용 상한 (정규방정식 상대오차 ≈ eps·조건수 ≈ 1e-8)
+RANK_LIMIT = 1e14   # QR 허용 상한 (설계행렬 X 조건수 1e7), 넘으면 계수 부족으로 제외
+
+# 시스템별 상태 코드
+SOLVED = 0
+QR_FALLBACK = 1          # Cholesky 조건수 초과 → 원자료 QR로 재풀이 (결과 유지)
+INSUFFICIENT_OBS = 2     # 관측치 부족 (제외)
+ILL_CONDITIONED = 3      # 조건수 초과, QR에 쓸 원자료 없음 (제외)
+SINGULAR = 4             # 특이·계수 부족 (제외)
+
+STATUS_REASONS = {
+    QR_FALLBACK: 'qr_fallback',
+    INSUFFICIENT_OBS: 'insufficient_obs',
+    ILL_CONDITIONED: 'ill_conditioned',
+    SINGULAR: 'singular'
+}
+
+
+def equilibrate(gram):
+    """
+    열 척도 보정: C = D⁻¹ᐟ² X'X D⁻¹ᐟ² (대각 1)
+    상수항과 일별 수익률처럼 척도가 다른 열 때문에 조건수가 부풀지 않게 함
+    """
+    scale = np.sqrt(np.abs(np.diagonal(gram, axis1=-2, axis2=-1)))
+    scale = np.where(scale > 0, scale, 1.0)
+    return gram / (scale[..., :, None] * scale[..., None, :]), scale
+
+
+def condition_numbers(gram):
+    """척도 보정한 X'X 배치의 조건수 (고유값 기준, 양의 정부호가 아니면 inf)"""
+    eigenvalues = np.linalg.eigvalsh(equilibrate(gram)[0])
+    low, high = eigenvalues[..., 0], eigenvalues[..., -1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(low > 0, high / low, np.inf)
+
+
+def batched_cholesky(C):
+    """
+    대각 1인 C 배치의 Cholesky 분해와 조건수 추정
+
+    추정치 1 / min(L_ii²): L_ii²는 앞 열들로 설명되지 않는 비율이므로 공선성 진단과 같고
+    고유값 분해 없이 분해 결과에서 바로 얻음. 양의 정부호가 아니면 inf
+    """
+    K = C.shape[-1]
+    try:
+        L = np.linalg.cholesky(C)
+        definite = np.ones(C.shape[:-2], dtype=bool)
+    except np.linalg.LinAlgError:
+        # 양의 정부호가 아닌 시스템이 섞인 경우에만 고유값으로 골라낸 뒤 다시 분해
+        definite = np.linalg.eigvalsh(C)[..., 0] > K * np.finfo(float).eps
+        C = np.where(definite[..., None, None], C, np.eye(K))
+        L = np.linalg.cholesky(C)
+
+    pivots = np.diagonal(L, axis1=-2, axis2=-1).min(axis=-1)
+    with np.errstate(divide='ignore'):
+        cond = np.where(definite, 1 / pivots ** 2, np.inf)
+    return L, cond
+
+
+def cholesky_substitute(L, rhs):
+    """
+    L L' b = rhs를 전진·후진 대입으로 풀이 (K가 작으므로 K번의 배치 연산)
+    L: (..., K, K), rhs (..., K, M)
+    """
+    K = L.shape[-1]
+
+    z = np.empty_like(rhs)
+    for i in range(K):
+        z[..., i, :] = (rhs[..., i, :] - np.einsum('...j,...jm->...m', L[..., i, :i], z[..., :i, :])) \
+            / L[..., i, i, None]
+
+    x = np.empty_like(rhs)
+    for i in reversed(range(K)):
+        x[..., i, :] = (z[..., i, :] - np.einsum('...j,...jm->...m', L[..., i + 1:, i], x[..., i + 1:, :])) \
+            / L[..., i, i, None]
+    return x
+
+
+def cholesky_solve(gram, rhs):
+    """배치 Cholesky 풀이: gram (..., K, K), rhs (..., K, M)"""
+    C, scale = equilibrate(gram)
+    L, _ = batched_cholesky(C)
+    return cholesky_substitute(L, rhs / scale[..., :, None]) / scale[..., :, None]
+
+
+def qr_factor(A, rank_limit=RANK_LIMIT):
+    """
+    열 노름으로 척도 보정한 A의 QR 분해 (Q, R, 열 노름)
+    보정 후 R_ii²는 Cholesky 추정치의 L_ii²와 같은 양이지만 제곱 없이 계산되므로
+    더 느슨한 rank_limit까지 허용, 넘으면 계수 부족으로 None
+    """
+    if A.shape[0] < A.shape[1]:
+        return None
+    norms = np.linalg.norm(A, axis=0)
+    norms = np.where(norms > 0, norms, 1.0)
+    Q, R = np.linalg.qr(A / norms)
+    if np.abs(np.diag(R)).min() ** 2 < 1 / rank_limit:
+        return None
+    return Q, R, norms
+
+
+def qr_solve(A, b, rank_limit=RANK_LIMIT):
+    """단일 시스템 QR 풀이 (A: n x K, b: n 또는 n x M), 계수 부족이면 None"""
+    factor = qr_factor(A, rank_limit)
+    if factor is None:
+        return None
+    Q, R, norms = factor
+    solution = np.linalg.solve(R, Q.T @ b)
+    return solution / norms.reshape((-1,) + (1,) * (solution.ndim - 1))
+
+
+def batched_least_squares(gram, rhs, ok=None, fallback=None, cond_limit=COND_LIMIT,
+                          rank_limit=RANK_LIMIT):
+    """
+    정규방정식 배치 풀이: gram (..., K, K), rhs (..., K) 또는 (..., K, M)
+
+    ok: 선택, 관측치 조건을 만족하는 시스템 (False면 INSUFFICIENT_OBS)
+    fallback: 선택, 평탄화한 시스템 번호 i → (설계행렬 A, 반응 b)
+              조건수 초과 시스템만 이 원자료로 QR 재풀이 (없으면 ILL_CONDITIONED로 제외)
+    cond_limit: Cholesky 허용 조건수, rank_limit: QR 허용 조건수
+    반환: 계수 (rhs와 같은 모양, 제외된 시스템은 NaN), 상태 코드 (...,)
+    """
+    batch = gram.shape[:-2]
+    K = gram.shape[-1]
+    vector = rhs.shape[:-1] == batch
+    if vector:
+        rhs = rhs[..., None]
+    if ok is None:
+        ok = np.ones(batch, dtype=bool)
+
+    # 계산 대상이 아닌 시스템은 단위행렬로 채워 배치 분해가 깨지지 않게 함
+    gram = np.where(ok[..., None, None], gram, np.eye(K))
+    rhs = np.where(ok[..., None, None], rhs, 0.0)
+    finite = np.isfinite(gram).all(axis=(-2, -1)) & np.isfinite(rhs).all(axis=(-2, -1))
+    gram = np.where(finite[..., None, None], gram, np.eye(K))
+
+    # 척도 보정 후 한 번의 배치 Cholesky로 풀이와 조건수 판별을 같이 처리
+    C, scale = equilibrate(gram)
+    L, cond = batched_cholesky(C)
+    well = ok & finite & (cond <= cond_limit)
+    status = np.where(ok, SOLVED, INSUFFICIENT_OBS)
+    status[ok & ~finite] = SINGULAR
+
+    L = np.where(well[..., None, None], L, np.eye(K))
+    coeffs = cholesky_substitute(L, rhs / scale[..., :, None]) / scale[..., :, None]
+    coeffs[~well] = np.nan
+
+    # 조건수 초과 시스템: 원자료가 있으면 QR, 없으면 사유와 함께 제외
+    flat_coeffs = coeffs.reshape(-1, K, rhs.shape[-1])
+    flat_status = status.reshape(-1)
+    for i in np.flatnonzero((ok & finite & ~well).ravel()):
+        if not np.isfinite(cond.flat[i]) or cond.flat[i] > rank_limit:
+            flat_status[i] = SINGULAR
+        elif fallback is None:
+            flat_status[i] = ILL_CONDITIONED
+        else:
+            A, b = fallback(i)
+            solution = qr_solve(A, b, rank_limit)
+            if solution is None:
+                flat_status[i] = SINGULAR
+            else:
+                flat_coeffs[i] = np.asarray(solution).reshape(K, -1)
+                flat_status[i] = QR_FALLBACK
+
+    if vector:
+        coeffs = coeffs[..., 0]
+    return coeffs, status
+
+
+def solve_shared_design(X, Y, cond_limit=COND_LIMIT, rank_limit=RANK_LIMIT):
+    """
+    공통 설계행렬 X (T x K)에 대한 다중 우변 Y (T x M) 풀이를 분해 한 번으로
+
+    반환: 계수 (K x M), (X'X)⁻¹, 사용한 방법 ('cholesky' 또는 'qr')
+    """
+    gram = X.T @ X
+    K = gram.shape[0]
+    if condition_numbers(gram) <= cond_limit:
+        solved = cholesky_solve(gram, np.concatenate([X.T @ Y, np.eye(K)], axis=1))
+        return solved[:, :-K], solved[:, -K:], 'cholesky'
+
+    factor = qr_factor(X, rank_limit)
+    if factor is None:
+        raise np.linalg.LinAlgError("설계행렬의 계수가 부족합니다 (공선성)")
+    Q, R, norms = factor
+    R_inv = np.linalg.solve(R, np.eye(K)) / norms[:, None]
+    return R_inv @ (Q.T @ Y), R_inv @ R_inv.T, 'qr'
+
+
+def drop_report(status, labels, stage):
+    """
+    SOLVED가 아닌 시스템의 (stage, label, reason, dropped) 테이블
+    labels: status와 같은 길이의 티커 또는 날짜
+    """
+    status = np.asarray(status)
+    flagged = status != SOLVED
+    reasons = [STATUS_REASONS[s] for s in status[flagged]]
+    return pd.DataFrame({
+        'stage': stage,
+        'label': np.asarray(labels)[flagged],
+        'reason': reasons,
+        'dropped': status[flagged] != QR_FALLBACK
+    }, columns=['stage', 'label', 'reason', 'dropped'])
+
+
+def summarize_drops(drops, indent='   '):
+    """제외·대체 풀이 내역을 단계·사유별로 출력"""
+    if drops.empty:
+        print(f"{indent}- 제외된 티커/날짜 없음")
+        return
+    for (stage, reason), group in drops.groupby(['stage', 'reason']):
+        examples = ', '.join(str(label)[:10] for label in group['label'].iloc[:3])
+        more = ' ...' if len(group) > 3 else ''
+        print(f"{indent}- {stage} {reason}: {len(group)}개 ({examples}{more})")
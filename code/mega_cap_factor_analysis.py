@@ -3,14 +3,30 @@
 올바른 방법론으로 메가캡 내 크기 효과 측정
 """
 
+import os
+
 import pandas as pd
-import numpy as np
-import sqlite3
 import matplotlib.pyplot as plt
-from scipy import stats
 import warnings
 warnings.filterwarnings('ignore')
 
+from fama_macbeth_core import run_fama_macbeth
+from least_squares import summarize_drops
+from sort_factors import BOOK_TO_MARKET_PATH, load_characteristic_panel, build_sort_factors
+from characteristic_regression import MARKET_CAP_PATH, market_cap_panel
+from panel_validity import build_validity_mask, summarize_validity
+from universe_index import load_universe, band_portfolios, ever_members, summarize_universe
+from results_store import connect_store, import_legacy_results, latest_summary, record_run, record_specification
+from trading_calendar import load_ff_factors, align
+
+INDUSTRY_PATH = 'us_market/paper/Size_Reversal/back_data/data8_industries.csv'
+
+def load_industries(path=INDUSTRY_PATH):
+    """티커별 산업 분류 (ticker, industry 열 CSV) → 티커 인덱스 Series, 파일이 없으면 None"""
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, index_col='ticker')['industry']
+
 def load_data():
     """
     기존 데이터 로드 및 전처리
@@ -35,15 +51,14 @@ def load_data():
     print(f"   - 주식 수: {len(returns_df.columns)}")
     
     # 3. Fama-French 팩터 로드
-    ff_df = pd.read_csv('us_market/paper/Size_Reversal/back_data/data2_fama_french_factors.csv', index_col=0)
-    ff_df.index = pd.to_datetime(ff_df.index)
+    ff_df = load_ff_factors()
     print(f"\n📊 Fama-French 팩터:")
     print(f"   - 팩터: {list(ff_df.columns)}")
     print(f"   - 기간: {ff_df.index[0].strftime('%Y-%m-%d')} ~ {ff_df.index[-1].strftime('%Y-%m-%d')}")
     
     return stocks_df, returns_df, ff_df
 
-def create_mega_cap_factors(stocks_df, returns_df):
+def create_mega_cap_factors(stocks_df, returns_df, universe=None):
     """
     메가캡 전용 SMB 및 HML 팩터 구성
     """
@@ -51,27 +66,27 @@ def create_mega_cap_factors(stocks_df, returns_df):
     print("메가캡 전용 팩터 구성")
     print("=" * 60)
     
-    # 시가총액 기준 정렬 (이미 정렬되어 있지만 확인)
-    stocks_sorted = stocks_df.copy().reset_index(drop=True)
+    # 시점 기준 유니버스 색인 (시가총액 파일이 없으면 정적 table0 순위)
+    if universe is None:
+        universe = load_universe(stocks_df, returns_df)
+    summarize_universe(universe)
     
     # 1. 메가캡 SMB 팩터 구성
     print("\n🔧 SMB_mega 팩터 구성:")
     
-    # Small: 101-200위 (상대적 소형)
-    small_tickers = stocks_sorted.iloc[100:200]['ticker'].tolist()
-    # Big: 1-100위 (상대적 대형)  
-    big_tickers = stocks_sorted.iloc[0:100]['ticker'].tolist()
+    # Small: 101-200위 (상대적 소형), Big: 1-100위 (상대적 대형), 리밸런싱마다 재구성
+    portfolios = band_portfolios(universe, returns_df, {'Small': (100, 200), 'Big': (0, 100)})
     
-    # 실제 데이터에 존재하는 티커만 필터링
-    small_tickers = [t for t in small_tickers if t in returns_df.columns]
-    big_tickers = [t for t in big_tickers if t in returns_df.columns]
+    # 표본 기간 중 한 번이라도 구간에 속한 티커 중 실제 데이터에 존재하는 티커 (마지막 날짜 생존 종목만이 아님)
+    small_tickers = [t for t in ever_members(universe, 200, 100, returns_df.index) if t in returns_df.columns]
+    big_tickers = [t for t in ever_members(universe, 100, 0, returns_df.index) if t in returns_df.columns]
     
-    print(f"   - Small Portfolio (101-200위): {len(small_tickers)}개 주식")
-    print(f"   - Big Portfolio (1-100위): {len(big_tickers)}개 주식")
+    print(f"   - Small Portfolio (101-200위): 기간 중 {len(small_tickers)}개 주식")
+    print(f"   - Big Portfolio (1-100위): 기간 중 {len(big_tickers)}개 주식")
     
-    # 동일가중 포트폴리오 수익률 계산
-    small_portfolio = returns_df[small_tickers].mean(axis=1)
-    big_portfolio = returns_df[big_tickers].mean(axis=1)
+    # 동일가중 포트폴리오 수익률
+    small_portfolio = portfolios['Small']
+    big_portfolio = portfolios['Big']
     
     # SMB_mega 팩터
     smb_mega = small_portfolio - big_portfolio
@@ -80,10 +95,6 @@ def create_mega_cap_factors(stocks_df, returns_df):
     print(f"   - Big Portfolio 평균 수익률: {big_portfolio.mean()*252:.1%}")
     print(f"   - SMB_mega 팩터: {smb_mega.mean()*252:.1%}")
     
-    # 2. 메가캡 HML 팩터 구성 (Book-to-Market 데이터가 없으므로 생략)
-    print(f"\n🔧 HML_mega 팩터:")
-    print("   - Book-to-Market 데이터 없음, 기존 HML 사용")
-    
     # 팩터 데이터프레임 생성
     mega_factors = pd.DataFrame({
         'SMB_mega': smb_mega,
@@ -91,143 +102,72 @@ def create_mega_cap_factors(stocks_df, returns_df):
         'Big_Portfolio': big_portfolio
     })
     
+    # 2. 메가캡 HML 팩터 구성 (시점 기준 B/M 패널로 규모·가치 동시 정렬)
+    print(f"\n🔧 HML_mega 팩터:")
+    bm_panel = load_characteristic_panel(BOOK_TO_MARKET_PATH, returns_df.index, returns_df.columns)
+    size_panel = market_cap_panel(returns_df)
+    if bm_panel is None:
+        print("   - Book-to-Market 데이터 없음, 기존 HML 사용")
+    elif size_panel is None:
+        print(f"   ⚠️ 시점 기준 시가총액 패널 없음 ({MARKET_CAP_PATH}), 2x3 정렬 생략 · 기존 HML 사용")
+    else:
+        sorted_factors = build_sort_factors(returns_df, size_panel, bm_panel, universe=universe)
+        mega_factors['HML_mega'] = sorted_factors['HML_mega']
+        mega_factors['SMB_2x3'] = sorted_factors['SMB_2x3']
+        mega_factors['HML_2x3'] = sorted_factors['HML_2x3']
+        print(f"   - High B/M 평균 수익률: {sorted_factors['High_BM'].mean()*252:.1%}")
+        print(f"   - Low B/M 평균 수익률: {sorted_factors['Low_BM'].mean()*252:.1%}")
+        print(f"   - HML_mega 팩터: {sorted_factors['HML_mega'].mean()*252:.1%}")
+        print(f"   - 2x3 정렬: SMB {sorted_factors['SMB_2x3'].mean()*252:.1%}, HML {sorted_factors['HML_2x3'].mean()*252:.1%}")
+    
     return mega_factors, small_tickers, big_tickers
 
-def fama_macbeth_with_mega_factors(returns_df, ff_df, mega_factors, small_tickers, big_tickers):
+def fama_macbeth_with_mega_factors(returns_df, ff_df, mega_factors, small_tickers, big_tickers, validity=None,
+                                   industries=None):
     """
     메가캡 전용 팩터를 사용한 Fama-MacBeth 회귀
+    industries: 선택, 티커 → 산업 Series (load_industries). 주면 Stage 2에 산업 고정효과 포함
     """
     print("\n" + "=" * 60)
     print("메가캡 팩터 Fama-MacBeth 분석")
     print("=" * 60)
     
     # 데이터 정렬
-    common_dates = returns_df.index.intersection(ff_df.index).intersection(mega_factors.index)
-    returns_aligned = returns_df.loc[common_dates]
-    ff_aligned = ff_df.loc[common_dates]
-    mega_aligned = mega_factors.loc[common_dates]
+    returns_aligned, ff_aligned, mega_aligned = align(returns_df, ff_df, mega_factors)
+    common_dates = returns_aligned.index
+    
+    # HML_mega가 있으면 시장 전체 HML 대신 사용
+    if 'HML_mega' in mega_aligned:
+        ff_aligned = ff_aligned.assign(HML=mega_aligned['HML_mega'])
     
     print(f"\n📊 분석 데이터:")
     print(f"   - 공통 기간: {len(common_dates)}일")
     print(f"   - 분석 주식: {len(returns_aligned.columns)}개")
+    print(f"   - HML: {'HML_mega (B/M 정렬)' if 'HML_mega' in mega_aligned else '시장 전체 HML'}")
+    if industries is not None:
+        print(f"   - Stage 2 산업 고정효과: {industries.nunique()}개 산업 (산업 내 평균 차감)")
+    
+    # Stage 1~3: 벡터화 솔버 (티커·날짜 루프 없이 배치 행렬 연산)
+    print(f"\n🔬 Stage 1~3: 시계열 회귀 → 횡단면 회귀 → 시계열 평균 및 t-검정")
     
-    # Stage 1: 시계열 회귀 (각 주식별)
-    print(f"\n🔬 Stage 1: 시계열 회귀")
-    
-    stage1_results = {}
-    
-    for ticker in returns_aligned.columns:
-        if ticker in small_tickers or ticker in big_tickers:
-            # 초과수익률 계산
-            excess_return = returns_aligned[ticker] - ff_aligned['RF']
-            
-            # 회귀 변수 준비
-            X = pd.DataFrame({
-                'Mkt_RF': ff_aligned['Mkt-RF'],
-                'SMB_mega': mega_aligned['SMB_mega'],
-                'HML': ff_aligned['HML']
-            })
-            
-            # 결측치 제거
-            valid_idx = ~(excess_return.isna() | X.isna().any(axis=1))
-            y = excess_return[valid_idx]
-            X_clean = X[valid_idx]
-            
-            if len(y) > 50:  # 충분한 관측치가 있는 경우만
-                # 회귀 실행 (numpy 사용)
-                X_with_const = np.column_stack([np.ones(len(X_clean)), X_clean])
-                
-                try:
-                    coeffs = np.linalg.lstsq(X_with_const, y, rcond=None)[0]
-                    
-                    # 결과 저장
-                    stage1_results[ticker] = {
-                        'alpha': coeffs[0],
-                        'beta_market': coeffs[1],
-                        'beta_smb_mega': coeffs[2],
-                        'beta_hml': coeffs[3],
-                        'observations': len(y)
-                    }
-                except:
-                    pass
-    
-    print(f"   - 성공적으로 분석된 주식: {len(stage1_results)}개")
-    
-    # Stage 1 결과를 DataFrame으로 변환
-    stage1_df = pd.DataFrame(stage1_results).T
+    results, stage1_df, stage2_df, drops = run_fama_macbeth(
+        returns_aligned, ff_aligned, mega_aligned['SMB_mega'],
+        tickers=list(dict.fromkeys(small_tickers + big_tickers)), validity=validity, industries=industries
+    )
     
+    print(f"\n   - 성공적으로 분석된 주식: {len(stage1_df)}개")
     print(f"\n📈 Stage 1 베타 통계:")
     print(f"   - Market Beta 평균: {stage1_df['beta_market'].mean():.3f}")
     print(f"   - SMB_mega Beta 평균: {stage1_df['beta_smb_mega'].mean():.3f}")
     print(f"   - HML Beta 평균: {stage1_df['beta_hml'].mean():.3f}")
-    
-    # Stage 2: 횡단면 회귀 (각 시점별)
-    print(f"\n🔬 Stage 2: 횡단면 회귀")
-    
-    stage2_results = []
-    
-    for date in common_dates:
-        # 해당 날짜의 수익률
-        daily_returns = returns_aligned.loc[date]
-        
-        # 베타가 있는 주식들만
-        valid_tickers = [t for t in daily_returns.index if t in stage1_df.index]
-        
-        if len(valid_tickers) > 10:  # 충분한 주식이 있는 경우
-            y = daily_returns[valid_tickers].values
-            X = stage1_df.loc[valid_tickers, ['beta_market', 'beta_smb_mega', 'beta_hml']].values
-            
-            # 결측치 제거
-            valid_idx = ~(np.isnan(y) | np.isnan(X).any(axis=1))
-            
-            if valid_idx.sum() > 5:
-                y_clean = y[valid_idx]
-                X_clean = X[valid_idx]
-                
-                # 상수항 추가
-                X_with_const = np.column_stack([np.ones(len(X_clean)), X_clean])
-                
-                try:
-                    # 회귀 실행
-                    coeffs = np.linalg.lstsq(X_with_const, y_clean, rcond=None)[0]
-                    
-                    stage2_results.append({
-                        'date': date,
-                        'gamma_0': coeffs[0],
-                        'gamma_market': coeffs[1],
-                        'gamma_smb_mega': coeffs[2],
-                        'gamma_hml': coeffs[3],
-                        'n_stocks': len(y_clean)
-                    })
-                except:
-                    pass
-    
-    stage2_df = pd.DataFrame(stage2_results)
     print(f"   - 성공적으로 분석된 날짜: {len(stage2_df)}일")
     
-    # Stage 3: 시계열 평균 및 t-검정
-    print(f"\n🔬 Stage 3: 시계열 평균 및 t-검정")
-    
-    results = {}
-    for factor in ['gamma_market', 'gamma_smb_mega', 'gamma_hml']:
-        values = stage2_df[factor].dropna()
-        
-        mean_premium = values.mean()
-        std_premium = values.std()
-        t_stat = mean_premium / (std_premium / np.sqrt(len(values)))
-        p_value = 2 * (1 - stats.t.cdf(abs(t_stat), len(values) - 1))
-        
-        results[factor] = {
-            'daily_premium': mean_premium,
-            'annual_premium': mean_premium * 252,
-            't_stat': t_stat,
-            'p_value': p_value,
-            'observations': len(values)
-        }
+    print(f"\n⚠️ 제외/대체 풀이 내역:")
+    summarize_drops(drops)
     
     return results, stage1_df, stage2_df
 
-def compare_methodologies(returns_df, ff_df, mega_factors, small_tickers, big_tickers):
+def compare_methodologies(returns_df, ff_df, mega_factors, small_tickers, big_tickers, validity=None, conn=None):
     """
     기존 방법론 vs 새로운 방법론 비교
     """
@@ -238,23 +178,26 @@ def compare_methodologies(returns_df, ff_df, mega_factors, small_tickers, big_ti
     # 1. 기존 방법론 (전체 시장 SMB 사용)
     print(f"\n📊 기존 방법론 (전체 시장 SMB):")
     
-    # 기존 결과 로드
-    old_results = pd.read_csv('us_market/paper/Size_Reversal/back_data/table3_final_results.csv')
+    # 기존 결과: table3_final_results.csv를 저장소로 한 번 이관한 뒤 사양·팩터 이름으로 조회
+    if conn is None:
+        conn = connect_store()
+    import_legacy_results(conn, 'us_market/paper/Size_Reversal/back_data/table3_final_results.csv', 'SMB_market_wide')
+    old_results = latest_summary(conn, 'SMB_market_wide')
     
-    print(f"   - Market Premium: {old_results.loc[0, 'Annual_Premium']:.1f}% (t={old_results.loc[0, 't_statistic']:.2f})")
-    print(f"   - Size Premium (SMB): {old_results.loc[1, 'Annual_Premium']:.1f}% (t={old_results.loc[1, 't_statistic']:.2f})")
-    print(f"   - Value Premium (HML): {old_results.loc[2, 'Annual_Premium']:.1f}% (t={old_results.loc[2, 't_statistic']:.2f})")
+    print(f"   - Market Premium: {old_results.loc['gamma_market', 'annual_premium']:.1%} (t={old_results.loc['gamma_market', 't_stat']:.2f})")
+    print(f"   - Size Premium (SMB): {old_results.loc['gamma_smb_mega', 'annual_premium']:.1%} (t={old_results.loc['gamma_smb_mega', 't_stat']:.2f})")
+    print(f"   - Value Premium (HML): {old_results.loc['gamma_hml', 'annual_premium']:.1%} (t={old_results.loc['gamma_hml', 't_stat']:.2f})")
     
     # 2. 새로운 방법론 실행
     print(f"\n📊 새로운 방법론 (메가캡 전용 SMB):")
     
     new_results, stage1_df, stage2_df = fama_macbeth_with_mega_factors(
-        returns_df, ff_df, mega_factors, small_tickers, big_tickers
+        returns_df, ff_df, mega_factors, small_tickers, big_tickers, validity
     )
     
-    print(f"   - Market Premium: {new_results['gamma_market']['annual_premium']:.1f}% (t={new_results['gamma_market']['t_stat']:.2f})")
-    print(f"   - Size Premium (SMB_mega): {new_results['gamma_smb_mega']['annual_premium']:.1f}% (t={new_results['gamma_smb_mega']['t_stat']:.2f})")
-    print(f"   - Value Premium (HML): {new_results['gamma_hml']['annual_premium']:.1f}% (t={new_results['gamma_hml']['t_stat']:.2f})")
+    print(f"   - Market Premium: {new_results['gamma_market']['annual_premium']:.1%} (t={new_results['gamma_market']['t_stat']:.2f})")
+    print(f"   - Size Premium (SMB_mega): {new_results['gamma_smb_mega']['annual_premium']:.1%} (t={new_results['gamma_smb_mega']['t_stat']:.2f})")
+    print(f"   - Value Premium (HML): {new_results['gamma_hml']['annual_premium']:.1%} (t={new_results['gamma_hml']['t_stat']:.2f})")
     
     # 3. 베타 분포 비교
     print(f"\n📈 베타 분포 비교:")
@@ -345,11 +288,32 @@ def main():
     # 2. 메가캡 전용 팩터 구성
     mega_factors, small_tickers, big_tickers = create_mega_cap_factors(stocks_df, returns_df)
     
-    # 3. 방법론 비교
+    # 3. 방법론 비교 (유효성 비트맵은 한 번만 계산)
+    validity = build_validity_mask(returns_df)
+    summarize_validity(validity)
+    conn = connect_store()
     new_results, stage1_df, stage2_df, old_results, old_betas = compare_methodologies(
-        returns_df, ff_df, mega_factors, small_tickers, big_tickers
+        returns_df, ff_df, mega_factors, small_tickers, big_tickers, validity, conn
     )
     
+    # 3-1. 결과 저장소 기록
+    run_id = record_run(conn, 'mega_cap_factor_analysis.py', 'SMB_mega 101-200위 vs 1-100위')
+    record_specification(conn, run_id, 'SMB_mega', new_results, stage1_df, stage2_df,
+                         params={'small': '101-200', 'big': '1-100'})
+    
+    # 3-2. 산업 고정효과 강건성 (기술 섹터 집중과 규모 효과 분리, 산업 분류 파일이 있을 때)
+    industries = load_industries()
+    if industries is not None:
+        fe_results, fe_stage1_df, fe_stage2_df = fama_macbeth_with_mega_factors(
+            returns_df, ff_df, mega_factors, small_tickers, big_tickers, validity, industries
+        )
+        print(f"\n📊 산업 고정효과 포함 SMB_mega 프리미엄: {fe_results['gamma_smb_mega']['annual_premium']:.1%} "
+              f"(t={fe_results['gamma_smb_mega']['t_stat']:.2f}) vs 미포함 "
+              f"{new_results['gamma_smb_mega']['annual_premium']:.1%} (t={new_results['gamma_smb_mega']['t_stat']:.2f})")
+        record_specification(conn, run_id, 'SMB_mega_industry_fe', fe_results, fe_stage1_df, fe_stage2_df,
+                             params={'small': '101-200', 'big': '1-100', 'industry_fe': True})
+    conn.close()
+    
     # 4. 시각화
     create_visualizations(stage1_df, stage2_df, mega_factors, old_betas)
     
@@ -368,8 +332,8 @@ def main():
     print(f"   - 개선도: {(stage1_df['beta_smb_mega'].std() / old_betas['beta_smb'].std() - 1) * 100:.1f}%")
     
     print(f"\n🎯 Size Premium 결과:")
-    print(f"   - 기존 방법: {old_results.loc[1, 'Annual_Premium']:.1f}% (t={old_results.loc[1, 't_statistic']:.2f})")
-    print(f"   - 새로운 방법: {new_results['gamma_smb_mega']['annual_premium']:.1f}% (t={new_results['gamma_smb_mega']['t_stat']:.2f})")
+    print(f"   - 기존 방법: {old_results.loc['gamma_smb_mega', 'annual_premium']:.1%} (t={old_results.loc['gamma_smb_mega', 't_stat']:.2f})")
+    print(f"   - 새로운 방법: {new_results['gamma_smb_mega']['annual_premium']:.1%} (t={new_results['gamma_smb_mega']['t_stat']:.2f})")
     
     print(f"\n✅ 학술적 기여:")
     print(f"   - 방법론적 일관성 확보")
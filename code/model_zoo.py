@@ -0,0 +1,232 @@
+"""
+다중 팩터 모델 일괄 비교 (CAPM, FF3_mega, FF5_mega, 모멘텀 등)
+모델 레지스트리에 등록된 팩터 조합을 한 번에 평가: 표본 구간이 같은 모델끼리는
+팩터 합집합의 티커별 Gram 행렬을 한 번만 계산하고 각 모델은 부분 블록만 잘라 풀이
+"""
+
+import time
+
+import pandas as pd
+import numpy as np
+import warnings
+warnings.filterwarnings('ignore')
+
+from fama_macbeth_core import (
+    stage1_moments, stage2_gammas, stage3_summary, MIN_STAGE1_OBS
+)
+from least_squares import batched_least_squares, SOLVED, QR_FALLBACK
+from panel_validity import build_validity_mask, align_validity, restrict_rows
+from trading_calendar import align
+
+# 기본 모델 (SMB_mega는 SMB 변형마다 별도 모델로 확장)
+BASE_MODELS = {
+    'CAPM': ['Mkt-RF'],
+    'FF3': ['Mkt-RF', 'SMB', 'HML'],
+    'Mkt_MOM': ['Mkt-RF', 'MOM_mega'],
+    'Mkt_SMB_mega': ['Mkt-RF', 'SMB_mega'],
+    'FF3_mega': ['Mkt-RF', 'SMB_mega', 'HML'],
+    'FF3_mega_value': ['Mkt-RF', 'SMB_mega', 'HML_mega'],
+    'Carhart_mega': ['Mkt-RF', 'SMB_mega', 'HML', 'MOM_mega'],
+    'FF5_mega': ['Mkt-RF', 'SMB_mega', 'HML_mega', 'RMW_mega', 'CMA_mega'],
+    'FF6_mega': ['Mkt-RF', 'SMB_mega', 'HML_mega', 'RMW_mega', 'CMA_mega', 'MOM_mega']
+}
+SMB_VARIANTS = ['SMB_50', 'SMB_30', 'SMB_Q5Q1']
+
+MODEL_REGISTRY = {}
+
+
+def register_model(name, factors, registry=MODEL_REGISTRY):
+    """팩터 열 이름 목록으로 모델 등록"""
+    registry[name] = list(factors)
+    return registry
+
+
+def register_default_models(smb_variants=SMB_VARIANTS, registry=MODEL_REGISTRY, available=None):
+    """
+    기본 모델 등록, SMB_mega를 포함한 모델은 SMB 변형별로 확장
+    available: 주면 이 팩터 열이 모두 있는 모델만 등록
+    반환: 팩터가 없어 등록하지 않은 기본 모델 이름 목록
+    """
+    skipped = []
+    for name, factors in BASE_MODELS.items():
+        if available is not None and not set(f for f in factors if f != 'SMB_mega') <= set(available):
+            skipped.append(name)
+            continue
+        if 'SMB_mega' not in factors:
+            register_model(name, factors, registry)
+            continue
+        for variant in smb_variants:
+            if available is None or variant in available:
+                register_model(f'{name}[{variant}]', [variant if f == 'SMB_mega' else f for f in factors], registry)
+    return skipped
+
+
+def group_by_sample(factors_df, models):
+    """
+    팩터 결측 패턴이 같은 모델끼리 묶음 {표본 마스크 키: (마스크, [모델])}
+    같은 묶음은 공통 표본에서 합집합 Gram 하나를 공유
+    """
+    groups = {}
+    for name, factors in models.items():
+        rows = np.isfinite(factors_df[factors].to_numpy(dtype=float)).all(axis=1)
+        key = rows.tobytes()
+        groups.setdefault(key, (rows, []))[1].append(name)
+    return list(groups.values())
+
+
+def evaluate_models(returns_aligned, factors_df, rf, models=None, validity=None):
+    """
+    등록된 모든 모델의 Stage 1/2/3 일괄 평가
+
+    factors_df: 팩터 열을 가진 DataFrame (returns_aligned와 같은 날짜), rf: 무위험 수익률 (T,)
+    반환: 모델 요약 (모델별 |알파|, 시계열 R², 표본), 팩터별 프리미엄 테이블
+    """
+    if models is None:
+        models = MODEL_REGISTRY
+    models = {name: f for name, f in models.items() if set(f) <= set(factors_df.columns)}
+
+    if validity is None:
+        validity = build_validity_mask(returns_aligned)
+    else:
+        validity = align_validity(validity, returns_aligned.index, returns_aligned.columns)
+
+    R = returns_aligned.to_numpy(dtype=float)
+    excess = R - np.asarray(rf, dtype=float)[:, None]
+
+    summary_rows, premium_rows = [], []
+    stage2_inputs = {}
+
+    # Stage 1: 표본 묶음마다 합집합 Gram 한 번 → 모델별 부분 블록 풀이
+    for rows, names in group_by_sample(factors_df, models):
+        columns = list(dict.fromkeys(f for name in names for f in models[name]))
+        X_all = np.column_stack([np.ones(len(factors_df)), factors_df[columns].to_numpy(dtype=float)])
+        stage1_mask = restrict_rows(validity, rows & np.isfinite(rf))
+        valid = stage1_mask['valid']
+
+        gram_all, rhs_all = stage1_moments(excess, valid, X_all)
+        y = np.where(valid, excess, 0.0)
+        yy = (y ** 2).sum(axis=0)
+        y_mean = rhs_all[:, 0] / np.maximum(stage1_mask['ticker_counts'], 1)
+        sst = yy - stage1_mask['ticker_counts'] * y_mean ** 2
+        ok = stage1_mask['ticker_counts'] > MIN_STAGE1_OBS
+
+        for name in names:
+            idx = [0] + [1 + columns.index(f) for f in models[name]]
+
+            def fallback(n, idx=idx):
+                return X_all[valid[:, n]][:, idx], excess[valid[:, n], n]
+
+            coeffs, status = batched_least_squares(gram_all[:, idx][:, :, idx], rhs_all[:, idx], ok, fallback)
+            solved = (status == SOLVED) | (status == QR_FALLBACK)
+            sse = yy - (coeffs * rhs_all[:, idx]).sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                r2 = 1 - sse / sst
+
+            stage2_inputs[name] = (coeffs[:, 1:], solved)
+            summary_rows.append({
+                'model': name,
+                'factors': ' + '.join(models[name]),
+                'n_factors': len(models[name]),
+                'n_stocks': int(solved.sum()),
+                'stage1_days': int(rows.sum()),
+                'mean_abs_alpha': np.nanmean(np.abs(coeffs[solved, 0])) * 252,
+                'avg_r2': np.nanmean(r2[solved])
+            })
+
+    # Stage 2/3: 팩터 수가 같은 모델끼리 배치 횡단면 회귀
+    by_size = {}
+    for name, (betas, solved) in stage2_inputs.items():
+        by_size.setdefault(betas.shape[1], []).append(name)
+
+    for size, names in by_size.items():
+        betas = np.stack([stage2_inputs[name][0] for name in names])
+        beta_ok = np.stack([stage2_inputs[name][1] for name in names])
+        gammas, _, _ = stage2_gammas(R, validity['valid'], betas, beta_ok)
+        mean, _, t_stat, p_value, n = stage3_summary(gammas, axis=1)
+
+        for b, name in enumerate(names):
+            for k, factor in enumerate(['const'] + models[name]):
+                premium_rows.append({
+                    'model': name,
+                    'factor': factor,
+                    'daily_premium': mean[b, k],
+                    'annual_premium': mean[b, k] * 252,
+                    't_stat': t_stat[b, k],
+                    'p_value': p_value[b, k],
+                    'observations': int(n[b, k])
+                })
+
+    summary = pd.DataFrame(summary_rows).sort_values('mean_abs_alpha').reset_index(drop=True)
+    return summary, pd.DataFrame(premium_rows)
+
+
+def build_factor_table(ff_aligned, mega_factors_df, characteristic_factors=None, sorted_factors=None):
+    """
+    모델 레지스트리가 참조하는 팩터 열을 한 테이블로
+    sorted_factors: 선택, sort_factors.build_sort_factors 결과 (HML_mega, SMB_2x3, HML_2x3)
+    """
+    table = ff_aligned[['Mkt-RF', 'SMB', 'HML']].copy()
+    for name in SMB_VARIANTS:
+        if name in mega_factors_df:
+            table[name] = mega_factors_df[name].reindex(table.index)
+    if sorted_factors is not None:
+        for name in ['HML_mega', 'SMB_2x3', 'HML_2x3']:
+            table[name] = sorted_factors[name].reindex(table.index)
+    if characteristic_factors is not None:
+        table = table.join(characteristic_factors.reindex(table.index))
+    return table
+
+
+def main():
+    """기본 모델 레지스트리 일괄 평가 및 저장"""
+    from enhanced_mega_cap_analysis import load_and_prepare_data, create_enhanced_mega_factors
+    from sort_factors import (BOOK_TO_MARKET_PATH, load_characteristic_panel, build_sort_factors,
+                              build_characteristic_factors)
+    from characteristic_regression import MARKET_CAP_PATH, market_cap_panel
+    from universe_index import load_universe
+
+    stocks_df, returns_df, ff_df = load_and_prepare_data()
+    universe = load_universe(stocks_df, returns_df)
+    mega_factors_df, ticker_groups = create_enhanced_mega_factors(stocks_df, returns_df, universe=universe)
+    validity = build_validity_mask(returns_df)
+
+    print("\n" + "=" * 60)
+    print("다중 팩터 모델 일괄 비교")
+    print("=" * 60)
+
+    returns_aligned, ff_aligned, _ = align(returns_df, ff_df, mega_factors_df)
+    characteristic_factors = build_characteristic_factors(returns_df, validity, universe=universe)
+
+    # HML_mega·2x3: 시점 기준 시가총액과 B/M 패널이 모두 있을 때만
+    bm_panel = load_characteristic_panel(BOOK_TO_MARKET_PATH, returns_df.index, returns_df.columns)
+    size_panel = market_cap_panel(returns_df)
+    sorted_factors = None
+    if bm_panel is None or size_panel is None:
+        print(f"\n⚠️ HML_mega 생략: {BOOK_TO_MARKET_PATH if bm_panel is None else MARKET_CAP_PATH} 없음")
+    else:
+        sorted_factors = build_sort_factors(returns_df, size_panel, bm_panel, validity, universe=universe)
+    factors_df = build_factor_table(ff_aligned, mega_factors_df, characteristic_factors, sorted_factors)
+
+    skipped = register_default_models(available=factors_df.columns)
+    print(f"\n📊 등록 모델: {len(MODEL_REGISTRY)}개")
+    if skipped:
+        print(f"   ⚠️ 팩터 데이터 없음으로 미등록: {', '.join(skipped)}")
+
+    start = time.time()
+    summary, premiums = evaluate_models(returns_aligned, factors_df, ff_aligned['RF'].to_numpy(dtype=float),
+                                        validity=validity)
+    print(f"   - 평가 완료: {len(summary)}개 모델, {time.time() - start:.2f}초")
+
+    print(f"\n📈 모델 비교 (평균 |알파| 오름차순):")
+    for _, row in summary.iterrows():
+        print(f"   - {row['model']:<28} |α|={row['mean_abs_alpha']:.2%}  R²={row['avg_r2']:.3f}  "
+              f"({row['n_stocks']}개 주식, {row['stage1_days']}일)")
+
+    summary.to_csv('us_market/paper/Size_Reversal/back_data/model_zoo_summary.csv', index=False)
+    premiums.to_csv('us_market/paper/Size_Reversal/back_data/model_zoo_premiums.csv', index=False)
+    print(f"\n   ✅ 저장: model_zoo_summary.csv, model_zoo_premiums.csv")
+    return summary, premiums
+
+
+if __name__ == "__main__":
+    summary, premiums = main()
@@ -0,0 +1,175 @@
+"""
+수익률 패널 유효성 비트맵
+패널 전체의 결측 여부를 한 번만 계산해 Stage 1/2와 순열·서브기간 엔진이 공유
+상장(IPO)·상장폐지 구간과 티커별/날짜별 관측 수를 함께 보관
+"""
+
+import pandas as pd
+import numpy as np
+
+
+def build_validity_mask(returns_df, listings=None):
+    """
+    (T x N) 유효성 비트맵과 사전 계산된 관측 수
+
+    listings: 선택, ticker·start·end 열을 가진 상장 기간 테이블
+              상장 기간 밖의 값(상장폐지 후 잔존 가격 등)은 결측으로 처리
+    """
+    valid = np.isfinite(returns_df.to_numpy(dtype=float))
+
+    if listings is not None:
+        listed = listing_window_mask(returns_df.index, returns_df.columns, listings)
+        valid &= listed
+
+    return _with_counts({
+        'dates': returns_df.index,
+        'tickers': returns_df.columns,
+        'valid': valid
+    })
+
+
+def listing_window_mask(dates, tickers, listings):
+    """
+    상장 기간 테이블로 (T x N) 상장 여부 마스크 생성 (테이블에 없는 티커는 전 기간 상장)
+    """
+    listings = listings.set_index('ticker')
+    start = pd.to_datetime(listings['start'].reindex(tickers)).fillna(dates[0])
+    end = pd.to_datetime(listings['end'].reindex(tickers)).fillna(dates[-1])
+
+    first = dates.searchsorted(start.to_numpy(), side='left')
+    last = dates.searchsorted(end.to_numpy(), side='right')
+    rows = np.arange(len(dates))[:, None]
+    return (rows >= first[None, :]) & (rows < last[None, :])
+
+
+def _with_counts(mask):
+    """티커별·날짜별 관측 수와 첫/마지막 관측 위치 계산"""
+    valid = mask['valid']
+    T = valid.shape[0]
+    has_data = valid.any(axis=0)
+
+    mask['ticker_counts'] = valid.sum(axis=0)
+    mask['date_counts'] = valid.sum(axis=1)
+    # 첫 관측 = 상장(IPO) 시점, 마지막 관측 = 상장폐지 시점 (관측이 없으면 -1)
+    mask['first_valid'] = np.where(has_data, valid.argmax(axis=0), -1)
+    mask['last_valid'] = np.where(has_data, T - 1 - valid[::-1].argmax(axis=0), -1)
+    return mask
+
+
+def align_validity(mask, dates, tickers):
+    """
+    비트맵을 정렬된 날짜·티커 부분집합으로 축소 (없는 날짜/티커는 결측)
+    """
+    rows = mask['dates'].get_indexer(dates)
+    cols = mask['tickers'].get_indexer(tickers)
+
+    if (rows >= 0).all() and (cols >= 0).all():
+        valid = mask['valid'][np.ix_(rows, cols)]
+    else:
+        valid = np.zeros((len(dates), len(tickers)), dtype=bool)
+        r_ok, c_ok = rows >= 0, cols >= 0
+        valid[np.ix_(r_ok, c_ok)] = mask['valid'][np.ix_(rows[r_ok], cols[c_ok])]
+
+    return _with_counts({'dates': pd.Index(dates), 'tickers': pd.Index(tickers), 'valid': valid})
+
+
+def restrict_rows(mask, row_valid):
+    """
+    설계행렬 결측 행 등을 제외한 비트맵 (관측 수는 제외한 행만큼 차감)
+    """
+    if row_valid.all():
+        return mask
+    dropped = ~row_valid
+    restricted = dict(mask)
+    restricted['valid'] = mask['valid'] & row_valid[:, None]
+    restricted['ticker_counts'] = mask['ticker_counts'] - mask['valid'][dropped].sum(axis=0)
+    restricted['date_counts'] = np.where(row_valid, mask['date_counts'], 0)
+    return restricted
+
+
+def listed_mask(mask):
+    """
+    첫 관측~마지막 관측 사이 = 상장 중 (T x N)
+    상장 중인데 결측인 셀은 거래정지 등 일시적 결측
+    """
+    rows = np.arange(mask['valid'].shape[0])[:, None]
+    return (rows >= mask['first_valid'][None, :]) & (rows <= mask['last_valid'][None, :]) \
+        & (mask['first_valid'] >= 0)[None, :]
+
+
+def masked_means(values, mask, membership, dtype=np.float64):
+    """
+    소속 마스크 (N x P)별 동일가중 평균을 한 번의 행렬곱으로 (T x P)
+    날짜마다 관측된 주식만 평균 (pandas mean(axis=1)과 동일)
+    dtype: 합계 정밀도 (float32면 결과도 float32, 개수는 float64로 정확히)
+    """
+    valid = mask['valid']
+    sums = np.where(valid, values, 0.0).astype(dtype, copy=False) @ np.asarray(membership, dtype=dtype)
+    counts = valid.astype(float) @ np.asarray(membership, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (sums / counts).astype(dtype, copy=False)
+
+
+def period_masked_means(values, mask, memberships, holding, dtype=np.float64):
+    """
+    보유 기간마다 바뀌는 소속 마스크 (R x N x P)의 동일가중 평균 (T x P)
+
+    holding: 날짜별 보유 기간 번호 (T,, 비감소, -1은 편입 전 → NaN)
+    기간별 연속 구간에 masked_means를 적용해 수익률 패널을 한 번만 통과
+    """
+    T, P = len(holding), memberships.shape[-1]
+    out = np.full((T, P), np.nan, dtype=dtype)
+
+    starts = np.flatnonzero(np.diff(holding, prepend=holding[0] - 1))
+    stops = np.append(starts[1:], T)
+    for start, stop in zip(starts, stops):
+        period = holding[start]
+        if period < 0:
+            continue
+        rows = slice(start, stop)
+        out[rows] = masked_means(values[rows], {'valid': mask['valid'][rows]}, memberships[period], dtype)
+    return out
+
+
+def pack_validity(mask):
+    """저장용: 비트맵을 np.packbits로 8배 압축"""
+    return {
+        'packed': np.packbits(mask['valid'], axis=1),
+        'shape': np.array(mask['valid'].shape),
+        'dates': mask['dates'].to_numpy(),
+        'tickers': mask['tickers'].to_numpy(dtype=str)
+    }
+
+
+def unpack_validity(packed):
+    """pack_validity의 역변환"""
+    T, N = packed['shape']
+    valid = np.unpackbits(packed['packed'], axis=1, count=N).astype(bool)
+    return _with_counts({
+        'dates': pd.DatetimeIndex(packed['dates']),
+        'tickers': pd.Index(packed['tickers']),
+        'valid': valid
+    })
+
+
+def save_validity_mask(mask, path):
+    """압축 비트맵을 .npz로 저장"""
+    np.savez_compressed(path, **pack_validity(mask))
+
+
+def load_validity_mask(path):
+    """저장된 .npz 비트맵 로드"""
+    with np.load(path, allow_pickle=False) as data:
+        return unpack_validity({key: data[key] for key in data.files})
+
+
+def summarize_validity(mask):
+    """비트맵 요약 출력"""
+    valid = mask['valid']
+    listed = listed_mask(mask)
+    T, N = valid.shape
+    print(f"\n🧮 패널 유효성 비트맵:")
+    print(f"   - 크기: {T}일 x {N}개 티커 (결측 {1 - valid.mean():.1%})")
+    print(f"   - 기간 중 상장(IPO): {int((mask['first_valid'] > 0).sum())}개, "
+          f"상장폐지: {int(((mask['last_valid'] >= 0) & (mask['last_valid'] < T - 1)).sum())}개")
+    print(f"   - 상장 중 일시 결측: {int((listed & ~valid).sum()):,}셀")
@@ -0,0 +1,190 @@
+"""
+SMB_mega 프리미엄 순열(플라시보) 검정
+리밸런싱마다 그때의 small/big 구성 종목을 무작위로 재배정해 SMB_mega를 다시 만들고
+Fama-MacBeth를 반복 실행하여 관측된 프리미엄의 경험적 p-value를 계산
+"""
+
+import pandas as pd
+import numpy as np
+import warnings
+warnings.filterwarnings('ignore')
+
+from fama_macbeth_core import (
+    stage1_betas_varying, stage2_gammas, stage3_summary
+)
+from panel_validity import build_validity_mask, align_validity, restrict_rows, period_masked_means
+from universe_index import band_memberships, holding_periods
+from precision import resolve_dtype, is_reduced, sample_indices, check_precision
+from trading_calendar import align
+
+SMB_POSITION = 2   # 설계행렬 [상수, Mkt-RF, SMB_mega, HML]에서 SMB_mega 열 위치
+
+
+def random_membership_masks(small, big, n_permutations, rng):
+    """
+    리밸런싱별 무작위 small/big 소속 마스크 (R x N x B)
+    small, big: 실제 소속 (R x N), 리밸런싱마다 그때의 small ∪ big 종목을 같은 그룹 크기로 재배정
+    """
+    pool = small | big
+    # 리밸런싱·열마다 독립적인 무작위 순위 (구성 밖 종목은 맨 뒤)
+    keys = np.where(pool[..., None], rng.random(pool.shape + (n_permutations,)), np.inf)
+    ranks = keys.argsort(axis=1).argsort(axis=1)
+    n_small = small.sum(axis=1)[:, None, None]
+    small_masks = ranks < n_small
+    big_masks = (ranks >= n_small) & pool[..., None]
+    return small_masks, big_masks
+
+
+def batched_smb_factors(returns, mask, small_masks, big_masks, holding, dtype=np.float64):
+    """
+    B개의 리밸런싱별 소속 마스크 (R x N x B)로 SMB_mega 시계열을 수익률 패널 한 번 통과로 계산 (T x B)
+    각 날짜에 관측된 주식만으로 동일가중 평균 (universe_index.band_portfolios와 동일)
+    """
+    B = small_masks.shape[-1]
+    # [small | big] 마스크 스택 전체에 대한 평균
+    means = period_masked_means(returns, mask, np.concatenate([small_masks, big_masks], axis=-1), holding, dtype)
+    return means[:, :B] - means[:, B:]
+
+
+def run_permutation_batch(returns, excess, mask, stage1_mask, X_shared, small_masks, big_masks, holding,
+                          dtype=np.float64):
+    """
+    마스크 배치에 대해 SMB 구성 → Stage 1 → Stage 2 → Stage 3 실행
+    stage1_mask: 공통 열·RF 결측 날짜를 제외한 비트맵, SMB 결측 날짜는 순열별로 제외 (배치 크기와 무관한 표본)
+    반환: 배치별 SMB 프리미엄 평균과 t-통계량 (B,)
+    """
+    smb = batched_smb_factors(returns, mask, small_masks, big_masks, holding, dtype)
+
+    coeffs, _, ok, _ = stage1_betas_varying(excess, stage1_mask['valid'], X_shared, smb,
+                                         SMB_POSITION, stage1_mask['ticker_counts'], dtype)
+    gammas, _, _ = stage2_gammas(returns, mask['valid'], coeffs[:, :, 1:], ok, dtype)
+
+    mean, _, t_stat, _, _ = stage3_summary(gammas[:, :, SMB_POSITION], axis=1)
+    return mean, t_stat
+
+
+def permutation_test(returns_df, ff_df, universe, bands,
+                     n_permutations=5000, batch_size=250, seed=42, validity=None,
+                     precision='float64'):
+    """
+    SMB_mega 프리미엄 순열 검정
+
+    universe: 유니버스 색인, bands: {'Small': (시작, 끝), 'Big': (시작, 끝)} 0부터 시작하는 순위 구간
+    관측값은 시점 기준 구간 포트폴리오 SMB (create_enhanced_mega_factors의 SMB와 같은 계열)로,
+    귀무분포는 리밸런싱마다 small ∪ big 종목을 무작위 재배정한 SMB로 같은 엔진을 통해 계산
+    Stage 1/2 횡단면은 enhanced_fama_macbeth와 같이 수익률 패널 전체 종목
+    precision='float32'이면 귀무분포만 float32로 계산 (관측값은 항상 float64)하고
+    첫 배치의 일부 순열을 float64로 다시 계산해 오차를 검증
+    """
+    dtype = resolve_dtype(precision)
+    print("\n" + "=" * 60)
+    print("SMB_mega 순열(플라시보) 검정")
+    print("=" * 60)
+
+    # 데이터 정렬
+    returns_aligned, ff_aligned = align(returns_df, ff_df)
+    common_dates = returns_aligned.index
+    tickers = returns_aligned.columns
+
+    if validity is None:
+        validity = build_validity_mask(returns_aligned)
+    mask = align_validity(validity, common_dates, tickers)
+
+    R = returns_aligned.to_numpy(dtype=float)
+    rf = ff_aligned['RF'].to_numpy(dtype=float)
+    excess = R - rf[:, None]
+    X_shared = np.column_stack([
+        np.ones(len(common_dates)),
+        ff_aligned['Mkt-RF'].to_numpy(dtype=float),
+        ff_aligned['HML'].to_numpy(dtype=float)
+    ])
+    stage1_mask = restrict_rows(mask, np.isfinite(X_shared).all(axis=1) & np.isfinite(rf))
+
+    # 리밸런싱별 실제 소속 (R x N)과 날짜별 보유 기간
+    memberships, _ = band_memberships(universe, tickers, {'Small': bands['Small'], 'Big': bands['Big']})
+    actual_small, actual_big = memberships[..., 0], memberships[..., 1]
+    holding = holding_periods(universe, common_dates)
+    in_sample = np.unique(holding[holding >= 0])
+
+    print(f"\n📊 검정 설정:")
+    print(f"   - 횡단면: {len(tickers)}개 주식, 리밸런싱 {len(in_sample)}회 "
+          f"(Small 평균 {actual_small[in_sample].sum(axis=1).mean():.0f}, "
+          f"Big 평균 {actual_big[in_sample].sum(axis=1).mean():.0f})")
+    print(f"   - 기간: {len(common_dates)}일")
+    print(f"   - 순열 횟수: {n_permutations:,}회 (배치 {batch_size}, {np.dtype(dtype).name})")
+
+    # 1. 관측값: 실제 시점 기준 배정
+    observed_mean, observed_t = run_permutation_batch(
+        R, excess, mask, stage1_mask, X_shared, actual_small[..., None], actual_big[..., None], holding
+    )
+    observed_mean, observed_t = observed_mean[0], observed_t[0]
+
+    # 2. 귀무분포: 리밸런싱별 무작위 배정을 배치 단위로 처리
+    rng = np.random.default_rng(seed)
+    null_means = np.empty(n_permutations)
+    null_t = np.empty(n_permutations)
+
+    for start in range(0, n_permutations, batch_size):
+        stop = min(start + batch_size, n_permutations)
+        small_masks, big_masks = random_membership_masks(actual_small, actual_big, stop - start, rng)
+        null_means[start:stop], null_t[start:stop] = run_permutation_batch(
+            R, excess, mask, stage1_mask, X_shared, small_masks, big_masks, holding, dtype
+        )
+
+        if start == 0 and is_reduced(dtype):
+            cols = sample_indices(stop - start)
+            exact_means, exact_t = run_permutation_batch(
+                R, excess, mask, stage1_mask, X_shared, small_masks[..., cols], big_masks[..., cols], holding
+            )
+            check_precision(null_means[cols], exact_means, '순열 SMB 프리미엄')
+            check_precision(null_t[cols], exact_t, '순열 t-통계량')
+        print(f"   - 진행: {stop:,}/{n_permutations:,}")
+
+    # 3. 경험적 p-value (양측, +1 보정)
+    finite = np.isfinite(null_t)
+    p_value_t = (1 + np.sum(np.abs(null_t[finite]) >= abs(observed_t))) / (1 + finite.sum())
+    p_value_mean = (1 + np.sum(np.abs(null_means[finite]) >= abs(observed_mean))) / (1 + finite.sum())
+
+    print(f"\n📈 순열 검정 결과:")
+    print(f"   - 관측 SMB_mega 프리미엄: {observed_mean*252:.1%} (t={observed_t:.2f})")
+    print(f"   - 귀무분포 t-통계량 5%/95%: [{np.nanpercentile(null_t, 5):.2f}, {np.nanpercentile(null_t, 95):.2f}]")
+    print(f"   - 경험적 p-value (t-통계량): {p_value_t:.4f}")
+    print(f"   - 경험적 p-value (프리미엄): {p_value_mean:.4f}")
+
+    return {
+        'observed_premium': observed_mean,
+        'observed_annual_premium': observed_mean * 252,
+        'observed_t_stat': observed_t,
+        'null_premiums': null_means,
+        'null_t_stats': null_t,
+        'p_value_t': p_value_t,
+        'p_value_premium': p_value_mean,
+        'n_permutations': int(finite.sum())
+    }
+
+
+def main():
+    """순열 검정 실행 (SMB_50: 101-200위 vs 1-100위)"""
+    from enhanced_mega_cap_analysis import load_and_prepare_data, MEGA_CAP_BANDS
+    from universe_index import load_universe
+
+    stocks_df, returns_df, ff_df = load_and_prepare_data()
+    universe = load_universe(stocks_df, returns_df)
+    validity = build_validity_mask(returns_df)
+
+    results = permutation_test(
+        returns_df, ff_df, universe, {'Small': MEGA_CAP_BANDS['Small_50'], 'Big': MEGA_CAP_BANDS['Big_50']},
+        validity=validity
+    )
+
+    pd.DataFrame({
+        'null_premium': results['null_premiums'],
+        'null_t_stat': results['null_t_stats']
+    }).to_csv('us_market/paper/Size_Reversal/back_data/permutation_null_distribution.csv', index=False)
+    print(f"\n   ✅ 귀무분포 저장: permutation_null_distribution.csv")
+
+    return results
+
+
+if __name__ == "__main__":
+    results = main()
@@ -0,0 +1,97 @@
+"""
+긴 일별 시계열 선 그래프용 데이터 축소 (벡터 PDF 크기·렌더링 시간 제한)
+M4 (구간별 첫·최소·최대·마지막 점) 또는 LTTB로 시리즈당 점 수를 상한 이하로 줄이고,
+결측 구간 경계는 그대로 남겨 선이 끊기는 위치를 보존
+"""
+
+import pandas as pd
+import numpy as np
+
+MAX_POINTS = 2000   # 시리즈당 최대 점 수 (논문 그림 폭 기준 픽셀 열 수 이상)
+
+
+def _numeric_x(x):
+    """x 좌표 → 실수 배열 (날짜는 ns 정수)"""
+    index = pd.Index(x)
+    if isinstance(index, pd.DatetimeIndex):
+        return index, index.asi8.astype(float)
+    return index, index.to_numpy(dtype=float)
+
+
+def _gap_boundaries(finite):
+    """유한/결측이 바뀌는 양쪽 위치 (결측 구간을 한 점씩 남겨 matplotlib이 선을 끊도록)"""
+    change = np.flatnonzero(finite[1:] != finite[:-1])
+    return np.concatenate([change, change + 1])
+
+
+def m4_indices(x, y, max_points=MAX_POINTS):
+    """
+    M4 축소: x 폭이 같은 max_points // 4 개 구간마다 첫·최소·최대·마지막 점
+    구간이 픽셀 열보다 좁으면 원본과 같은 래스터 (최소·최대 포락선 보존)
+    """
+    finite = np.flatnonzero(np.isfinite(y))
+    if len(finite) <= max_points:
+        return finite
+    xf, yf = x[finite], y[finite]
+    buckets = max(max_points // 4, 1)
+    span = xf[-1] - xf[0]
+    bucket = np.minimum(((xf - xf[0]) / span * buckets).astype(np.int64), buckets - 1) if span > 0 \
+        else np.zeros(len(xf), dtype=np.int64)
+
+    # 구간 번호·값 순 정렬 한 번으로 구간별 최소 (첫 위치)·최대 (마지막 위치)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:] - 1, len(bucket) - 1]
+    order = np.lexsort((yf, bucket))
+    picks = np.concatenate([starts, ends, order[starts], order[ends]])
+    return finite[np.unique(picks)]
+
+
+def lttb_indices(x, y, max_points=MAX_POINTS):
+    """
+    LTTB (Largest-Triangle-Three-Buckets): 구간마다 직전 선택점·다음 구간 평균과
+    만드는 삼각형 넓이가 가장 큰 점 하나 (모양 보존, 정확히 max_points개)
+    """
+    finite = np.flatnonzero(np.isfinite(y))
+    n = len(finite)
+    if n <= max_points or max_points < 3:
+        return finite
+    xf, yf = x[finite], y[finite]
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+
+    picks = np.empty(max_points, dtype=np.int64)
+    picks[0], picks[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        cx, cy = xf[nxt_lo:nxt_hi].mean(), yf[nxt_lo:nxt_hi].mean()
+        area = np.abs((xf[a] - cx) * (yf[lo:hi] - yf[a]) - (xf[a] - xf[lo:hi]) * (cy - yf[a]))
+        a = lo + int(area.argmax())
+        picks[i + 1] = a
+    return finite[picks]
+
+
+def decimate(x, y, max_points=MAX_POINTS, method='m4'):
+    """
+    선 그래프용 (x, y) 축소
+    method: 'm4' (최소·최대 보존, 기본) 또는 'lttb'
+    반환: 원래 타입의 x 부분 (날짜 인덱스 유지), y 배열
+    """
+    index, xs = _numeric_x(x)
+    values = np.asarray(y, dtype=float)
+    if method == 'm4':
+        picks = m4_indices(xs, values, max_points)
+    elif method == 'lttb':
+        picks = lttb_indices(xs, values, max_points)
+    else:
+        raise ValueError(f"method는 'm4' 또는 'lttb': {method}")
+    if len(picks) == len(values):
+        return index, values
+    picks = np.union1d(picks, _gap_boundaries(np.isfinite(values)))
+    return index[picks], values[picks]
+
+
+def plot_line(ax, x, y, max_points=MAX_POINTS, method='m4', **kwargs):
+    """ax.plot 대체: 축소한 점으로 그림 (스타일 인자는 그대로 전달)"""
+    xs, ys = decimate(x, y, max_points, method)
+    return ax.plot(xs, ys, **kwargs)
@@ -0,0 +1,103 @@
+"""
+일별 포트폴리오·팩터 수익률의 주간/월간/연간 복리 집계
+log1p 합계 → expm1 방식으로 한 번의 group-by로 복리 수익률 계산, portfolio_returns.csv 생성
+"""
+
+import pandas as pd
+import numpy as np
+import warnings
+warnings.filterwarnings('ignore')
+
+from trading_calendar import align
+
+FREQUENCIES = {'weekly': 'W', 'monthly': 'M', 'annual': 'Y'}
+DATE_FORMATS = {'weekly': '%Y-%m-%d', 'monthly': '%Y-%m', 'annual': '%Y'}
+
+
+def daily_series_for_aggregation(mega_factors_df, ff_df):
+    """
+    집계 대상 일별 수익률: Quintile, SMB 다리(Small_50/Big_50), 시장 수익률, 무위험 수익률
+    """
+    mega_aligned, ff_aligned = align(mega_factors_df, ff_df)
+
+    daily = mega_aligned[['Q1', 'Q2', 'Q3', 'Q4', 'Q5', 'Small_50', 'Big_50']].copy()
+    daily['Mkt'] = ff_aligned['Mkt-RF'] + ff_aligned['RF']
+    daily['RF'] = ff_aligned['RF']
+    return daily
+
+
+def compound_returns(daily_df, frequencies=('weekly', 'monthly', 'annual')):
+    """
+    일별 단순수익률을 주기별 복리 수익률로 집계 {주기: DataFrame}
+
+    log1p는 한 번만 계산하고 주기마다 전 열을 한 번의 group-by 합계로 처리
+    """
+    log_returns = np.log1p(daily_df)
+    compounded = {}
+    for name in frequencies:
+        periods = daily_df.index.to_period(FREQUENCIES[name])
+        sums = log_returns.groupby(periods).sum(min_count=1)
+        compounded[name] = np.expm1(sums)
+        compounded[name]['n_days'] = log_returns.notna().any(axis=1).groupby(periods).sum()
+    return compounded
+
+
+def build_portfolio_returns_table(compounded_df, frequency='monthly'):
+    """
+    portfolio_returns.csv 형식의 테이블
+    SMB_mega는 복리 누적한 Small/Big 다리의 차이 (일별 SMB 합계가 아님)
+    """
+    table = pd.DataFrame({
+        'date': compounded_df.index.strftime(DATE_FORMATS[frequency]),
+        'q1_return': compounded_df['Q1'].to_numpy(),
+        'q2_return': compounded_df['Q2'].to_numpy(),
+        'q3_return': compounded_df['Q3'].to_numpy(),
+        'q4_return': compounded_df['Q4'].to_numpy(),
+        'q5_return': compounded_df['Q5'].to_numpy(),
+        'smb_mega': (compounded_df['Small_50'] - compounded_df['Big_50']).to_numpy(),
+        'mkt_return': compounded_df['Mkt'].to_numpy(),
+        'rf_rate': compounded_df['RF'].to_numpy()
+    })
+    return table
+
+
+def load_portfolio_returns(path='us_market/paper/Size_Reversal/back_data/portfolio_returns.csv'):
+    """저장된 월간 테이블 로드 (date를 월말 Timestamp 인덱스로)"""
+    table = pd.read_csv(path)
+    table.index = pd.PeriodIndex(table.pop('date'), freq='M').to_timestamp(how='end').normalize()
+    return table
+
+
+def aggregate_and_save(mega_factors_df, ff_df,
+                       output_dir='us_market/paper/Size_Reversal/back_data'):
+    """복리 집계 실행 후 주기별 CSV 저장"""
+    print(f"\n📅 일별 → 주간/월간/연간 복리 집계")
+
+    daily = daily_series_for_aggregation(mega_factors_df, ff_df)
+    compounded = compound_returns(daily)
+
+    tables = {}
+    for frequency, frame in compounded.items():
+        tables[frequency] = build_portfolio_returns_table(frame, frequency)
+        print(f"   - {frequency}: {len(frame)}개 기간")
+
+    tables['monthly'].to_csv(f'{output_dir}/portfolio_returns.csv', index=False, float_format='%.6f')
+    tables['weekly'].to_csv(f'{output_dir}/portfolio_returns_weekly.csv', index=False, float_format='%.6f')
+    tables['annual'].to_csv(f'{output_dir}/portfolio_returns_annual.csv', index=False, float_format='%.6f')
+
+    print(f"   ✅ 저장: portfolio_returns.csv (+ _weekly, _annual)")
+    return tables
+
+
+def main():
+    """집계 파이프라인 실행"""
+    from enhanced_mega_cap_analysis import load_and_prepare_data, create_enhanced_mega_factors
+
+    stocks_df, returns_df, ff_df = load_and_prepare_data()
+    mega_factors_df, ticker_groups = create_enhanced_mega_factors(stocks_df, returns_df)
+
+    return aggregate_and_save(mega_factors_df, ff_df)
+
+
+if __name__ == "__main__":
+    tables = main()
@@ -0,0 +1,196 @@
+"""
+포트폴리오 시계열 회귀 및 GRS 검정
+Quintile/Tercile 포트폴리오를 Mkt-RF, SMB_mega, HML에 한 번의 다변량 풀이로 회귀하고
+월별(롤링) 팩터 로딩을 factor_loadings.csv로 저장
+"""
+
+import pandas as pd
+import numpy as np
+from scipy import stats
+import warnings
+warnings.filterwarnings('ignore')
+
+from least_squares import solve_shared_design, batched_least_squares, SOLVED, QR_FALLBACK
+from trading_calendar import align
+
+QUINTILE_PORTFOLIOS = ['Q1', 'Q2', 'Q3', 'Q4', 'Q5']
+TERCILE_PORTFOLIOS = ['Top_30', 'Middle_40', 'Bottom_30']
+LOADING_COLUMNS = ['alpha', 'mkt_beta', 'smb_beta', 'hml_beta']
+
+
+def prepare_regression_data(mega_factors_df, ff_df, portfolios, smb_factor='SMB_50'):
+    """
+    포트폴리오 초과수익률 Y (T x P)와 설계행렬 X [상수, Mkt-RF, SMB_mega, HML] (T x 4)
+    모든 열이 관측된 날짜만 사용
+    """
+    mega_aligned, ff_aligned = align(mega_factors_df, ff_df)
+    common_dates = mega_aligned.index
+    rf = ff_aligned['RF'].to_numpy(dtype=float)
+
+    Y = mega_aligned[portfolios].to_numpy(dtype=float) - rf[:, None]
+    X = np.column_stack([
+        np.ones(len(common_dates)),
+        ff_aligned['Mkt-RF'].to_numpy(dtype=float),
+        mega_aligned[smb_factor].to_numpy(dtype=float),
+        ff_aligned['HML'].to_numpy(dtype=float)
+    ])
+
+    row_valid = np.isfinite(X).all(axis=1) & np.isfinite(Y).all(axis=1)
+    return common_dates[row_valid], X[row_valid], Y[row_valid]
+
+
+def multivariate_regression(X, Y):
+    """
+    모든 포트폴리오를 한 번에 회귀: B = (X'X)⁻¹ X'Y (K x P)
+    X'X를 한 번 분해(Cholesky, 조건수 초과 시 QR)해 P개 우변을 동시에 풀이
+    반환: 계수, 잔차 공분산 (P x P), (X'X)⁻¹
+    """
+    T, K = X.shape
+    coeffs, xtx_inv, _ = solve_shared_design(X, Y)
+    residuals = Y - X @ coeffs
+    residual_cov = residuals.T @ residuals / (T - K)
+    return coeffs, residual_cov, xtx_inv
+
+
+def grs_test(X, Y):
+    """
+    Gibbons-Ross-Shanken(1989) 결합 알파 검정
+
+    GRS = (T/N)·((T-N-L)/(T-L-1))·α'Σ⁻¹α / (1 + μ'Ω⁻¹μ) ~ F(N, T-N-L)
+    """
+    T, K = X.shape
+    N = Y.shape[1]
+    L = K - 1
+
+    coeffs, _, _ = multivariate_regression(X, Y)
+    alpha = coeffs[0]
+    residuals = Y - X @ coeffs
+    sigma = residuals.T @ residuals / (T - L - 1)
+
+    factors = X[:, 1:]
+    mu = factors.mean(axis=0)
+    omega = np.cov(factors, rowvar=False, bias=True).reshape(L, L)
+
+    quad_alpha = alpha @ np.linalg.solve(sigma, alpha)
+    quad_mu = mu @ np.linalg.solve(omega, mu)
+
+    grs = (T / N) * ((T - N - L) / (T - L - 1)) * quad_alpha / (1 + quad_mu)
+    p_value = 1 - stats.f.cdf(grs, N, T - N - L)
+
+    return {
+        'grs_stat': grs,
+        'p_value': p_value,
+        'mean_abs_alpha': np.abs(alpha).mean(),
+        'n_portfolios': N,
+        'observations': T
+    }
+
+
+def full_sample_loadings(dates, X, Y, portfolios):
+    """전체 기간 포트폴리오 로딩과 알파 t-통계량"""
+    coeffs, residual_cov, xtx_inv = multivariate_regression(X, Y)
+    se_alpha = np.sqrt(np.diag(residual_cov) * xtx_inv[0, 0])
+
+    loadings = pd.DataFrame(coeffs.T, index=portfolios, columns=LOADING_COLUMNS)
+    loadings['t_stat_alpha'] = coeffs[0] / se_alpha
+    return loadings
+
+
+def rolling_monthly_loadings(dates, X, Y, portfolios, window_months=1, min_obs=15):
+    """
+    월말마다 직전 window_months개월 일별 데이터로 모든 포트폴리오를 회귀
+
+    누적 X'X, X'Y, Y'Y를 한 번 만들고 창(window)마다 차분하여 배치 풀이
+    """
+    T, K = X.shape
+    P = Y.shape[1]
+
+    xtx = np.zeros((T + 1, K, K))
+    xty = np.zeros((T + 1, K, P))
+    yty = np.zeros((T + 1, P))
+    np.cumsum(X[:, :, None] * X[:, None, :], axis=0, out=xtx[1:])
+    np.cumsum(X[:, :, None] * Y[:, None, :], axis=0, out=xty[1:])
+    np.cumsum(Y ** 2, axis=0, out=yty[1:])
+
+    # 월별 경계: 각 월의 마지막 관측 다음 위치
+    months = dates.to_period('M')
+    month_ends = np.flatnonzero(np.append(months[1:] != months[:-1], True)) + 1
+    month_starts = np.concatenate([[0], month_ends[:-1]])
+    window_starts = month_starts[np.maximum(np.arange(len(month_ends)) - window_months + 1, 0)]
+
+    n = month_ends - window_starts
+    gram = xtx[month_ends] - xtx[window_starts]                 # W x K x K
+    rhs = xty[month_ends] - xty[window_starts]                  # W x K x P
+    ok = n > max(min_obs, K)
+
+    # 포트폴리오 P개와 (X'X)⁻¹ 첫 열을 우변 행렬로 두고 창 W개를 한 번에 풀이
+    # (창별 원자료 QR 대체 없이 조건수 초과 창은 제외)
+    unit = np.broadcast_to(np.eye(K)[:, [0]], (len(n), K, 1))
+    solved, status = batched_least_squares(gram, np.concatenate([rhs, unit], axis=2), ok)
+    ok = (status == SOLVED) | (status == QR_FALLBACK)
+    coeffs = solved[:, :, :P].transpose(0, 2, 1)              # W x P x K
+    gram_inv00 = solved[:, 0, P]
+
+    # 잔차 분산: y'y - b'X'y
+    sse = (yty[month_ends] - yty[window_starts]) - np.einsum('wpk,wkp->wp', coeffs, rhs)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sigma2 = sse / (n - K)[:, None]
+        t_alpha = coeffs[:, :, 0] / np.sqrt(sigma2 * gram_inv00[:, None])
+
+    labels = months[month_ends - 1].strftime('%Y-%m')
+    frame = pd.DataFrame({
+        'date': np.repeat(labels, P),
+        'portfolio': np.tile(portfolios, len(labels)),
+        'mkt_beta': coeffs[:, :, 1].ravel(),
+        'smb_beta': coeffs[:, :, 2].ravel(),
+        'hml_beta': coeffs[:, :, 3].ravel(),
+        'alpha': coeffs[:, :, 0].ravel(),
+        't_stat_alpha': t_alpha.ravel()
+    })
+    return frame[np.repeat(ok, P)].reset_index(drop=True)
+
+
+def run_portfolio_regressions(mega_factors_df, ff_df, smb_factor='SMB_50', window_months=1):
+    """Quintile/Tercile 포트폴리오 시계열 회귀와 GRS 검정 실행"""
+    print("\n" + "=" * 60)
+    print("포트폴리오 시계열 회귀 및 GRS 검정")
+    print("=" * 60)
+
+    results = {}
+    for name, portfolios in [('Quintile', QUINTILE_PORTFOLIOS), ('Tercile', TERCILE_PORTFOLIOS)]:
+        portfolios = [p for p in portfolios if p in mega_factors_df.columns]
+        dates, X, Y = prepare_regression_data(mega_factors_df, ff_df, portfolios, smb_factor)
+
+        loadings = full_sample_loadings(dates, X, Y, portfolios)
+        grs = grs_test(X, Y)
+        rolling = rolling_monthly_loadings(dates, X, Y, portfolios, window_months)
+
+        print(f"\n📊 {name} 포트폴리오 ({len(portfolios)}개, {len(dates)}일):")
+        for portfolio, row in loadings.iterrows():
+            print(f"   - {portfolio}: β_mkt={row['mkt_beta']:.3f}, β_smb={row['smb_beta']:.3f}, "
+                  f"β_hml={row['hml_beta']:.3f}, α={row['alpha']*252:.1%} (t={row['t_stat_alpha']:.2f})")
+        print(f"   - GRS = {grs['grs_stat']:.3f} (p={grs['p_value']:.3f})")
+
+        results[name] = {'loadings': loadings, 'grs': grs, 'rolling': rolling}
+
+    return results
+
+
+def main():
+    """포트폴리오 회귀 실행 및 factor_loadings.csv 저장"""
+    from enhanced_mega_cap_analysis import load_and_prepare_data, create_enhanced_mega_factors
+
+    stocks_df, returns_df, ff_df = load_and_prepare_data()
+    mega_factors_df, ticker_groups = create_enhanced_mega_factors(stocks_df, returns_df)
+
+    results = run_portfolio_regressions(mega_factors_df, ff_df)
+
+    results['Quintile']['rolling'].to_csv('us_market/paper/Size_Reversal/back_data/factor_loadings.csv',
+                                          index=False, float_format='%.4f')
+    print(f"\n   ✅ 월별 팩터 로딩 저장: factor_loadings.csv")
+
+    return results
+
+
+if __name__ == "__main__":
+    results = main()
@@ -0,0 +1,94 @@
+"""
+연산 정밀도 옵션 (float64 / float32)
+대용량 패널은 float32로 두고 누적(Gram 행렬, Stage 3 평균)은 float64로 처리하며
+표본 일부를 float64로 다시 계산해 오차가 허용치를 넘으면 경고
+"""
+
+import warnings
+
+import numpy as np
+
+PRECISIONS = {'float64': np.float64, 'float32': np.float32}
+ACCUMULATION_BLOCK = 256        # float32 모드: 날짜 블록별 부분합을 float64로 누적
+PRECISION_TOLERANCE = 1e-3      # float64 대비 허용 상대오차
+PRECISION_SAMPLE = 25           # 검증용 표본 크기 (티커·날짜·순열)
+
+
+class PrecisionWarning(UserWarning):
+    """float32 결과가 float64 검증 표본과 허용치 이상 차이날 때"""
+
+
+def resolve_dtype(precision):
+    """'float32' / 'float64' (또는 numpy dtype) → numpy 스칼라 타입"""
+    if isinstance(precision, str):
+        if precision not in PRECISIONS:
+            raise ValueError(f"precision은 {list(PRECISIONS)} 중 하나여야 합니다: {precision}")
+        return PRECISIONS[precision]
+    return np.dtype(precision).type
+
+
+def is_reduced(dtype):
+    """float64보다 낮은 정밀도인지"""
+    return np.dtype(dtype).itemsize < 8
+
+
+def accumulate_product(A, B, dtype=np.float64):
+    """
+    Aᵀ @ B (첫 축 합산)를 float64 결과로
+
+    float32 모드에서는 블록마다 float32 행렬곱(BLAS 처리량 2배)을 하고 부분합만 float64로 누적
+    """
+    if not is_reduced(dtype):
+        return A.T @ B
+
+    out = np.zeros((A.shape[1], B.shape[1]))
+    for start in range(0, A.shape[0], ACCUMULATION_BLOCK):
+        stop = start + ACCUMULATION_BLOCK
+        out += A[start:stop].T @ B[start:stop]
+    return out
+
+
+def accumulate_matmul(A, B, dtype=np.float64):
+    """
+    배치 행렬곱 A @ B (A의 마지막 축 합산)를 float64 결과로
+
+    float32 모드에서는 합산 축을 블록으로 나눠 float32 행렬곱 후 부분합만 float64로 누적
+    """
+    if not is_reduced(dtype):
+        return A @ B
+
+    out = np.zeros(np.broadcast_shapes(A.shape[:-2], B.shape[:-2]) + (A.shape[-2], B.shape[-1]))
+    for start in range(0, A.shape[-1], ACCUMULATION_BLOCK):
+        stop = start + ACCUMULATION_BLOCK
+        out += A[..., start:stop] @ B[..., start:stop, :]
+    return out
+
+
+def sample_indices(n, size=PRECISION_SAMPLE, seed=0):
+    """검증용 표본 위치 (정렬)"""
+    if n <= size:
+        return np.arange(n)
+    return np.sort(np.random.default_rng(seed).choice(n, size, replace=False))
+
+
+def relative_error(approx, exact):
+    """유한한 원소 기준 최대 상대오차 (분모는 exact의 최대 절댓값)"""
+    approx = np.asarray(approx, dtype=float)
+    exact = np.asarray(exact, dtype=float)
+    finite = np.isfinite(approx) & np.isfinite(exact)
+    if not finite.any():
+        return 0.0
+    scale = max(np.abs(exact[finite]).max(), np.finfo(float).tiny)
+    return np.abs(approx[finite] - exact[finite]).max() / scale
+
+
+def check_precision(approx, exact, label, tolerance=PRECISION_TOLERANCE):
+    """
+    감소 정밀도 결과를 float64 표본과 비교, 허용치 초과 시 경고 후 오차 반환
+    """
+    error = relative_error(approx, exact)
+    if error > tolerance:
+        message = f"{label}: float32 상대오차 {error:.2e} > 허용치 {tolerance:.0e}"
+        print(f"   ⚠️ 정밀도 경고 - {message}")
+        warnings.warn(message, PrecisionWarning, stacklevel=2)
+    return error
@@ -0,0 +1,322 @@
+"""
+SMB_mega 프리미엄 곡면 스윕: 분할점 (상위 k vs 나머지) x 가중 방식 x 추정 창
+셀마다 SMB 구성 → Stage 1 (전 기간 또는 직전 창 이동 베타) → Stage 2 → Stage 3을 프로세스 풀로 병렬 실행
+공유 패널은 한 번 .npy로 써서 작업 프로세스가 mmap으로 공유, 끝난 셀은 체크포인트 파일로 남겨 중단 후 재개
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import numpy as np
+import matplotlib.pyplot as plt
+import warnings
+warnings.filterwarnings('ignore')
+
+from fama_macbeth_core import (
+    build_design, stage1_betas, rolling_stage1_betas, stage2_gammas, stage2_gammas_panel, stage3_summary
+)
+from panel_validity import build_validity_mask, period_masked_means
+from universe_index import band_memberships, holding_periods, save_universe_index, load_universe_index
+from trading_calendar import align
+from build_artifacts import SOLVER_CODE, code_hash
+
+SWEEP_DIR = 'us_market/paper/Size_Reversal/back_data/smb_sweep'         # 공유 패널 + 셀 체크포인트
+SURFACE_PATH = 'us_market/paper/Size_Reversal/back_data/smb_surface.npz'
+SPLITS = list(range(10, 200, 10))   # 상위 k개 (Big) vs k+1 ~ SWEEP_DEPTH위 (Small)
+SWEEP_DEPTH = 200
+WEIGHTINGS = ['equal', 'value']     # value: 전일 시가총액 가중 (시점 기준 시가총액 파일이 있을 때만)
+WINDOWS = [0, 126, 252, 504]        # Stage 1 추정 창 (거래일, 0 = 전 기간 정적 베타)
+CELL_FIELDS = ['premium', 't_stat', 'p_value', 'days', 'smb_mean', 'stocks']
+MAX_JOBS = 4
+# 셀 결과가 의존하는 코드 (바뀌면 체크포인트 폐기)
+SWEEP_CODE = SOLVER_CODE + ['premium_surface.py', 'universe_index.py', 'trading_calendar.py',
+                            'characteristic_regression.py:market_cap_panel', 'characteristic_regression.py:lagged']
+
+_SHARED = {}    # 작업 프로세스별 공유 패널 (mmap)
+
+
+def sweep_grid(splits=SPLITS, weightings=WEIGHTINGS, windows=WINDOWS):
+    """셀 목록 (k, 가중, 창), 비용이 큰 이동 베타 셀부터"""
+    return [(k, weighting, window) for window in sorted(windows, reverse=True)
+            for weighting in weightings for k in splits]
+
+
+def cell_name(cell):
+    """체크포인트 파일 이름 (예: k050_value_w252)"""
+    k, weighting, window = cell
+    return f'k{k:03d}_{weighting}_w{window}'
+
+
+def _fingerprint(arrays):
+    """공유 패널 내용 해시 (데이터가 바뀌면 기존 체크포인트 폐기)"""
+    digest = hashlib.sha256()
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def sweep_fingerprint(data_fingerprint, splits, weightings, windows, code=SWEEP_CODE):
+    """
+    체크포인트 지문: 데이터 지문 + 격자 설정 (분할점·가중·창·SWEEP_DEPTH·통계량) + 코드 해시
+    (build_artifacts.code_hash와 같은 방식) — 하나라도 바뀌면 기존 체크포인트 폐기
+    """
+    cache = {}
+    settings = {
+        'data': data_fingerprint,
+        'splits': [int(k) for k in splits],
+        'weightings': list(weightings),
+        'windows': [int(w) for w in windows],
+        'depth': SWEEP_DEPTH,
+        'fields': CELL_FIELDS,
+        'code': {spec: code_hash(spec, cache) for spec in code}
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def prepare_shared(returns_df, ff_df, universe, sweep_dir=SWEEP_DIR):
+    """
+    작업 프로세스가 공유할 패널을 sweep_dir/shared에 한 번 저장
+    수익률·유효성·팩터·보유 기간 .npy와 유니버스 색인 .npz,
+    시점 기준 시가총액 파일이 있으면 전일 시가총액 .npy (없으면 이전 실행의 caps.npy도 삭제)
+    반환: 데이터 지문, 시가총액 패널 유무
+    """
+    from characteristic_regression import market_cap_panel, lagged
+
+    returns_aligned, ff_aligned = align(returns_df, ff_df)
+    common_dates = returns_aligned.index
+    validity = build_validity_mask(returns_aligned)
+    cap_panel = market_cap_panel(returns_aligned)
+
+    arrays = {
+        'returns': returns_aligned.to_numpy(dtype=float),
+        'valid': validity['valid'],
+        'ff': ff_aligned[['Mkt-RF', 'HML', 'RF']].to_numpy(dtype=float),
+        'holding': holding_periods(universe, common_dates)
+    }
+    if cap_panel is not None:
+        arrays['caps'] = lagged(cap_panel.to_numpy(dtype=float))
+    path = os.path.join(sweep_dir, 'shared')
+    os.makedirs(path, exist_ok=True)
+    if cap_panel is None and os.path.exists(os.path.join(path, 'caps.npy')):
+        os.remove(os.path.join(path, 'caps.npy'))
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f'{name}.npy'), array, allow_pickle=False)
+    np.save(os.path.join(path, 'tickers.npy'), returns_aligned.columns.to_numpy(dtype=str), allow_pickle=False)
+    save_universe_index(universe, os.path.join(path, 'universe.npz'))
+    return _fingerprint(list(arrays.values()) + [universe['ranked']]), cap_panel is not None
+
+
+def _init_worker(sweep_dir):
+    """작업 프로세스 초기화: 공유 패널을 읽기 전용 mmap으로 (프로세스 간 복사 없음)"""
+    path = os.path.join(sweep_dir, 'shared')
+    _SHARED.clear()
+    for name in ['returns', 'valid', 'ff', 'caps', 'holding']:
+        if os.path.exists(os.path.join(path, f'{name}.npy')):
+            _SHARED[name] = np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+    _SHARED['tickers'] = pd.Index(np.load(os.path.join(path, 'tickers.npy')))
+    _SHARED['universe'] = load_universe_index(os.path.join(path, 'universe.npz'))
+
+
+def sweep_smb(shared, k, weighting):
+    """분할점 k의 SMB (T,) = (k+1 ~ SWEEP_DEPTH위) - (상위 k), 동일가중 또는 전일 시가총액 가중"""
+    bands = {'Small': (k, SWEEP_DEPTH), 'Big': (0, k)}
+    masks, _ = band_memberships(shared['universe'], shared['tickers'], bands)
+    returns, valid, holding = shared['returns'], shared['valid'], shared['holding']
+    if weighting == 'equal':
+        legs = period_masked_means(returns, {'valid': valid}, masks, holding)
+    elif weighting == 'value':
+        # Σ r·w / Σ w: 같은 마스크의 두 평균 비율 (개수는 약분)
+        caps = np.asarray(shared['caps'])
+        mask = {'valid': valid & np.isfinite(caps)}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            legs = period_masked_means(returns * np.nan_to_num(caps), mask, masks, holding) \
+                / period_masked_means(np.nan_to_num(caps), mask, masks, holding)
+    else:
+        raise ValueError(f"가중 방식은 {WEIGHTINGS} 중 하나: {weighting}")
+    return legs[:, 0] - legs[:, 1]
+
+
+def cell_statistics(shared, cell):
+    """셀 하나의 SMB_mega 프리미엄 통계 (CELL_FIELDS 순서 배열, 프리미엄·SMB 평균은 일별)"""
+    k, weighting, window = cell
+    R = np.asarray(shared['returns'])
+    valid = np.asarray(shared['valid'])
+    mkt, hml, rf = np.asarray(shared['ff']).T
+    smb = sweep_smb(shared, k, weighting)
+
+    X, row_valid = build_design(pd.DataFrame({'Mkt-RF': mkt, 'HML': hml}), smb)
+    row_valid &= np.isfinite(rf)
+    excess = R - rf[:, None]
+    stage1_valid = valid & row_valid[:, None]
+
+    if window == 0:
+        coeffs, _, ok, _ = stage1_betas(excess, stage1_valid, X)
+        gammas, n_stocks, _ = stage2_gammas(R, valid, coeffs[:, 1:], ok)
+    else:
+        coeffs, ok = rolling_stage1_betas(excess, stage1_valid, X, window)
+
+        def Z(start, stop):
+            Tb = stop - start
+            return np.concatenate([np.ones((Tb, R.shape[1], 1)), coeffs[start:stop, :, 1:]], axis=2)
+
+        gammas, n_stocks, _ = stage2_gammas_panel(R, valid, Z, ok)
+
+    solved = np.isfinite(gammas).all(axis=1)
+    mean, _, t_stat, p_value, n = stage3_summary(gammas[solved][:, 2], axis=0)
+    return np.array([mean, t_stat, p_value, n, np.nanmean(smb[row_valid]),
+                     n_stocks[solved].mean() if solved.any() else np.nan])
+
+
+def _run_cell(cell, checkpoint_dir):
+    """작업 단위: 셀 계산 후 체크포인트 저장 (임시 파일 → os.replace, 반쯤 쓴 파일 없음)"""
+    stats = cell_statistics(_SHARED, cell)
+    path = os.path.join(checkpoint_dir, f'{cell_name(cell)}.npy')
+    np.save(path + '.tmp.npy', stats, allow_pickle=False)
+    os.replace(path + '.tmp.npy', path)
+    return cell, stats
+
+
+def _checkpoint_dir(fingerprint, sweep_dir):
+    """체크포인트 디렉터리 (지문이 다르면 비우고 새로 시작)"""
+    path = os.path.join(sweep_dir, 'cells')
+    meta_path = os.path.join(sweep_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f).get('fingerprint') != fingerprint:
+                shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+    with open(meta_path, 'w') as f:
+        json.dump({'fingerprint': fingerprint, 'fields': CELL_FIELDS}, f, indent=1)
+    return path
+
+
+def run_sweep(returns_df, ff_df, universe, splits=SPLITS, weightings=WEIGHTINGS, windows=WINDOWS,
+              jobs=MAX_JOBS, sweep_dir=SWEEP_DIR):
+    """
+    격자 전체 스윕 (이미 체크포인트가 있는 셀은 건너뜀, 데이터·격자 설정·코드가 바뀌면 처음부터)
+    jobs <= 1이면 현재 프로세스에서 순차 실행
+    시점 기준 시가총액 파일이 없으면 'value' 가중은 격자에서 제외
+    반환: 곡면 dict (save_surface 형식)
+    """
+    data_fingerprint, has_caps = prepare_shared(returns_df, ff_df, universe, sweep_dir)
+    if not has_caps and 'value' in weightings:
+        from characteristic_regression import MARKET_CAP_PATH
+        print(f"   ⚠️ 시점 기준 시가총액 패널 없음 ({MARKET_CAP_PATH}), 'value' 가중 제외")
+        weightings = [weighting for weighting in weightings if weighting != 'value']
+    checkpoint_dir = _checkpoint_dir(sweep_fingerprint(data_fingerprint, splits, weightings, windows), sweep_dir)
+
+    cells = sweep_grid(splits, weightings, windows)
+    done = {}
+    for cell in cells:
+        path = os.path.join(checkpoint_dir, f'{cell_name(cell)}.npy')
+        if os.path.exists(path):
+            done[cell] = np.load(path)
+    todo = [cell for cell in cells if cell not in done]
+    print(f"   - 격자 {len(cells)}개 셀: 체크포인트 {len(done)}개, 계산 {len(todo)}개 (프로세스 {jobs}개)")
+
+    start = time.time()
+    if jobs <= 1:
+        _init_worker(sweep_dir)
+        finished = (_run_cell(cell, checkpoint_dir) for cell in todo)
+    else:
+        pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(sweep_dir,))
+        finished = (future.result() for future in
+                    as_completed([pool.submit(_run_cell, cell, checkpoint_dir) for cell in todo]))
+    try:
+        for i, (cell, stats) in enumerate(finished, 1):
+            done[cell] = stats
+            if i % 10 == 0 or i == len(todo):
+                print(f"   - {i}/{len(todo)} 셀 완료 ({time.time() - start:.1f}초)")
+    finally:
+        if jobs > 1:
+            pool.shutdown(cancel_futures=True)
+
+    surface = np.full((len(CELL_FIELDS), len(weightings), len(splits), len(windows)), np.nan)
+    for (k, weighting, window), stats in done.items():
+        surface[:, weightings.index(weighting), splits.index(k), windows.index(window)] = stats
+    return {'splits': np.asarray(splits), 'weightings': list(weightings), 'windows': np.asarray(windows),
+            'fields': list(CELL_FIELDS), 'surface': surface}
+
+
+def save_surface(surface, path=SURFACE_PATH):
+    """곡면을 .npz 한 파일로 (surface: 통계량 x 가중 x 분할점 x 창 float64 배열 + 축 라벨)"""
+    np.savez(path, splits=surface['splits'], weightings=np.asarray(surface['weightings'], dtype=str),
+             windows=surface['windows'], fields=np.asarray(surface['fields'], dtype=str),
+             surface=surface['surface'])
+
+
+def load_surface(path=SURFACE_PATH):
+    """저장된 곡면 로드 (save_surface 형식 dict)"""
+    with np.load(path, allow_pickle=False) as data:
+        return {'splits': data['splits'], 'weightings': list(data['weightings']), 'windows': data['windows'],
+                'fields': list(data['fields']), 'surface': data['surface']}
+
+
+def surface_field(surface, field):
+    """통계량 하나의 (가중 x 분할점 x 창) 배열"""
+    return surface['surface'][surface['fields'].index(field)]
+
+
+def plot_surface(surface, path='us_market/paper/Size_Reversal/figures/fig_smb_surface.pdf'):
+    """가중 방식별 분할점 x 추정 창 연율 프리미엄 히트맵 (칸마다 t-통계량)"""
+    premium = surface_field(surface, 'premium') * 252
+    t_stat = surface_field(surface, 't_stat')
+    windows = ['full' if w == 0 else f'{w}d' for w in surface['windows']]
+    limit = np.nanmax(np.abs(premium)) if np.isfinite(premium).any() else 1.0
+
+    fig, axes = plt.subplots(1, len(surface['weightings']), figsize=(6 * len(surface['weightings']), 8),
+                             squeeze=False)
+    for i, (ax, weighting) in enumerate(zip(axes[0], surface['weightings'])):
+        image = ax.imshow(premium[i], aspect='auto', cmap='RdBu_r', vmin=-limit, vmax=limit)
+        for s in range(premium.shape[1]):
+            for w in range(premium.shape[2]):
+                if np.isfinite(t_stat[i, s, w]):
+                    ax.text(w, s, f'{t_stat[i, s, w]:.1f}', ha='center', va='center', fontsize=7)
+        ax.set_xticks(range(len(windows)))
+        ax.set_xticklabels(windows)
+        ax.set_yticks(range(len(surface['splits'])))
+        ax.set_yticklabels([f'Top {k}' for k in surface['splits']])
+        ax.set_xlabel('Stage 1 Estimation Window')
+        ax.set_title(f'SMB_mega Premium ({weighting}-weighted)', fontsize=12, fontweight='bold')
+        fig.colorbar(image, ax=ax, format=lambda x, _: f'{x:.0%}', shrink=0.8)
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+
+
+def main():
+    """분할점 x 가중 x 추정 창 SMB_mega 프리미엄 곡면 (중단 후 다시 실행하면 남은 셀만 계산)"""
+    from enhanced_mega_cap_analysis import load_and_prepare_data
+    from universe_index import load_universe
+
+    stocks_df, returns_df, ff_df = load_and_prepare_data()
+    universe = load_universe(stocks_df, returns_df)
+
+    print("\n" + "=" * 60)
+    print("SMB_mega 프리미엄 곡면 스윕 (분할점 x 가중 x 추정 창)")
+    print("=" * 60)
+
+    start = time.time()
+    surface = run_sweep(returns_df, ff_df, universe)
+    save_surface(surface)
+    plot_surface(surface)
+    print(f"\n📊 스윕 완료: {time.time() - start:.1f}초")
+
+    premium = surface_field(surface, 'premium') * 252
+    t_stat = surface_field(surface, 't_stat')
+    for i, weighting in enumerate(surface['weightings']):
+        s, w = np.unravel_index(np.nanargmax(np.abs(t_stat[i])), t_stat[i].shape)
+        print(f"   - {weighting}: 최대 |t| 상위 {surface['splits'][s]}개 분할, "
+              f"창 {surface['windows'][w] or '전 기간'} → {premium[i, s, w]:.2%} (t={t_stat[i, s, w]:.2f})")
+
+    print(f"\n   ✅ 저장: smb_surface.npz, fig_smb_surface.pdf")
+    return surface
+
+
+if __name__ == "__main__":
+    surface = main()
@@ -0,0 +1,194 @@
+"""
+국면(regime)별 팩터·프리미엄 분석
+국면 라벨 시계열(고/저 변동성, 금리 인상기, 시장 낙폭 등)을 one-hot 마스크 (T x G) 로 한 번 만들고
+팩터·감마 패널과의 행렬곱으로 국면별 평균·t-통계량 계산 (국면을 추가해도 회귀 재실행 없음)
+"""
+
+import os
+
+import pandas as pd
+import numpy as np
+from scipy import stats
+import warnings
+warnings.filterwarnings('ignore')
+
+from fama_macbeth_core import GAMMA_COLUMNS
+from trading_calendar import align
+
+VOL_WINDOW = 63             # 실현 변동성 창 (거래일)
+RATE_WINDOW = 63            # 금리 변화 판단 창 (거래일)
+DRAWDOWN_THRESHOLD = -0.10  # 고점 대비 -10% 이하 = 낙폭 국면
+VIX_PATH = 'us_market/paper/Size_Reversal/back_data/data7_vix.csv'
+
+
+def regime_masks(index, regimes):
+    """
+    국면 라벨 → one-hot 마스크
+
+    regimes: {국면 이름: 라벨 Series 또는 배열 (index와 같은 길이, 결측은 어느 국면에도 속하지 않음)}
+    반환: {'index', 'masks': (T x G) float, 'regimes': [이름]*G, 'labels': [라벨]*G}
+    """
+    columns, names, labels = [], [], []
+    for name, series in regimes.items():
+        values = series.reindex(index) if isinstance(series, pd.Series) else pd.Series(np.asarray(series), index=index)
+        for label in sorted(values.dropna().unique()):
+            columns.append((values == label).to_numpy())
+            names.append(name)
+            labels.append(label)
+    return {
+        'index': index,
+        'masks': np.column_stack(columns).astype(float) if columns else np.zeros((len(index), 0)),
+        'regimes': names,
+        'labels': labels
+    }
+
+
+def regime_moments(values, masks):
+    """
+    (T x F) 패널의 국면별 관측 수·평균·표준편차 (G x F)
+    결측은 0 가중, 상쇄 오차를 줄이기 위해 전체 평균을 뺀 값으로 제곱합 누적
+    """
+    finite = np.isfinite(values)
+    shift = np.nanmean(values, axis=0)
+    shift = np.where(np.isfinite(shift), shift, 0.0)
+    centered = np.where(finite, values - shift, 0.0)
+
+    n = masks.T @ finite.astype(float)
+    s = masks.T @ centered
+    ss = masks.T @ centered ** 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centered_mean = s / n
+        std = np.sqrt((ss - n * centered_mean ** 2) / (n - 1))
+    return n, centered_mean + shift, std
+
+
+def regime_stats(panel, regime, periods_per_year=252, value_name='mean'):
+    """
+    국면별 평균, 연율 평균·변동성, 평균=0 t-검정 (long 형식 DataFrame)
+    panel: 날짜 x 팩터 (또는 감마) DataFrame, regime: regime_masks 결과
+    """
+    masks = regime['masks']
+    if not regime['index'].equals(panel.index):
+        rows = regime['index'].get_indexer(panel.index)
+        masks = np.where(rows[:, None] >= 0, masks[rows], 0.0)
+    n, mean, std = regime_moments(panel.to_numpy(dtype=float), masks)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t_stat = mean / (std / np.sqrt(n))
+    p_value = 2 * (1 - stats.t.cdf(np.abs(t_stat), n - 1))
+
+    rows = []
+    for g, (name, label) in enumerate(zip(regime['regimes'], regime['labels'])):
+        for j, factor in enumerate(panel.columns):
+            rows.append({
+                'regime': name,
+                'label': label,
+                'factor': factor,
+                'observations': int(n[g, j]),
+                value_name: mean[g, j],
+                f'annual_{value_name}': mean[g, j] * periods_per_year,
+                'annual_vol': std[g, j] * np.sqrt(periods_per_year),
+                't_stat': t_stat[g, j],
+                'p_value': p_value[g, j]
+            })
+    return pd.DataFrame(rows)
+
+
+def regime_means(series, labels):
+    """단일 시계열의 라벨별 평균 Series (groupby(labels).mean()과 동일, 마스크 행렬곱)"""
+    regime = regime_masks(series.index, {'regime': pd.Series(np.asarray(labels), index=series.index)})
+    _, mean, _ = regime_moments(series.to_numpy(dtype=float)[:, None], regime['masks'])
+    return pd.Series(mean[:, 0], index=regime['labels'])
+
+
+def volatility_regime(market_excess, window=VOL_WINDOW, vix=None):
+    """
+    고/저 변동성 국면: VIX 시계열이 있으면 VIX, 없으면 시장 실현 변동성의 전체 기간 중위수 기준
+    (라벨은 전일까지의 정보로 결정)
+    """
+    if vix is not None:
+        level = vix.reindex(market_excess.index).ffill().shift(1)
+    else:
+        level = market_excess.rolling(window).std().shift(1) * np.sqrt(252)
+    labels = np.where(level > level.median(), 'high_vol', 'low_vol')
+    return pd.Series(labels, index=market_excess.index).where(level.notna())
+
+
+def rate_regime(rf, window=RATE_WINDOW):
+    """금리 국면: 무위험 수익률이 window일 전보다 높으면 인상기, 낮으면 인하기, 같으면 보합"""
+    change = rf - rf.shift(window)
+    labels = np.select([change > 1e-6, change < -1e-6], ['hiking', 'cutting'], 'flat')
+    return pd.Series(labels, index=rf.index).where(change.notna())
+
+
+def drawdown_regime(market_excess, rf=None, threshold=DRAWDOWN_THRESHOLD):
+    """시장 낙폭 국면: 전일 기준 누적 시장 수익률이 고점 대비 threshold 이하면 drawdown"""
+    market = market_excess if rf is None else market_excess + rf
+    level = np.exp(np.log1p(market.fillna(0)).cumsum())
+    drawdown = (level / level.cummax() - 1).shift(1)
+    labels = np.where(drawdown <= threshold, 'drawdown', 'normal')
+    return pd.Series(labels, index=market_excess.index).where(drawdown.notna())
+
+
+def default_regimes(ff_aligned, vix=None):
+    """기본 국면: 변동성, 금리, 시장 낙폭, 달력 월"""
+    return {
+        'volatility': volatility_regime(ff_aligned['Mkt-RF'], vix=vix),
+        'rates': rate_regime(ff_aligned['RF']),
+        'drawdown': drawdown_regime(ff_aligned['Mkt-RF'], ff_aligned['RF']),
+        'month': pd.Series(ff_aligned.index.month, index=ff_aligned.index)
+    }
+
+
+def load_vix(path=VIX_PATH):
+    """VIX 일별 종가 (첫 열 날짜, 'VIX' 열 또는 첫 값 열), 파일이 없으면 None"""
+    if not os.path.exists(path):
+        return None
+    vix = pd.read_csv(path, index_col=0)
+    vix.index = pd.to_datetime(vix.index)
+    return vix['VIX'] if 'VIX' in vix else vix.iloc[:, 0]
+
+
+def main():
+    """기본 국면별 팩터 평균과 Fama-MacBeth 프리미엄 (전체 기간 감마 재사용)"""
+    from enhanced_mega_cap_analysis import load_and_prepare_data, create_enhanced_mega_factors
+    from fama_macbeth_core import run_fama_macbeth
+    from panel_validity import build_validity_mask
+
+    stocks_df, returns_df, ff_df = load_and_prepare_data()
+    mega_factors_df, ticker_groups = create_enhanced_mega_factors(stocks_df, returns_df)
+    validity = build_validity_mask(returns_df)
+
+    returns_aligned, ff_aligned, mega_aligned = align(returns_df, ff_df, mega_factors_df)
+    common_dates = returns_aligned.index
+
+    print("\n" + "=" * 60)
+    print("국면별 분석")
+    print("=" * 60)
+
+    vix = load_vix()
+    regime = regime_masks(common_dates, default_regimes(ff_aligned, vix))
+    print(f"\n📊 국면 마스크: {regime['masks'].shape[1]}개 열 "
+          f"({', '.join(dict.fromkeys(regime['regimes']))}, 변동성 기준: {'VIX' if vix is not None else '실현 변동성'})")
+
+    # 1. 팩터 평균
+    factors = pd.concat([mega_aligned[['SMB_50', 'SMB_30', 'SMB_Q5Q1']], ff_aligned[['Mkt-RF', 'HML']]], axis=1)
+    factor_stats = regime_stats(factors, regime)
+
+    # 2. 전체 기간 감마 한 번 → 국면별 Stage 3
+    _, _, stage2_df, _ = run_fama_macbeth(returns_aligned, ff_aligned, mega_aligned['SMB_50'], validity=validity)
+    premium_stats = regime_stats(stage2_df.set_index('date')[GAMMA_COLUMNS], regime, value_name='premium')
+
+    print(f"\n📈 국면별 SMB_mega 프리미엄:")
+    smb = premium_stats[(premium_stats['factor'] == 'gamma_smb_mega') & (premium_stats['regime'] != 'month')]
+    for _, row in smb.iterrows():
+        print(f"   - {row['regime']}/{row['label']}: {row['annual_premium']:.1%} "
+              f"(t={row['t_stat']:.2f}, n={row['observations']})")
+
+    factor_stats.to_csv('us_market/paper/Size_Reversal/back_data/regime_factor_stats.csv', index=False)
+    premium_stats.to_csv('us_market/paper/Size_Reversal/back_data/regime_premiums.csv', index=False)
+    print(f"\n   ✅ 저장: regime_factor_stats.csv, regime_premiums.csv")
+    return factor_stats, premium_stats
+
+
+if __name__ == "__main__":
+    factor_stats, premium_stats = main()
@@ -0,0 +1,229 @@
+"""
+Fama-MacBeth 결과 저장소 (로컬 SQLite)
+실행(run)·사양(specification)·Stage 1 베타·Stage 2 감마·Stage 3 요약을 한 DB에 누적하여
+과거 실행 간 비교를 CSV 재파싱 대신 인덱스 조회로 처리
+"""
+
+import sqlite3
+import json
+from datetime import datetime
+
+import pandas as pd
+import numpy as np
+
+STORE_PATH = 'us_market/paper/Size_Reversal/back_data/results_store.sqlite'
+
+# 기존 결과 CSV의 팩터 라벨 → 저장소 팩터 이름
+LEGACY_FACTOR_LABELS = {
+    'gamma_market': ('Market', 'MKT', 'Mkt-RF'),
+    'gamma_smb_mega': ('SMB', 'Size'),
+    'gamma_hml': ('HML', 'Value')
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at  TEXT NOT NULL,
+    script      TEXT NOT NULL,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS specifications (
+    spec_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id      INTEGER NOT NULL REFERENCES runs(run_id),
+    name        TEXT NOT NULL,
+    params      TEXT
+);
+CREATE TABLE IF NOT EXISTS stage1_betas (
+    spec_id     INTEGER NOT NULL REFERENCES specifications(spec_id),
+    ticker      TEXT NOT NULL,
+    factor      TEXT NOT NULL,
+    value       REAL
+);
+CREATE TABLE IF NOT EXISTS stage2_gammas (
+    spec_id     INTEGER NOT NULL REFERENCES specifications(spec_id),
+    factor      TEXT NOT NULL,
+    date        TEXT NOT NULL,
+    value       REAL,
+    n_stocks    INTEGER
+);
+CREATE TABLE IF NOT EXISTS stage3_summary (
+    spec_id         INTEGER NOT NULL REFERENCES specifications(spec_id),
+    factor          TEXT NOT NULL,
+    daily_premium   REAL,
+    annual_premium  REAL,
+    t_stat          REAL,
+    p_value         REAL,
+    observations    INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_specifications_name ON specifications(name, run_id);
+CREATE INDEX IF NOT EXISTS idx_stage1_spec_factor ON stage1_betas(spec_id, factor, ticker);
+CREATE INDEX IF NOT EXISTS idx_stage2_spec_factor_date ON stage2_gammas(spec_id, factor, date);
+CREATE INDEX IF NOT EXISTS idx_stage3_spec_factor ON stage3_summary(spec_id, factor);
+"""
+
+
+def connect_store(path=STORE_PATH):
+    """
+    저장소 연결 (WAL 모드, 스키마가 없으면 생성)
+    """
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA foreign_keys=ON')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def record_run(conn, script, description=None):
+    """새 실행 등록 후 run_id 반환"""
+    cursor = conn.execute(
+        'INSERT INTO runs (created_at, script, description) VALUES (?, ?, ?)',
+        (datetime.now().isoformat(timespec='seconds'), script, description)
+    )
+    conn.commit()
+    return cursor.lastrowid
+
+
+def record_specification(conn, run_id, name, factor_results, stage1_df=None, stage2_df=None, params=None):
+    """
+    한 사양(예: SMB_50)의 Stage 1/2/3 결과를 executemany로 일괄 저장
+    """
+    with conn:
+        spec_id = conn.execute(
+            'INSERT INTO specifications (run_id, name, params) VALUES (?, ?, ?)',
+            (run_id, name, json.dumps(params or {}))
+        ).lastrowid
+
+        conn.executemany(
+            'INSERT INTO stage3_summary VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(spec_id, factor, _float(r.get('daily_premium')), _float(r.get('annual_premium')),
+              _float(r.get('t_stat')), _float(r.get('p_value')), _int(r.get('observations')))
+             for factor, r in factor_results.items()]
+        )
+
+        if stage1_df is not None:
+            betas = stage1_df.drop(columns=['observations'], errors='ignore')
+            long = betas.rename_axis('ticker').reset_index().melt(id_vars='ticker', var_name='factor')
+            conn.executemany(
+                'INSERT INTO stage1_betas VALUES (?, ?, ?, ?)',
+                zip([spec_id] * len(long), long['ticker'].astype(str), long['factor'],
+                    long['value'].astype(float))
+            )
+
+        if stage2_df is not None:
+            gamma_columns = [c for c in stage2_df.columns if c.startswith('gamma')]
+            dates = pd.to_datetime(stage2_df['date']).dt.strftime('%Y-%m-%d').to_numpy()
+            n_stocks = stage2_df['n_stocks'].to_numpy() if 'n_stocks' in stage2_df else np.full(len(dates), None)
+            for factor in gamma_columns:
+                conn.executemany(
+                    'INSERT INTO stage2_gammas VALUES (?, ?, ?, ?, ?)',
+                    zip([spec_id] * len(dates), [factor] * len(dates), dates,
+                        stage2_df[factor].astype(float), map(_int, n_stocks))
+                )
+
+    return spec_id
+
+
+def import_legacy_results(conn, csv_path, name, labels=LEGACY_FACTOR_LABELS, label_column='Factor'):
+    """
+    기존 table3_final_results.csv (label_column 팩터 라벨, Annual_Premium은 % 단위)를 한 번 저장소로 이관
+    행 순서와 무관하게 labels의 라벨(대소문자 무시)로 팩터를 찾고, 없는 팩터가 있으면 ValueError
+    이미 이관된 경우 기존 spec_id 반환
+    """
+    existing = conn.execute(
+        'SELECT s.spec_id FROM specifications s JOIN runs r USING (run_id) '
+        'WHERE s.name = ? AND r.script = ? LIMIT 1', (name, 'legacy_import')
+    ).fetchone()
+    if existing:
+        return existing[0]
+
+    legacy = pd.read_csv(csv_path)
+    if label_column not in legacy.columns:
+        raise ValueError(f"{csv_path}: 팩터 라벨 열 '{label_column}' 없음 (열: {list(legacy.columns)})")
+    legacy.index = legacy[label_column].astype(str).str.strip().str.lower()
+
+    factor_results = {}
+    for factor, aliases in labels.items():
+        found = [alias.lower() for alias in aliases if alias.lower() in legacy.index]
+        if not found:
+            raise ValueError(f"{csv_path}: {factor} 행 없음 (라벨 {list(aliases)} 중 하나 필요)")
+        row = legacy.loc[found[0]]
+        factor_results[factor] = {
+            'annual_premium': row['Annual_Premium'] / 100,
+            'daily_premium': row['Annual_Premium'] / 100 / 252,
+            't_stat': row['t_statistic']
+        }
+    run_id = record_run(conn, 'legacy_import', csv_path)
+    return record_specification(conn, run_id, name, factor_results, params={'source': csv_path})
+
+
+def latest_summary(conn, name):
+    """사양 이름의 가장 최근 Stage 3 요약 (factor 인덱스)"""
+    return pd.read_sql_query(
+        'SELECT factor, daily_premium, annual_premium, t_stat, p_value, observations '
+        'FROM stage3_summary WHERE spec_id = ('
+        '  SELECT MAX(spec_id) FROM specifications WHERE name = ?)',
+        conn, params=(name,), index_col='factor'
+    )
+
+
+def premium_history(conn, factor='gamma_smb_mega', names=None):
+    """
+    모든 실행에 걸친 사양별 프리미엄 이력 (run x spec)
+    """
+    query = (
+        'SELECT r.run_id, r.created_at, r.script, s.name, t.annual_premium, t.t_stat, t.p_value '
+        'FROM stage3_summary t '
+        'JOIN specifications s ON s.spec_id = t.spec_id '
+        'JOIN runs r ON r.run_id = s.run_id '
+        'WHERE t.factor = ?'
+    )
+    params = [factor]
+    if names:
+        query += f" AND s.name IN ({', '.join('?' * len(names))})"
+        params += list(names)
+    return pd.read_sql_query(query + ' ORDER BY r.run_id, s.name', conn, params=params)
+
+
+def gamma_series(conn, spec_id, factor='gamma_smb_mega', start=None, end=None):
+    """(spec, factor, date) 인덱스를 이용한 감마 시계열 조회"""
+    query = 'SELECT date, value FROM stage2_gammas WHERE spec_id = ? AND factor = ?'
+    params = [spec_id, factor]
+    if start is not None:
+        query += ' AND date >= ?'
+        params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+    if end is not None:
+        query += ' AND date <= ?'
+        params.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+    series = pd.read_sql_query(query + ' ORDER BY date', conn, params=params,
+                               index_col='date', parse_dates=['date'])['value']
+    return series.rename(factor)
+
+
+def _float(value):
+    return None if value is None or pd.isna(value) else float(value)
+
+
+def _int(value):
+    return None if value is None or pd.isna(value) else int(value)
+
+
+def main():
+    """저장소의 SMB_mega 프리미엄 이력 출력"""
+    conn = connect_store()
+    history = premium_history(conn)
+
+    print("\n" + "=" * 60)
+    print("결과 저장소: SMB 프리미엄 이력")
+    print("=" * 60)
+    print(f"\n📊 실행 {history['run_id'].nunique()}회, 사양 {history['name'].nunique()}개")
+    for _, row in history.iterrows():
+        print(f"   - run {row['run_id']} ({row['created_at']}) {row['name']}: "
+              f"{row['annual_premium']:.1%} (t={row['t_stat']:.2f})")
+
+    conn.close()
+    return history
+
+
+if __name__ == "__main__":
+    history = main()
@@ -0,0 +1,223 @@
+"""
+정렬 기반 규모·가치 팩터 (SMB_mega, HML_mega, 2x3 이중 정렬)
+리밸런싱 날짜마다 시점 기준 시가총액·B/M 패널을 한 번의 벡터화 순위로 분위 배정하고
+공유 소속 마스크 엔진으로 모든 포트폴리오를 수익률 패널 한 번 통과로 계산
+"""
+
+import os
+
+import pandas as pd
+import numpy as np
+import warnings
+warnings.filterwarnings('ignore')
+
+from panel_validity import build_validity_mask, align_validity, period_masked_means
+from universe_index import universe_mask
+
+BOOK_TO_MARKET_PATH = 'us_market/paper/Size_Reversal/back_data/data4_book_to_market.csv'
+PROFITABILITY_PATH = 'us_market/paper/Size_Reversal/back_data/data5_operating_profitability.csv'
+INVESTMENT_PATH = 'us_market/paper/Size_Reversal/back_data/data6_asset_growth.csv'
+MOMENTUM_LOOKBACK = 252     # 모멘텀: 과거 12개월 누적수익률
+MOMENTUM_SKIP = 21          # 단기 반전 회피를 위해 최근 1개월 제외
+SIZE_CUTS = (0.5,)          # 규모: 중위수 기준 Small / Big
+VALUE_CUTS = (0.3, 0.7)     # 가치: Fama-French 30/40/30 (Low / Neutral / High)
+
+SIZE_LABELS = ['S', 'B']
+VALUE_LABELS = ['L', 'N', 'H']
+
+
+def load_characteristic_panel(path, dates, tickers):
+    """
+    날짜 x 티커 특성 파일을 거래일에 맞춰 로드 (공시일 이후 다음 값까지 앞으로 채움)
+    파일이 없으면 None
+    """
+    if not os.path.exists(path):
+        return None
+    panel = pd.read_csv(path, index_col=0)
+    panel.index = pd.to_datetime(panel.index)
+    panel = panel.reindex(columns=tickers)
+    return panel.reindex(panel.index.union(dates)).ffill().reindex(dates)
+
+
+def rebalance_schedule(dates, frequency='M'):
+    """
+    리밸런싱 위치(각 기간 마지막 거래일)와 날짜별 보유 기간 번호
+
+    리밸런싱 날짜의 특성으로 정렬한 포트폴리오는 다음 거래일부터 보유 (첫 리밸런싱 이전은 -1)
+    """
+    periods = dates.to_period(frequency)
+    ends = np.flatnonzero(np.append(periods[1:] != periods[:-1], True))
+    holding = np.searchsorted(ends, np.arange(len(dates)), side='left') - 1
+    return ends, holding
+
+
+def percentile_groups(values, cuts):
+    """
+    행(리밸런싱 날짜)마다 횡단면 백분위 분위 그룹 (R x N), 결측은 -1
+    모든 리밸런싱 날짜를 한 번의 argsort 순위로 처리
+    """
+    valid = np.isfinite(values)
+    ranks = np.where(valid, values, np.inf).argsort(axis=1, kind='stable').argsort(axis=1)
+    counts = valid.sum(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        percentiles = (ranks + 0.5) / counts
+    return np.where(valid, np.searchsorted(cuts, percentiles, side='right'), -1)
+
+
+def membership_masks(size_groups, value_groups):
+    """
+    리밸런싱별 소속 마스크 스택 (R x N x P)과 포트폴리오 이름
+    단일 정렬(Small/Big, Low/Neutral/High B/M)과 2x3 교차 정렬을 한 스택으로
+    """
+    names = ['Small', 'Big', 'Low_BM', 'Neutral_BM', 'High_BM']
+    masks = [size_groups == 0, size_groups == 1,
+             value_groups == 0, value_groups == 1, value_groups == 2]
+    for s, size_label in enumerate(SIZE_LABELS):
+        for v, value_label in enumerate(VALUE_LABELS):
+            names.append(f'{size_label}/{value_label}')
+            masks.append((size_groups == s) & (value_groups == v))
+    return np.stack(masks, axis=-1), names
+
+
+def in_universe(values, dates, tickers, universe, n=None):
+    """리밸런싱 날짜 특성 (R x N) 중 그날 기준 상위 n 유니버스 밖 종목은 결측 처리"""
+    if universe is None:
+        return values
+    return np.where(universe_mask(universe, dates, tickers, n, inclusive=True), values, np.nan)
+
+
+def build_sort_factors(returns_df, size_panel, bm_panel, validity=None, frequency='M',
+                       size_cuts=SIZE_CUTS, value_cuts=VALUE_CUTS, universe=None):
+    """
+    규모·가치 팩터를 한 번에 구성
+
+    size_panel, bm_panel: 시점 기준 시가총액·B/M (returns_df와 같은 날짜 x 티커 DataFrame)
+    universe: 선택, 유니버스 색인 (주면 리밸런싱 날짜 기준 구성 종목만 정렬)
+    반환: SMB_mega, HML_mega, SMB_2x3, HML_2x3와 구성 포트폴리오 수익률 DataFrame
+    """
+    if validity is None:
+        validity = build_validity_mask(returns_df)
+    else:
+        validity = align_validity(validity, returns_df.index, returns_df.columns)
+
+    ends, holding = rebalance_schedule(returns_df.index, frequency)
+    size = size_panel.reindex(index=returns_df.index, columns=returns_df.columns).to_numpy(dtype=float)
+    bm = bm_panel.reindex(index=returns_df.index, columns=returns_df.columns).to_numpy(dtype=float)
+
+    # 리밸런싱 날짜 행만 골라 규모·가치를 각각 한 번에 순위 배정
+    rebalance_dates = returns_df.index[ends]
+    size = in_universe(size[ends], rebalance_dates, returns_df.columns, universe)
+    bm = in_universe(bm[ends], rebalance_dates, returns_df.columns, universe)
+    masks, names = membership_masks(percentile_groups(size, size_cuts), percentile_groups(bm, value_cuts))
+
+    means = period_masked_means(returns_df.to_numpy(dtype=float), validity, masks, holding)
+    portfolios = pd.DataFrame(means, index=returns_df.index, columns=names)
+
+    small = portfolios[[f'S/{v}' for v in VALUE_LABELS]].mean(axis=1, skipna=False)
+    big = portfolios[[f'B/{v}' for v in VALUE_LABELS]].mean(axis=1, skipna=False)
+    factors = pd.DataFrame({
+        'SMB_mega': portfolios['Small'] - portfolios['Big'],
+        'HML_mega': portfolios['High_BM'] - portfolios['Low_BM'],
+        'SMB_2x3': small - big,
+        'HML_2x3': (portfolios['S/H'] + portfolios['B/H']) / 2 - (portfolios['S/L'] + portfolios['B/L']) / 2
+    })
+    return pd.concat([factors, portfolios], axis=1)
+
+
+def momentum_panel(returns_df, lookback=MOMENTUM_LOOKBACK, skip=MOMENTUM_SKIP):
+    """
+    t-lookback ~ t-skip 누적 log 수익률 패널 (누적합 차분, 구간 관측 부족 시 결측)
+    """
+    R = returns_df.to_numpy(dtype=float)
+    observed = np.isfinite(R)
+    cum = np.zeros((len(R) + 1, R.shape[1]))
+    count = np.zeros((len(R) + 1, R.shape[1]))
+    np.cumsum(np.log1p(np.where(observed, R, 0.0)), axis=0, out=cum[1:])
+    np.cumsum(observed, axis=0, out=count[1:])
+
+    panel = np.full(R.shape, np.nan)
+    t = np.arange(lookback, len(R))
+    window = count[t - skip + 1] - count[t - lookback + 1]
+    signal = cum[t - skip + 1] - cum[t - lookback + 1]
+    panel[t] = np.where(window >= (lookback - skip) // 2, signal, np.nan)
+    return pd.DataFrame(panel, index=returns_df.index, columns=returns_df.columns)
+
+
+def long_short_factor(returns_df, panel, validity=None, frequency='M', cuts=VALUE_CUTS, long_high=True,
+                      universe=None):
+    """
+    한 특성 패널의 상위 - 하위 분위 팩터 (RMW, CMA, 모멘텀 등)
+    long_high=False면 하위 - 상위 (예: CMA = 보수적(저투자) - 공격적(고투자))
+    universe: 선택, 유니버스 색인 (리밸런싱 날짜 기준 구성 종목만 정렬)
+    """
+    if validity is None:
+        validity = build_validity_mask(returns_df)
+    else:
+        validity = align_validity(validity, returns_df.index, returns_df.columns)
+
+    ends, holding = rebalance_schedule(returns_df.index, frequency)
+    values = panel.reindex(index=returns_df.index, columns=returns_df.columns).to_numpy(dtype=float)
+    values = in_universe(values[ends], returns_df.index[ends], returns_df.columns, universe)
+    groups = percentile_groups(values, cuts)
+    masks = np.stack([groups == 0, groups == len(cuts)], axis=-1)
+
+    means = period_masked_means(returns_df.to_numpy(dtype=float), validity, masks, holding)
+    spread = means[:, 1] - means[:, 0]
+    return pd.Series(spread if long_high else -spread, index=returns_df.index)
+
+
+def build_characteristic_factors(returns_df, validity=None, frequency='M', universe=None):
+    """
+    메가캡 유니버스 내 추가 팩터: MOM_mega (12-1 모멘텀, 항상),
+    RMW_mega·CMA_mega (수익성·투자 패널 파일이 있을 때만)
+    """
+    factors = {'MOM_mega': long_short_factor(returns_df, momentum_panel(returns_df), validity, frequency,
+                                             universe=universe)}
+
+    for name, path, long_high in [('RMW_mega', PROFITABILITY_PATH, True),
+                                  ('CMA_mega', INVESTMENT_PATH, False)]:
+        panel = load_characteristic_panel(path, returns_df.index, returns_df.columns)
+        if panel is not None:
+            factors[name] = long_short_factor(returns_df, panel, validity, frequency, long_high=long_high,
+                                              universe=universe)
+
+    return pd.DataFrame(factors)
+
+
+def main():
+    """시점 기준 시가총액·B/M 패널로 규모·가치 팩터 구성 및 저장 (둘 중 하나라도 없으면 생략)"""
+    from enhanced_mega_cap_analysis import load_and_prepare_data
+    from characteristic_regression import MARKET_CAP_PATH, market_cap_panel
+    from universe_index import load_universe
+
+    stocks_df, returns_df, ff_df = load_and_prepare_data()
+
+    print("\n" + "=" * 60)
+    print("정렬 기반 규모·가치 팩터 (HML_mega, 2x3)")
+    print("=" * 60)
+
+    bm_panel = load_characteristic_panel(BOOK_TO_MARKET_PATH, returns_df.index, returns_df.columns)
+    if bm_panel is None:
+        print(f"\n⚠️ B/M 패널 없음: {BOOK_TO_MARKET_PATH}")
+        return None
+
+    size_panel = market_cap_panel(returns_df)
+    if size_panel is None:
+        print(f"\n⚠️ 시점 기준 시가총액 패널 없음: {MARKET_CAP_PATH}")
+        return None
+
+    validity = build_validity_mask(returns_df)
+    factors = build_sort_factors(returns_df, size_panel, bm_panel, validity,
+                                 universe=load_universe(stocks_df, returns_df))
+
+    print(f"\n📊 팩터 연율 평균:")
+    for name in ['SMB_mega', 'HML_mega', 'SMB_2x3', 'HML_2x3']:
+        print(f"   - {name}: {factors[name].mean()*252:.1%}")
+
+    factors.to_csv('us_market/paper/Size_Reversal/back_data/sort_factors.csv', float_format='%.6f')
+    print(f"\n   ✅ 저장: sort_factors.csv")
+    return factors
+
+
+if __name__ == "__main__":
+    factors = main()
@@ -0,0 +1,119 @@
+"""
+Fama-MacBeth Stage 1/2 결과의 열 단위 바이너리 산출물
+SMB 사양·단계마다 디렉터리 하나: 열별 .npy + meta.json (행 수, 열 이름·dtype·내용 해시, 인덱스 열)
+그래프 단계는 필요한 열만 np.load(mmap_mode='r')로 읽어 회귀 재실행·시뮬레이션 없이 실제 분포 사용
+"""
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+import numpy as np
+
+STAGE_DIR = 'us_market/paper/Size_Reversal/back_data/fama_macbeth'
+STAGES = ['stage1', 'stage2']
+META_FILE = 'meta.json'
+FORMAT_VERSION = 1
+
+
+def stage_path(smb_factor, stage, data_dir=STAGE_DIR):
+    """사양·단계 산출물 디렉터리 (예: fama_macbeth/SMB_50/stage2)"""
+    return os.path.join(data_dir, smb_factor, stage)
+
+
+def _column_array(values):
+    """열 → 고정 폭 배열 (object 문자열은 유니코드, 날짜는 datetime64[ns]) — mmap 가능한 dtype만"""
+    if isinstance(values, (pd.DatetimeIndex, pd.Series)) and pd.api.types.is_datetime64_any_dtype(values):
+        return np.asarray(values, dtype='datetime64[ns]')
+    array = np.asarray(values)
+    if array.dtype == object:
+        array = array.astype(str)
+    return array
+
+
+def write_columns(frame, path, index_name=None):
+    """
+    DataFrame을 열별 .npy로 저장 (인덱스도 index_name 열로 저장)
+    meta.json은 마지막에 써서 meta.json이 있으면 완결된 산출물,
+    열별 내용 해시를 담으므로 meta.json 해시만으로 데이터 변경 여부 판단 (빌드 그래프 출력)
+    """
+    os.makedirs(path, exist_ok=True)
+    meta_path = os.path.join(path, META_FILE)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    columns = {}
+    if index_name is not None:
+        columns[index_name] = _column_array(frame.index)
+    for column in frame.columns:
+        columns[column] = _column_array(frame[column])
+
+    entries = []
+    for name, array in columns.items():
+        array = np.ascontiguousarray(array)
+        filename = f'{name}.npy'
+        np.save(os.path.join(path, filename), array, allow_pickle=False)
+        entries.append({'name': str(name), 'file': filename, 'dtype': array.dtype.str,
+                        'sha256': hashlib.sha256(array.tobytes()).hexdigest()[:16]})
+
+    with open(meta_path, 'w') as f:
+        json.dump({'version': FORMAT_VERSION, 'rows': len(frame), 'index': index_name, 'columns': entries},
+                  f, indent=1)
+
+
+def read_meta(path):
+    """산출물 메타데이터 (없으면 FileNotFoundError)"""
+    with open(os.path.join(path, META_FILE)) as f:
+        return json.load(f)
+
+
+def read_columns(path, columns=None, mmap=True):
+    """
+    열별 배열 dict (columns=None이면 전체, 인덱스 열 포함)
+    mmap=True면 읽기 전용 메모리 맵 (접근한 페이지만 디스크에서 읽음)
+    """
+    meta = read_meta(path)
+    entries = {entry['name']: entry for entry in meta['columns']}
+    names = list(entries) if columns is None else list(columns)
+    missing = [name for name in names if name not in entries]
+    if missing:
+        raise KeyError(f"{path}: 열 없음 {missing}")
+    return {name: np.load(os.path.join(path, entries[name]['file']), mmap_mode='r' if mmap else None,
+                          allow_pickle=False)
+            for name in names}
+
+
+def read_frame(path, columns=None, mmap=True):
+    """열별 산출물 → DataFrame (저장 시 인덱스 열을 인덱스로 복원)"""
+    meta = read_meta(path)
+    index_name = meta['index']
+    names = None
+    if columns is not None:
+        names = ([index_name] if index_name is not None else []) + list(columns)
+    arrays = read_columns(path, names, mmap)
+    index = pd.Index(arrays.pop(index_name), name=index_name) if index_name is not None else None
+    return pd.DataFrame(arrays, index=index)
+
+
+def save_stage_artifacts(results, data_dir=STAGE_DIR):
+    """
+    enhanced_fama_macbeth 결과 (사양별 FamaMacBethResult)의 stage1_df (티커 인덱스), stage2_df (날짜 인덱스) 저장
+    """
+    for smb_factor, result in results.items():
+        stage1_df = result.stage1_df
+        write_columns(stage1_df, stage_path(smb_factor, 'stage1', data_dir), index_name='ticker')
+        stage2_df = result.stage2_df.set_index('date')
+        write_columns(stage2_df, stage_path(smb_factor, 'stage2', data_dir), index_name='date')
+    print(f"   ✅ Stage 1/2 열 단위 산출물 저장: {data_dir}/{{{', '.join(results)}}}")
+
+
+def load_stage_frame(smb_factor, stage, columns=None, data_dir=STAGE_DIR, mmap=True):
+    """
+    사양·단계 산출물 DataFrame
+    stage1: 티커 인덱스, alpha·beta_*·observations / stage2: 날짜 인덱스, gamma_*·n_stocks
+    """
+    if stage not in STAGES:
+        raise ValueError(f"stage는 {STAGES} 중 하나: {stage}")
+    return read_frame(stage_path(smb_factor, stage, data_dir), columns, mmap)
+
@@ -0,0 +1,303 @@
+"""
+서브기간 분석 엔진
+누적합·누적 교차곱 배열을 한 번 만들어 두고 임의의 날짜 구간에 대해
+팩터 평균·변동성과 Stage 3 프리미엄을 O(1)로 계산
+"""
+
+import pandas as pd
+import numpy as np
+from scipy import stats
+import warnings
+warnings.filterwarnings('ignore')
+
+from fama_macbeth_core import (
+    build_design, stage2_gammas, stage3_summary,
+    MIN_STAGE1_OBS, GAMMA_COLUMNS
+)
+from panel_validity import build_validity_mask, align_validity
+from least_squares import batched_least_squares
+from trading_calendar import align
+
+
+def build_prefix_sums(panel):
+    """
+    (T x F) 시계열 패널의 누적 관측 수·누적합·누적 교차곱 (각각 길이 T+1)
+
+    상쇄 오차를 줄이기 위해 전체 기간 평균을 뺀 값으로 누적
+    """
+    values = panel.to_numpy(dtype=float)
+    finite = np.isfinite(values)
+    shift = np.nanmean(values, axis=0)
+    shift = np.where(np.isfinite(shift), shift, 0.0)
+    centered = np.where(finite, values - shift, 0.0)
+
+    T, F = values.shape
+    counts = np.zeros((T + 1, F))
+    sums = np.zeros((T + 1, F))
+    cross = np.zeros((T + 1, F, F))
+    pair_counts = np.zeros((T + 1, F, F))
+
+    np.cumsum(finite, axis=0, out=counts[1:])
+    np.cumsum(centered, axis=0, out=sums[1:])
+    np.cumsum(centered[:, :, None] * centered[:, None, :], axis=0, out=cross[1:])
+    np.cumsum(finite[:, :, None] & finite[:, None, :], axis=0, out=pair_counts[1:])
+
+    return {
+        'index': panel.index,
+        'columns': list(panel.columns),
+        'shift': shift,
+        'counts': counts,
+        'sums': sums,
+        'cross': cross,
+        'pair_counts': pair_counts
+    }
+
+
+def range_positions(index, ranges):
+    """
+    [(시작일, 종료일), ...] 구간(양 끝 포함)을 누적 배열 위치 (a, b)로 변환
+    """
+    starts = pd.to_datetime([r[0] for r in ranges])
+    ends = pd.to_datetime([r[1] for r in ranges])
+    a = index.searchsorted(starts, side='left')
+    b = index.searchsorted(ends, side='right')
+    return a, np.maximum(a, b)
+
+
+def range_labels(ranges):
+    """구간 라벨: 세 번째 원소가 있으면 사용, 없으면 '시작~종료'"""
+    labels = []
+    for r in ranges:
+        if len(r) > 2:
+            labels.append(r[2])
+        else:
+            labels.append(f"{pd.Timestamp(r[0]).strftime('%Y-%m-%d')}~{pd.Timestamp(r[1]).strftime('%Y-%m-%d')}")
+    return labels
+
+
+def annual_ranges(years):
+    """연도별 구간 목록"""
+    return [(f'{y}-01-01', f'{y}-12-31', str(y)) for y in years]
+
+
+def _range_moments(prefix, a, b):
+    """구간별 관측 수, 평균, 공분산 (모든 구간을 한 번에)"""
+    n = prefix['counts'][b] - prefix['counts'][a]                       # R x F
+    s = prefix['sums'][b] - prefix['sums'][a]
+    cross = prefix['cross'][b] - prefix['cross'][a]                     # R x F x F
+    pair_n = prefix['pair_counts'][b] - prefix['pair_counts'][a]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centered_mean = s / n
+        mean = centered_mean + prefix['shift']
+        # 공분산: (Σxy - n·x̄·ȳ) / (n-1), 대각 원소가 분산
+        cov = (cross - pair_n * centered_mean[:, :, None] * centered_mean[:, None, :]) / (pair_n - 1)
+
+    return n, mean, cov
+
+
+def factor_subperiod_stats(prefix, ranges, periods_per_year=252):
+    """
+    구간별 팩터 평균·누적합·연율화 변동성 (long 형식 DataFrame)
+    """
+    a, b = range_positions(prefix['index'], ranges)
+    n, mean, cov = _range_moments(prefix, a, b)
+    vol = np.sqrt(np.diagonal(cov, axis1=1, axis2=2))
+
+    labels = range_labels(ranges)
+    rows = []
+    for i, label in enumerate(labels):
+        for j, factor in enumerate(prefix['columns']):
+            rows.append({
+                'period': label,
+                'factor': factor,
+                'observations': int(n[i, j]),
+                'mean': mean[i, j],
+                'total': mean[i, j] * n[i, j],
+                'annual_mean': mean[i, j] * periods_per_year,
+                'annual_vol': vol[i, j] * np.sqrt(periods_per_year)
+            })
+    return pd.DataFrame(rows)
+
+
+def factor_subperiod_correlations(prefix, ranges):
+    """구간별 팩터 상관행렬 {라벨: DataFrame}"""
+    a, b = range_positions(prefix['index'], ranges)
+    _, _, cov = _range_moments(prefix, a, b)
+    sd = np.sqrt(np.diagonal(cov, axis1=1, axis2=2))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = cov / (sd[:, :, None] * sd[:, None, :])
+    return {
+        label: pd.DataFrame(corr[i], index=prefix['columns'], columns=prefix['columns'])
+        for i, label in enumerate(range_labels(ranges))
+    }
+
+
+def premium_subperiod_stats(prefix, ranges, periods_per_year=252):
+    """
+    전체 기간 Stage 2 감마로 만든 누적 배열에서 구간별 Stage 3 프리미엄과 t-검정
+    """
+    a, b = range_positions(prefix['index'], ranges)
+    n, mean, cov = _range_moments(prefix, a, b)
+    std = np.sqrt(np.diagonal(cov, axis1=1, axis2=2))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t_stat = mean / (std / np.sqrt(n))
+    p_value = 2 * (1 - stats.t.cdf(np.abs(t_stat), n - 1))
+
+    labels = range_labels(ranges)
+    rows = []
+    for i, label in enumerate(labels):
+        for j, factor in enumerate(prefix['columns']):
+            rows.append({
+                'period': label,
+                'factor': factor,
+                'observations': int(n[i, j]),
+                'daily_premium': mean[i, j],
+                'annual_premium': mean[i, j] * periods_per_year,
+                't_stat': t_stat[i, j],
+                'p_value': p_value[i, j]
+            })
+    return pd.DataFrame(rows)
+
+
+def build_stage1_prefix(returns_aligned, ff_aligned, smb_factor, validity=None):
+    """
+    Stage 1 재추정용 티커별 누적 X'X, X'y, 관측 수 (길이 T+1)
+    """
+    if validity is None:
+        validity = build_validity_mask(returns_aligned)
+    else:
+        validity = align_validity(validity, returns_aligned.index, returns_aligned.columns)
+
+    R = returns_aligned.to_numpy(dtype=float)
+    rf = ff_aligned['RF'].to_numpy(dtype=float)
+    X, row_valid = build_design(ff_aligned, smb_factor)
+    row_valid &= np.isfinite(rf)
+    excess = R - rf[:, None]
+    valid = validity['valid'] & row_valid[:, None]
+
+    T, K = X.shape
+    N = R.shape[1]
+    X0 = np.where(row_valid[:, None], X, 0.0)
+    weights = valid.astype(float)
+    y = np.where(valid, excess, 0.0)
+
+    gram = np.zeros((T + 1, N, K * K))
+    rhs = np.zeros((T + 1, N, K))
+    counts = np.zeros((T + 1, N))
+
+    outer = (X0[:, :, None] * X0[:, None, :]).reshape(T, K * K)
+    np.cumsum(weights[:, :, None] * outer[:, None, :], axis=0, out=gram[1:])
+    np.cumsum(y[:, :, None] * X0[:, None, :], axis=0, out=rhs[1:])
+    np.cumsum(weights, axis=0, out=counts[1:])
+
+    return {
+        'index': returns_aligned.index,
+        'tickers': returns_aligned.columns,
+        'returns': R,
+        'valid': validity['valid'],
+        'gram': gram,
+        'rhs': rhs,
+        'counts': counts
+    }
+
+
+def rerun_fama_macbeth_subperiods(stage1_prefix, ranges, periods_per_year=252):
+    """
+    구간마다 베타를 재추정해 Fama-MacBeth 전체를 다시 실행
+
+    Stage 1은 누적 X'X 차분으로 티커 루프 없이 풀고, Stage 2는 해당 구간 날짜만 배치 처리
+    """
+    a, b = range_positions(stage1_prefix['index'], ranges)
+    K = stage1_prefix['rhs'].shape[-1]
+    R = stage1_prefix['returns']
+
+    rows = []
+    for label, start, stop in zip(range_labels(ranges), a, b):
+        gram = (stage1_prefix['gram'][stop] - stage1_prefix['gram'][start]).reshape(-1, K, K)
+        rhs = stage1_prefix['rhs'][stop] - stage1_prefix['rhs'][start]
+        observations = stage1_prefix['counts'][stop] - stage1_prefix['counts'][start]
+
+        ok = observations > MIN_STAGE1_OBS
+        coeffs, _ = batched_least_squares(gram, rhs, ok)
+        ok &= np.isfinite(coeffs).all(axis=1)
+
+        block = R[start:stop]
+        gammas, _, _ = stage2_gammas(block, stage1_prefix['valid'][start:stop], coeffs[:, 1:], ok)
+        mean, _, t_stat, p_value, n = stage3_summary(gammas[:, 1:], axis=0)
+
+        for j, factor in enumerate(GAMMA_COLUMNS):
+            rows.append({
+                'period': label,
+                'factor': factor,
+                'n_stocks': int(ok.sum()),
+                'observations': int(n[j]),
+                'daily_premium': mean[j],
+                'annual_premium': mean[j] * periods_per_year,
+                't_stat': t_stat[j],
+                'p_value': p_value[j]
+            })
+
+    return pd.DataFrame(rows)
+
+
+def main():
+    """연도별·반기별 서브기간 분석 실행"""
+    from enhanced_mega_cap_analysis import load_and_prepare_data, create_enhanced_mega_factors
+    from fama_macbeth_core import run_fama_macbeth
+
+    stocks_df, returns_df, ff_df = load_and_prepare_data()
+    mega_factors_df, ticker_groups = create_enhanced_mega_factors(stocks_df, returns_df)
+    validity = build_validity_mask(returns_df)
+
+    returns_aligned, ff_aligned, mega_aligned = align(returns_df, ff_df, mega_factors_df)
+    common_dates = returns_aligned.index
+
+    print("\n" + "=" * 60)
+    print("서브기간 분석")
+    print("=" * 60)
+
+    years = sorted(set(common_dates.year))
+    ranges = annual_ranges(years)
+    halves = [(common_dates[0], common_dates[len(common_dates) // 2 - 1], 'First Half'),
+              (common_dates[len(common_dates) // 2], common_dates[-1], 'Second Half')]
+
+    # 1. 팩터 평균·변동성
+    factor_prefix = build_prefix_sums(pd.concat([
+        mega_aligned[['SMB_50', 'SMB_30', 'SMB_Q5Q1']],
+        ff_aligned[['Mkt-RF', 'HML']]
+    ], axis=1))
+    factor_stats = factor_subperiod_stats(factor_prefix, ranges + halves)
+
+    print(f"\n📊 연도별 SMB_50:")
+    for _, row in factor_stats[factor_stats['factor'] == 'SMB_50'].iterrows():
+        print(f"   - {row['period']}: {row['annual_mean']:.1%} (vol {row['annual_vol']:.1%}, n={row['observations']})")
+
+    # 2. 전체 기간 감마로 구간별 Stage 3
+    _, _, stage2_df, _ = run_fama_macbeth(returns_aligned, ff_aligned, mega_aligned['SMB_50'],
+                                       validity=validity)
+    gamma_prefix = build_prefix_sums(stage2_df.set_index('date')[GAMMA_COLUMNS])
+    premium_stats = premium_subperiod_stats(gamma_prefix, ranges + halves)
+
+    # 3. 구간별 베타 재추정 Fama-MacBeth
+    stage1_prefix = build_stage1_prefix(returns_aligned, ff_aligned, mega_aligned['SMB_50'], validity)
+    rerun_stats = rerun_fama_macbeth_subperiods(stage1_prefix, ranges + halves)
+
+    print(f"\n📈 서브기간 SMB_mega 프리미엄 (전체 베타 / 구간 베타):")
+    fixed = premium_stats[premium_stats['factor'] == 'gamma_smb_mega'].set_index('period')
+    rerun = rerun_stats[rerun_stats['factor'] == 'gamma_smb_mega'].set_index('period')
+    for period in fixed.index:
+        print(f"   - {period}: {fixed.loc[period, 'annual_premium']:.1%} (t={fixed.loc[period, 't_stat']:.2f})"
+              f" / {rerun.loc[period, 'annual_premium']:.1%} (t={rerun.loc[period, 't_stat']:.2f})")
+
+    factor_stats.to_csv('us_market/paper/Size_Reversal/back_data/subperiod_factor_stats.csv', index=False)
+    premium_stats.to_csv('us_market/paper/Size_Reversal/back_data/subperiod_premiums.csv', index=False)
+    rerun_stats.to_csv('us_market/paper/Size_Reversal/back_data/subperiod_premiums_rerun.csv', index=False)
+    print(f"\n   ✅ 서브기간 결과 저장 완료")
+
+    return factor_stats, premium_stats, rerun_stats
+
+
+if __name__ == "__main__":
+    factor_stats, premium_stats, rerun_stats = main()
@@ -0,0 +1,33 @@
+"""
+code/ 모듈은 평면 import (from least_squares import ...)를 쓰므로 code/를 경로에 추가
+실행: python -m pytest -q code/tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def synthetic_market():
+    """
+    3팩터 구조의 합성 일별 패널: (stocks_df, returns_df, ff_df)
+    stocks_df는 table0 형식 (시가총액 순 티커), 수익률은 약 3% 결측
+    """
+    rng = np.random.default_rng(7)
+    T, N = 400, 240
+    dates = pd.bdate_range('2021-01-04', periods=T)
+    ff_df = pd.DataFrame(rng.normal(0, 0.01, (T, 3)), index=dates, columns=['Mkt-RF', 'SMB', 'HML'])
+    ff_df['RF'] = 1e-4
+    tickers = [f'S{n:03d}' for n in range(N)]
+    betas = rng.normal(1, 0.3, (N, 3))
+    R = ff_df[['Mkt-RF', 'SMB', 'HML']].to_numpy() @ betas.T + 1e-4 + rng.normal(0, 0.02, (T, N))
+    R[rng.random((T, N)) < 0.03] = np.nan
+    returns_df = pd.DataFrame(R, index=dates, columns=tickers)
+    stocks_df = pd.DataFrame({'ticker': tickers, 'market_cap': np.sort(rng.lognormal(12, 1, N))[::-1]})
+    return stocks_df, returns_df, ff_df
@@ -0,0 +1,119 @@
+"""증분 캐시 수집: 대체 HTTP 서버로 재실행·기간 확장·캐시 공백·재시도 확인"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_acquisition import (
+    Source, HTTPSource, LocalFileSource, refresh, start_stand_in_server, load_coverage, missing_ranges
+)
+
+START, END = '2020-01-01', '2021-12-31'
+
+
+@pytest.fixture
+def raw_dir(tmp_path):
+    """거래일 가격 CSV 두 개를 담은 원본 디렉터리"""
+    directory = tmp_path / 'raw'
+    directory.mkdir()
+    dates = pd.bdate_range(START, END)
+    rng = np.random.default_rng(0)
+    for key in ['AAPL', 'MSFT']:
+        frame = pd.DataFrame({'close': 100 + rng.standard_normal(len(dates)).cumsum()}, index=dates)
+        frame.index.name = 'date'
+        frame.to_csv(directory / f'{key}.csv')
+    return directory
+
+
+@pytest.fixture
+def server(raw_dir):
+    server, base_url = start_stand_in_server(str(raw_dir))
+    yield base_url
+    server.shutdown()
+
+
+def _days(start, end):
+    return len(pd.bdate_range(start, end))
+
+
+def test_second_call_fetches_nothing(server, tmp_path):
+    cache = str(tmp_path / 'cache')
+    data, failures, new_rows = refresh(HTTPSource(server), ['AAPL', 'MSFT'], '2020-01-01', '2020-06-30', cache_dir=cache)
+    assert not failures and new_rows == 2 * _days('2020-01-01', '2020-06-30')
+
+    again, _, new_rows = refresh(HTTPSource(server), ['AAPL', 'MSFT'], '2020-01-01', '2020-06-30', cache_dir=cache)
+    assert new_rows == 0
+    pd.testing.assert_frame_equal(again['AAPL'], data['AAPL'], check_freq=False)
+
+
+def test_extended_range_fetches_only_new_dates(server, tmp_path):
+    cache = str(tmp_path / 'cache')
+    refresh(HTTPSource(server), ['AAPL'], '2020-03-01', '2020-06-30', cache_dir=cache)
+    data, _, new_rows = refresh(HTTPSource(server), ['AAPL'], '2020-01-01', '2020-09-30', cache_dir=cache)
+    assert new_rows == _days('2020-01-01', '2020-02-29') + _days('2020-07-01', '2020-09-30')
+    assert len(data['AAPL']) == _days('2020-01-01', '2020-09-30')
+
+
+def test_disjoint_request_fills_the_gap(raw_dir, tmp_path):
+    cache = str(tmp_path / 'cache')
+    source = LocalFileSource(str(raw_dir))
+    refresh(source, ['AAPL'], '2020-01-01', '2020-06-30', cache_dir=cache)
+    data, _, new_rows = refresh(source, ['AAPL'], '2021-01-01', '2021-06-30', cache_dir=cache)
+    assert new_rows == _days('2020-07-01', '2021-06-30')
+    assert len(data['AAPL']) == _days('2021-01-01', '2021-06-30')
+
+    # 이후 전 기간 요청은 공백 없이 캐시에서
+    full, _, new_rows = refresh(source, ['AAPL'], '2020-01-01', '2021-06-30', cache_dir=cache)
+    assert new_rows == 0 and len(full['AAPL']) == _days('2020-01-01', '2021-06-30')
+
+    # 캐시보다 앞쪽 떨어진 요청도 사이 공백까지
+    assert missing_ranges(['2021-01-01', '2021-06-30'], pd.Timestamp('2020-01-01'), pd.Timestamp('2020-03-31')) == \
+        [(pd.Timestamp('2020-01-01'), pd.Timestamp('2020-12-31'))]
+
+
+def test_missing_cache_file_is_refetched(raw_dir, tmp_path):
+    cache = tmp_path / 'cache'
+    source = LocalFileSource(str(raw_dir))
+    refresh(source, ['AAPL'], '2020-01-01', '2020-06-30', cache_dir=str(cache))
+    os.remove(cache / 'AAPL.csv')
+
+    data, failures, new_rows = refresh(source, ['AAPL'], '2020-03-01', '2020-06-30', cache_dir=str(cache))
+    assert not failures and new_rows == _days('2020-03-01', '2020-06-30')
+    assert load_coverage(str(cache))['AAPL'] == ['2020-03-01', '2020-06-30']
+
+
+class FlakySource(Source):
+    """처음 failures번은 실패하는 소스"""
+
+    def __init__(self, inner, failures):
+        self.inner = inner
+        self.failures = failures
+        self.calls = 0
+
+    async def fetch(self, key, start, end):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError(f'attempt {self.calls}')
+        return await self.inner.fetch(key, start, end)
+
+
+def test_retries_then_reports_failure(server, tmp_path):
+    cache = str(tmp_path / 'cache')
+    recovers = FlakySource(HTTPSource(server), failures=2)
+    data, failures, _ = refresh(recovers, ['AAPL'], '2020-01-01', '2020-01-31', cache_dir=cache, retries=3, backoff=0)
+    assert not failures and recovers.calls == 3 and len(data['AAPL']) == _days('2020-01-01', '2020-01-31')
+
+    broken = FlakySource(HTTPSource(server), failures=10)
+    data, failures, new_rows = refresh(broken, ['MSFT'], '2020-01-01', '2020-01-31', cache_dir=cache, retries=3, backoff=0)
+    assert broken.calls == 4 and 'MSFT' not in data and new_rows == 0
+    assert failures['MSFT'].startswith('ConnectionError')
+    with open(os.path.join(cache, '_coverage.json')) as f:
+        assert 'MSFT' not in json.load(f)
+
+
+def test_source_is_abstract():
+    with pytest.raises(TypeError):
+        Source()
@@ -0,0 +1,128 @@
+"""배치 Fama-MacBeth 코어: 티커별·날짜별 np.linalg.lstsq 재계산과 비교"""
+
+import numpy as np
+import pytest
+
+from fama_macbeth_core import (
+    build_design, stage1_betas, stage1_betas_varying, rolling_stage1_betas, stage2_gammas, fit_fama_macbeth,
+    run_fama_macbeth, MIN_STAGE2_VALID
+)
+from least_squares import SOLVED, QR_FALLBACK, INSUFFICIENT_OBS
+from permutation_test import permutation_test
+from universe_index import from_static, band_portfolios
+
+BANDS = {'Small': (100, 200), 'Big': (0, 100)}
+
+
+def _lstsq(A, b):
+    return np.linalg.lstsq(A, b, rcond=None)[0]
+
+
+def _stage1_inputs(synthetic_market):
+    _, returns_df, ff_df = synthetic_market
+    smb = ff_df['SMB'].copy()
+    smb.iloc[5:8] = np.nan
+    X, row_valid = build_design(ff_df, smb)
+    excess = returns_df.to_numpy() - ff_df['RF'].to_numpy()[:, None]
+    valid = np.isfinite(excess) & row_valid[:, None]
+    return X, excess, valid
+
+
+def test_stage1_matches_lstsq_with_qr_fallback(synthetic_market):
+    X, excess, valid = _stage1_inputs(synthetic_market)
+    # 티커 0: 관측된 날짜에서 SMB ≈ Mkt-RF (조건수 ~1e10) → QR 대체 / 티커 1: 관측치 부족
+    X = X.copy()
+    rng = np.random.default_rng(5)
+    X[:120, 2] = X[:120, 1] + 1e-6 * rng.normal(0, 0.01, 120)
+    valid[:, 0] &= np.arange(len(X)) < 120
+    valid[:, 1] &= np.arange(len(X)) < 40
+
+    coeffs, observations, ok, status = stage1_betas(excess, valid, X)
+    assert status[0] == QR_FALLBACK and status[1] == INSUFFICIENT_OBS and not ok[1]
+    assert (status[2:] == SOLVED).all()
+    np.testing.assert_array_equal(observations, valid.sum(axis=0))
+    for n in [0] + list(range(2, excess.shape[1], 17)):
+        rows = valid[:, n]
+        np.testing.assert_allclose(coeffs[n], _lstsq(X[rows], excess[rows, n]), rtol=1e-6, atol=1e-9)
+
+
+def test_stage1_varying_matches_per_candidate(synthetic_market):
+    X, excess, valid = _stage1_inputs(synthetic_market)
+    rng = np.random.default_rng(6)
+    F = rng.normal(0, 0.01, (len(X), 4))
+    F[~np.isfinite(X).all(axis=1)] = np.nan
+    F[20:30, 1] = np.nan    # 후보 1만 결측인 날짜
+    X_shared = np.delete(X, 2, axis=1)
+
+    coeffs, observations, ok, _ = stage1_betas_varying(excess, valid, X_shared, F, 2)
+    for b in range(F.shape[1]):
+        design = np.insert(X_shared, 2, F[:, b], axis=1)
+        rows = valid & np.isfinite(F[:, b])[:, None]
+        expected, expected_obs, expected_ok, _ = stage1_betas(excess, rows, design)
+        np.testing.assert_array_equal(observations[b], expected_obs)
+        np.testing.assert_array_equal(ok[b], expected_ok)
+        np.testing.assert_allclose(coeffs[b][ok[b]], expected[expected_ok], rtol=1e-9, atol=1e-12)
+
+
+def test_rolling_betas_match_window_lstsq(synthetic_market):
+    X, excess, valid = _stage1_inputs(synthetic_market)
+    window = 126
+    coeffs, ok = rolling_stage1_betas(excess, valid, X, window, block_size=50)
+    assert np.isnan(coeffs[:window]).all() and not ok[:window].any()
+    for t in [window, 200, 333, len(X) - 1]:
+        for n in [0, 57, 199]:
+            rows = np.zeros(len(X), dtype=bool)
+            rows[t - window:t] = valid[t - window:t, n]
+            np.testing.assert_allclose(coeffs[t, n], _lstsq(X[rows], excess[rows, n]), rtol=1e-8, atol=1e-11)
+
+
+def test_stage2_matches_lstsq_single_and_batched(synthetic_market):
+    _, returns_df, _ = synthetic_market
+    R = returns_df.to_numpy()
+    valid = np.isfinite(R)
+    rng = np.random.default_rng(8)
+    betas = rng.normal(1, 0.3, (2, R.shape[1], 3))
+    beta_ok = rng.random((2, R.shape[1])) > 0.1
+    valid[3, :] &= np.arange(R.shape[1]) < MIN_STAGE2_VALID   # 주식 수 부족 날짜
+
+    gammas, n_stocks, status = stage2_gammas(R, valid, betas, beta_ok)
+    single, _, _ = stage2_gammas(R, valid, betas[1], beta_ok[1])
+    np.testing.assert_allclose(single, gammas[1], rtol=1e-12, atol=1e-15)
+    assert np.isnan(gammas[:, 3]).all() and (status[:, 3] == INSUFFICIENT_OBS).all()
+
+    for b in range(2):
+        for t in [0, 100, 250, 399]:
+            rows = valid[t] & beta_ok[b]
+            Z = np.column_stack([np.ones(rows.sum()), betas[b][rows]])
+            assert n_stocks[b, t] == rows.sum()
+            np.testing.assert_allclose(gammas[b, t], _lstsq(Z, R[t, rows]), rtol=1e-9, atol=1e-12)
+
+
+def test_premium_is_mean_of_cross_sectional_lstsq(synthetic_market):
+    _, returns_df, ff_df = synthetic_market
+    smb = ff_df['SMB']
+    result = fit_fama_macbeth(returns_df, ff_df, smb)
+
+    X, row_valid = build_design(ff_df, smb)
+    excess = returns_df.to_numpy() - ff_df['RF'].to_numpy()[:, None]
+    valid = np.isfinite(excess) & row_valid[:, None]
+    betas = np.stack([_lstsq(X[valid[:, n]], excess[valid[:, n], n]) for n in range(excess.shape[1])])
+
+    R = returns_df.to_numpy()
+    gammas = []
+    for t in range(len(R)):
+        rows = np.isfinite(R[t])
+        gammas.append(_lstsq(np.column_stack([np.ones(rows.sum()), betas[rows, 1:]]), R[t, rows]))
+    np.testing.assert_allclose(result.premiums.daily, np.mean(gammas, axis=0)[1:], rtol=1e-9, atol=1e-13)
+
+
+def test_permutation_observed_statistic_matches_fama_macbeth(synthetic_market):
+    stocks_df, returns_df, ff_df = synthetic_market
+    universe = from_static(stocks_df)
+    legs = band_portfolios(universe, returns_df, BANDS)
+    expected, _, _, _ = run_fama_macbeth(returns_df, ff_df, legs['Small'] - legs['Big'])
+
+    result = permutation_test(returns_df, ff_df, universe, BANDS, n_permutations=20, batch_size=8)
+    assert result['observed_premium'] == pytest.approx(expected['gamma_smb_mega']['daily_premium'], rel=1e-10)
+    assert result['observed_t_stat'] == pytest.approx(expected['gamma_smb_mega']['t_stat'], rel=1e-10)
+    assert result['n_permutations'] == 20 and 0 < result['p_value_t'] <= 1
@@ -0,0 +1,65 @@
+"""감마 이력 저장소: 추가·조회 왕복과 연도 파일 병합"""
+
+import numpy as np
+import pandas as pd
+
+from gamma_history import gamma_accumulator, accumulate, append_gamma_history, read_gamma_history, history_partitions
+
+COLUMNS = ['gamma_0', 'gamma_market']
+
+
+def _accumulator(dates, seed=0):
+    dates = pd.DatetimeIndex(dates)
+    rng = np.random.default_rng(seed)
+    acc = gamma_accumulator(dates, COLUMNS)
+    return accumulate(acc, 0, rng.standard_normal((len(dates), len(COLUMNS))), np.full(len(dates), 150), np.zeros(len(dates), dtype=int))
+
+
+def test_round_trip(tmp_path):
+    acc = _accumulator(pd.bdate_range('2023-11-01', '2024-02-29'))
+    acc['gammas'][3] = np.nan   # 풀리지 않은 날짜는 저장하지 않음
+    assert append_gamma_history(acc, 'SMB_50', tmp_path) == [2023, 2024]
+
+    history = read_gamma_history('SMB_50', data_dir=tmp_path)
+    solved = np.isfinite(acc['gammas']).all(axis=1)
+    assert (history['date'].to_numpy() == acc['dates'][solved].to_numpy()).all()
+    np.testing.assert_array_equal(history[COLUMNS].to_numpy(), acc['gammas'][solved])
+    np.testing.assert_array_equal(history['n_stocks'].to_numpy(), acc['n_stocks'][solved])
+
+    window = read_gamma_history('SMB_50', '2024-01-01', '2024-01-31', ['gamma_market'], data_dir=tmp_path)
+    assert window['date'].min() >= pd.Timestamp('2024-01-01') and window['date'].max() <= pd.Timestamp('2024-01-31')
+    assert list(window.columns) == ['date', 'gamma_market', 'n_stocks']
+
+
+def test_append_keeps_earlier_rows_of_partial_year(tmp_path):
+    first = _accumulator(pd.bdate_range('2024-01-02', '2024-06-28'), seed=1)
+    append_gamma_history(first, 'SMB_50', tmp_path)
+    later = _accumulator(pd.bdate_range('2024-07-01', '2024-07-05'), seed=2)
+    append_gamma_history(later, 'SMB_50', tmp_path)
+
+    history = read_gamma_history('SMB_50', data_dir=tmp_path)
+    assert len(history) == len(first['dates']) + len(later['dates'])
+    np.testing.assert_array_equal(history[COLUMNS].to_numpy()[:len(first['dates'])], first['gammas'])
+    assert history['date'].is_monotonic_increasing
+
+
+def test_rerun_replaces_and_drops_unsolved_dates(tmp_path):
+    dates = pd.bdate_range('2024-03-01', '2024-03-29')
+    append_gamma_history(_accumulator(dates, seed=1), 'SMB_50', tmp_path)
+
+    rerun = _accumulator(dates[5:15], seed=2)
+    rerun['gammas'][0] = np.nan   # 재실행에서 더 이상 풀리지 않는 날짜
+    append_gamma_history(rerun, 'SMB_50', tmp_path)
+
+    history = read_gamma_history('SMB_50', data_dir=tmp_path).set_index('date')
+    assert dates[5] not in history.index
+    assert len(history) == len(dates) - 1
+    np.testing.assert_array_equal(history.loc[dates[6:15], COLUMNS].to_numpy(), rerun['gammas'][1:])
+
+
+def test_emptied_year_file_is_removed(tmp_path):
+    dates = pd.bdate_range('2022-12-01', '2023-01-31')
+    append_gamma_history(_accumulator(dates), 'SMB_50', tmp_path)
+    empty = gamma_accumulator(dates[dates.year == 2022], COLUMNS)
+    append_gamma_history(empty, 'SMB_50', tmp_path)
+    assert history_partitions('SMB_50', tmp_path) == [2023]
@@ -0,0 +1,54 @@
+"""장중 묶음 Fama-MacBeth: 일별 패널을 봉으로 넣으면 run_fama_macbeth와 같아야 함"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fama_macbeth_core import run_fama_macbeth
+from intraday import intraday_fama_macbeth, day_chunks, resample_returns, align_daily_factors
+from universe_index import from_static, band_portfolios
+
+BANDS = {'Small': (100, 200), 'Big': (0, 100)}
+
+
+def test_daily_bars_match_run_fama_macbeth(synthetic_market):
+    stocks_df, returns_df, ff_df = synthetic_market
+    universe = from_static(stocks_df)
+    legs = band_portfolios(universe, returns_df, BANDS)
+    expected, stage1_df, stage2_df, _ = run_fama_macbeth(returns_df, ff_df, legs['Small'] - legs['Big'])
+
+    def chunks():
+        for a, b in day_chunks(returns_df.index, 37):
+            yield returns_df.iloc[a:b]
+
+    result, smb = intraday_fama_macbeth(chunks, ff_df, universe, BANDS, returns_df.columns)
+    pd.testing.assert_series_equal(smb, legs['Small'] - legs['Big'], check_names=False)
+    for factor in expected:
+        assert result.premiums[factor]['annual_premium'] == pytest.approx(expected[factor]['annual_premium'],
+                                                                          abs=1e-12)
+        assert result.premiums[factor]['t_stat'] == pytest.approx(expected[factor]['t_stat'], abs=1e-10)
+    stage1 = result.stage1_df
+    np.testing.assert_allclose(stage1.loc[stage1_df.index, stage1_df.columns].to_numpy(), stage1_df.to_numpy(),
+                               atol=1e-12)
+    assert len(result.stage2_df) == len(stage2_df)
+
+
+def test_empty_chunk_iterator_raises(synthetic_market):
+    stocks_df, returns_df, ff_df = synthetic_market
+    with pytest.raises(ValueError, match='장중 묶음 없음'):
+        intraday_fama_macbeth(lambda: iter([]), ff_df, from_static(stocks_df), BANDS, returns_df.columns)
+
+
+def test_resampled_bars_compound_to_daily():
+    rng = np.random.default_rng(0)
+    stamps = pd.date_range('2024-01-02 09:30', periods=390, freq='1min').append(
+        pd.date_range('2024-01-03 09:30', periods=390, freq='1min'))
+    minutes = pd.DataFrame(rng.normal(0, 1e-3, (len(stamps), 2)), index=stamps, columns=['A', 'B'])
+    bars = resample_returns(minutes, '5min')
+    assert len(bars) == 2 * 78
+    daily = (1 + bars).groupby(bars.index.normalize()).prod() - 1
+    np.testing.assert_allclose(daily.to_numpy(), ((1 + minutes).groupby(stamps.normalize()).prod() - 1).to_numpy())
+
+    ff = pd.DataFrame({'Mkt-RF': [0.01, -0.02], 'RF': [1e-4, 1e-4]}, index=pd.to_datetime(['2024-01-02', '2024-01-03']))
+    spread = align_daily_factors(ff, bars.index)
+    np.testing.assert_allclose(((1 + spread).groupby(bars.index.normalize()).prod() - 1).to_numpy(), ff.to_numpy())
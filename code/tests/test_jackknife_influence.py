@@ -0,0 +1,45 @@
+"""잭나이프: 배치 계산이 티커를 실제로 빼고 다시 돌린 결과와 같아야 함"""
+
+import numpy as np
+import pytest
+
+from fama_macbeth_core import run_fama_macbeth
+from jackknife_influence import jackknife_smb_premium, influence_ranking
+from universe_index import from_static, band_portfolios
+
+BANDS = {'Small': (100, 200), 'Big': (0, 100)}
+
+
+def _rerun(returns_df, ff_df, universe, drop=None):
+    """티커 drop을 패널에서 빼고 SMB 구성부터 다시 실행"""
+    returns = returns_df if drop is None else returns_df.drop(columns=[drop])
+    legs = band_portfolios(universe, returns, BANDS)
+    smb = legs['Small'] - legs['Big']
+    results, _, _, _ = run_fama_macbeth(returns, ff_df, smb)
+    return smb.mean(), results['gamma_smb_mega']['daily_premium'], results['gamma_smb_mega']['t_stat']
+
+
+def test_matches_rerun(synthetic_market):
+    stocks_df, returns_df, ff_df = synthetic_market
+    universe = from_static(stocks_df)
+    result = jackknife_smb_premium(returns_df, ff_df, universe, BANDS, batch_size=50)
+
+    base = result['base']
+    np.testing.assert_allclose([base['smb_mean'], base['premium'], base['t_stat']],
+                               _rerun(returns_df, ff_df, universe), rtol=1e-10, atol=1e-14)
+
+    tickers = list(result['tickers'])
+    for j in [0, 99, 100, 199, 230]:   # Big, 경계, Small, 구간 밖
+        expected = _rerun(returns_df, ff_df, universe, tickers[j])
+        np.testing.assert_allclose([result['smb_mean'][j], result['premium'][j], result['t_stat'][j]],
+                                   expected, rtol=1e-10, atol=1e-14)
+
+
+def test_ranking(synthetic_market):
+    stocks_df, returns_df, ff_df = synthetic_market
+    result = jackknife_smb_premium(returns_df, ff_df, from_static(stocks_df), BANDS)
+    ranking = influence_ranking(result)
+    assert list(ranking['influence_rank']) == list(range(1, len(ranking) + 1))
+    assert ranking['premium_change'].abs().is_monotonic_decreasing
+    assert set(ranking.loc[result['tickers'][200:], 'leg']) == {'-'}
+    assert ranking.attrs['jackknife_se'] > 0
@@ -0,0 +1,74 @@
+"""배치 최소제곱 코어: np.linalg.lstsq 대비, 조건수 판별과 QR 대체 경로"""
+
+import numpy as np
+
+from least_squares import (
+    batched_least_squares, solve_shared_design, SOLVED, QR_FALLBACK, INSUFFICIENT_OBS, ILL_CONDITIONED, SINGULAR
+)
+
+
+def _systems(designs, responses):
+    gram = np.stack([A.T @ A for A in designs])
+    rhs = np.stack([A.T @ b for A, b in zip(designs, responses)])
+    return gram, rhs
+
+
+def test_matches_lstsq():
+    rng = np.random.default_rng(0)
+    designs = [np.column_stack([np.ones(80), rng.normal(0, 0.01, (80, 3))]) for _ in range(20)]
+    responses = [rng.normal(0, 0.02, 80) for _ in range(20)]
+    coeffs, status = batched_least_squares(*_systems(designs, responses))
+
+    assert (status == SOLVED).all()
+    for A, b, c in zip(designs, responses, coeffs):
+        np.testing.assert_allclose(c, np.linalg.lstsq(A, b, rcond=None)[0], rtol=1e-9, atol=1e-12)
+
+
+def test_ill_conditioned_systems_use_qr_fallback():
+    rng = np.random.default_rng(1)
+    x = rng.normal(0, 0.01, 200)
+    well = np.column_stack([np.ones(200), x, rng.normal(0, 0.01, 200)])
+    near = np.column_stack([np.ones(200), x, x + 1e-6 * rng.normal(0, 0.01, 200)])   # 조건수 ~1e10
+    exact = np.column_stack([np.ones(200), x, 2 * x])                                  # 완전 공선성
+    designs = [well, near, exact]
+    responses = [A[:, 1] + rng.normal(0, 0.01, 200) for A in designs]
+    gram, rhs = _systems(designs, responses)
+
+    coeffs, status = batched_least_squares(gram, rhs, fallback=lambda i: (designs[i], responses[i]))
+    assert list(status) == [SOLVED, QR_FALLBACK, SINGULAR]
+    for i in [0, 1]:
+        np.testing.assert_allclose(coeffs[i], np.linalg.lstsq(designs[i], responses[i], rcond=None)[0],
+                                   rtol=1e-6, atol=1e-9)
+    assert np.isnan(coeffs[2]).all()
+
+    # 원자료가 없으면 QR 대신 사유와 함께 제외
+    coeffs, status = batched_least_squares(gram, rhs)
+    assert list(status) == [SOLVED, ILL_CONDITIONED, SINGULAR]
+    assert np.isnan(coeffs[1]).all()
+
+
+def test_insufficient_and_non_finite_systems():
+    rng = np.random.default_rng(2)
+    designs = [np.column_stack([np.ones(30), rng.normal(size=30)]) for _ in range(3)]
+    responses = [rng.normal(size=30) for _ in range(3)]
+    gram, rhs = _systems(designs, responses)
+    rhs[2, 0] = np.nan
+
+    coeffs, status = batched_least_squares(gram, rhs, ok=np.array([True, False, True]))
+    assert list(status) == [SOLVED, INSUFFICIENT_OBS, SINGULAR]
+    assert np.isfinite(coeffs[0]).all() and np.isnan(coeffs[1:]).all()
+
+
+def test_shared_design_multiple_responses():
+    rng = np.random.default_rng(3)
+    X = np.column_stack([np.ones(120), rng.normal(size=(120, 2))])
+    Y = rng.normal(size=(120, 6))
+    coeffs, inverse, method = solve_shared_design(X, Y)
+    assert method == 'cholesky'
+    np.testing.assert_allclose(coeffs, np.linalg.lstsq(X, Y, rcond=None)[0], atol=1e-12)
+    np.testing.assert_allclose(inverse, np.linalg.inv(X.T @ X), rtol=1e-9)
+
+    near = np.column_stack([X, X[:, 1] + 1e-6 * rng.normal(size=120)])
+    coeffs, _, method = solve_shared_design(near, Y)
+    assert method == 'qr'
+    np.testing.assert_allclose(coeffs, np.linalg.lstsq(near, Y, rcond=None)[0], rtol=1e-5, atol=1e-6)
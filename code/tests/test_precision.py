@@ -0,0 +1,70 @@
+"""float32 모드: 누적은 float64, 프리미엄은 float64 결과와 허용치 안"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from fama_macbeth_core import fit_fama_macbeth, stage2_gammas, stage2_industry_gammas, stage2_gammas_panel
+from precision import accumulate_product, accumulate_matmul, PRECISION_TOLERANCE, PrecisionWarning
+
+
+def _panel(T=300, N=600, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2021-01-04', periods=T)
+    ff = pd.DataFrame(rng.normal(0, 0.01, (T, 3)), index=dates, columns=['Mkt-RF', 'SMB', 'HML'])
+    ff['RF'] = 1e-4
+    smb = pd.Series(rng.normal(0, 0.01, T), index=dates)
+    betas = rng.normal(1, 0.3, (N, 3))
+    R = ff[['Mkt-RF', 'HML']].to_numpy() @ betas[:, [0, 2]].T + np.outer(smb, betas[:, 1])
+    R += 1e-4 + rng.normal(0, 0.02, (T, N))
+    R[rng.random((T, N)) < 0.05] = np.nan
+    return pd.DataFrame(R, index=dates, columns=[f'T{n}' for n in range(N)]), ff, smb
+
+
+def test_accumulation_is_float64():
+    rng = np.random.default_rng(1)
+    A = rng.random((1000, 4)).astype(np.float32)
+    B = rng.random((1000, 9)).astype(np.float32)
+    assert accumulate_product(A, B, np.float32).dtype == np.float64
+    np.testing.assert_allclose(accumulate_product(A, B, np.float32), A.astype(float).T @ B.astype(float), rtol=1e-6)
+
+    A3 = rng.random((5, 3, 1000)).astype(np.float32)
+    B3 = rng.random((5, 1000, 3)).astype(np.float32)
+    assert accumulate_matmul(A3, B3, np.float32).dtype == np.float64
+    np.testing.assert_allclose(accumulate_matmul(A3, B3, np.float32), A3.astype(float) @ B3.astype(float), rtol=1e-6)
+
+
+def test_stage2_float32_matches_float64():
+    returns, _, _ = _panel()
+    R = returns.to_numpy()
+    valid = np.isfinite(R)
+    betas = np.random.default_rng(2).normal(1, 0.3, (R.shape[1], 3))
+    ok = np.ones(R.shape[1], dtype=bool)
+
+    exact, _, _ = stage2_gammas(R, valid, betas, ok)
+    reduced, _, _ = stage2_gammas(R, valid, betas, ok, dtype=np.float32)
+    np.testing.assert_allclose(reduced.mean(axis=0), exact.mean(axis=0), rtol=1e-4, atol=1e-7)
+
+    codes = np.arange(R.shape[1]) % 7
+    exact, _, _ = stage2_industry_gammas(R, valid, betas, ok, codes)
+    reduced, _, _ = stage2_industry_gammas(R, valid, betas, ok, codes, dtype=np.float32)
+    np.testing.assert_allclose(reduced.mean(axis=0), exact.mean(axis=0), rtol=1e-4, atol=1e-7)
+
+    Z = np.concatenate([np.ones((R.shape[0], R.shape[1], 1)), np.broadcast_to(betas, R.shape + (3,))], axis=2)
+    exact, _, _ = stage2_gammas_panel(R, valid, Z, valid)
+    reduced, _, _ = stage2_gammas_panel(R, valid, Z, valid, dtype=np.float32)
+    np.testing.assert_allclose(reduced.mean(axis=0), exact.mean(axis=0), rtol=1e-4, atol=1e-7)
+
+
+def test_fama_macbeth_premium_float32_vs_float64():
+    returns, ff, smb = _panel()
+    exact = fit_fama_macbeth(returns, ff, smb)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', PrecisionWarning)
+        reduced = fit_fama_macbeth(returns, ff, smb, precision='float32')
+
+    a, b = exact.premiums, reduced.premiums
+    scale = np.abs(a.daily).max()
+    assert np.abs(b.daily - a.daily).max() / scale < PRECISION_TOLERANCE
+    np.testing.assert_allclose(b.t_stat, a.t_stat, rtol=1e-3, atol=1e-3)
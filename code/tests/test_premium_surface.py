@@ -0,0 +1,41 @@
+"""곡면 스윕 체크포인트: 같은 설정이면 재사용, 격자 설정·코드가 바뀌면 폐기"""
+
+import numpy as np
+
+import premium_surface
+from premium_surface import run_sweep, sweep_fingerprint
+from universe_index import from_static
+
+GRID = {'splits': [50, 100], 'weightings': ['equal', 'value'], 'windows': [0], 'jobs': 1}
+
+
+def test_resume_and_invalidate(synthetic_market, tmp_path, capsys, monkeypatch):
+    stocks_df, returns_df, ff_df = synthetic_market
+    universe = from_static(stocks_df)
+
+    first = run_sweep(returns_df, ff_df, universe, sweep_dir=str(tmp_path), **GRID)
+    assert first['weightings'] == ['equal']     # 시가총액 파일 없음 → 'value' 제외
+    assert np.isfinite(first['surface']).all()
+    assert '체크포인트 0개, 계산 2개' in capsys.readouterr().out
+
+    again = run_sweep(returns_df, ff_df, universe, sweep_dir=str(tmp_path), **GRID)
+    assert '체크포인트 2개, 계산 0개' in capsys.readouterr().out
+    np.testing.assert_array_equal(again['surface'], first['surface'])
+
+    monkeypatch.setattr(premium_surface, 'SWEEP_DEPTH', 150)
+    run_sweep(returns_df, ff_df, universe, sweep_dir=str(tmp_path), **GRID)
+    assert '체크포인트 0개, 계산 2개' in capsys.readouterr().out
+
+
+def test_fingerprint_covers_grid_and_code(tmp_path):
+    base = sweep_fingerprint('data', [50], ['equal'], [0])
+    assert sweep_fingerprint('data', [50], ['equal'], [0]) == base
+    assert sweep_fingerprint('other', [50], ['equal'], [0]) != base
+    assert sweep_fingerprint('data', [50], ['equal'], [0, 252]) != base
+
+    module = tmp_path / 'solver.py'
+    module.write_text('def solve():\n    return 1\n')
+    code = [str(module)]
+    before = sweep_fingerprint('data', [50], ['equal'], [0], code=code)
+    module.write_text('def solve():\n    return 2\n')
+    assert sweep_fingerprint('data', [50], ['equal'], [0], code=code) != before
@@ -0,0 +1,132 @@
+"""
+공통 거래일 달력: 수익률·FF 팩터·메가캡 팩터 등 날짜 인덱스가 다른 원본을 한 번 정수 위치로 대응
+첫 원본(기준 거래일)에서 필수 원본에 없는 날짜(휴장일·달력 불일치)는 제외, RF는 직전 관측값으로 채움
+같은 날짜 인덱스 조합은 행 위치만 캐시 (원본 객체는 잡아두지 않음), 정렬 결과는 호출마다 새 복사본
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+
+import pandas as pd
+import numpy as np
+
+FF_PATH = 'us_market/paper/Size_Reversal/back_data/data2_fama_french_factors.csv'
+FORWARD_FILL = ['RF']   # 결측이면 직전 관측값 사용 (금리 수준), 수익률 팩터 결측은 그대로 (Stage 1에서 행 제외)
+CALENDAR_CACHE = 8      # 캐시하는 날짜 인덱스 조합 수
+
+_CALENDARS = OrderedDict()
+_FF_CACHE = {}
+
+
+def load_ff_factors(path=FF_PATH):
+    """FF 일별 팩터 CSV (프로세스당 한 번 읽고 파일이 바뀌면 다시 읽음, 호출마다 복사본 반환)"""
+    key = (path, os.path.getmtime(path))
+    if key not in _FF_CACHE:
+        ff_df = pd.read_csv(path, index_col=0)
+        ff_df.index = pd.to_datetime(ff_df.index)
+        _FF_CACHE.clear()
+        _FF_CACHE[key] = ff_df
+    return _FF_CACHE[key].copy()
+
+
+def _fill_positions(frame, dates, columns):
+    """열별 직전 관측 위치 (T,, 날짜 이전 관측이 없으면 -1)"""
+    fill = {}
+    for column in columns:
+        if column not in frame.columns:
+            continue
+        observed = np.flatnonzero(np.isfinite(frame[column].to_numpy(dtype=float)))
+        at = frame.index[observed].searchsorted(dates, side='right') - 1
+        fill[column] = np.where(at >= 0, observed[np.maximum(at, 0)], -1)
+    return fill
+
+
+def build_calendar(frames, required=None, forward_fill=FORWARD_FILL):
+    """
+    원본 목록의 공통 거래일 달력
+
+    frames: 날짜 인덱스 DataFrame 목록, 첫 번째가 기준 거래일 (수익률 패널)
+    required: 날짜가 없으면 그 거래일을 제외할 원본 번호 (기본: 전부), 나머지는 결측으로 정렬
+    forward_fill: 직전 관측값으로 채울 열 (RF)
+    반환: {'dates', 'positions': 원본별 행 위치 (T,, 없으면 -1), 'fill': 원본별 열 → 직전 관측 위치}
+    """
+    required = set(range(len(frames))) if required is None else set(required) | {0}
+    dates = pd.DatetimeIndex(frames[0].index)
+    positions = [pd.DatetimeIndex(frame.index).get_indexer(dates) for frame in frames]
+
+    keep = np.ones(len(dates), dtype=bool)
+    for i in required:
+        keep &= positions[i] >= 0
+    dates = dates[keep]
+    positions = [pos[keep] for pos in positions]
+
+    return {
+        'dates': dates,
+        'positions': positions,
+        'fill': [_fill_positions(frame, dates, forward_fill) for frame in frames]
+    }
+
+
+def _view(frame, pos, dates, fill=None):
+    """
+    위치 pos의 행 → 달력 날짜 DataFrame (원본과 메모리를 공유하지 않는 복사본)
+    연속 구간이고 채울 값이 없으면 슬라이스 복사, 아니면 한 번 모아서 복사
+    """
+    fill = {column: at for column, at in (fill or {}).items() if not np.array_equal(at, pos)}
+    if len(pos) and (pos >= 0).all() and (np.diff(pos) == 1).all() and not fill:
+        return frame.iloc[pos[0]:pos[-1] + 1].copy()
+
+    view = frame.iloc[np.maximum(pos, 0)].copy()
+    view.index = dates
+    if (pos < 0).any():
+        view.iloc[pos < 0] = np.nan
+    for column, at in fill.items():
+        view[column] = np.where(at >= 0, frame[column].to_numpy(dtype=float)[np.maximum(at, 0)], np.nan)
+    return view
+
+
+def aligned(calendar, frame, i):
+    """달력을 만든 원본 목록의 i번째 frame을 달력 날짜로 정렬한 DataFrame"""
+    return _view(frame, calendar['positions'][i], calendar['dates'], calendar['fill'][i])
+
+
+def align_frame(calendar, frame):
+    """달력에 없던 원본 (예: 기준 거래일 인덱스의 시가총액 패널)을 달력 날짜로 정렬 (캐시 없음)"""
+    pos = pd.DatetimeIndex(frame.index).get_indexer(calendar['dates'])
+    return _view(frame, pos, calendar['dates'])
+
+
+def _frame_key(frame, forward_fill=FORWARD_FILL):
+    """달력이 의존하는 원본 내용의 해시: 날짜 인덱스 값 + 직전 관측값으로 채울 열의 관측 위치"""
+    digest = hashlib.sha256(pd.DatetimeIndex(frame.index).asi8.tobytes())
+    for column in forward_fill:
+        if column in frame.columns:
+            digest.update(column.encode())
+            digest.update(np.isfinite(frame[column].to_numpy(dtype=float)).tobytes())
+    return (len(frame), digest.hexdigest()[:16])
+
+
+def calendar_for(*frames, required=None):
+    """
+    원본 조합의 달력 (날짜 인덱스 내용이 같은 조합이면 캐시된 달력 재사용)
+    캐시 키는 객체 id가 아니라 인덱스 내용의 해시, 캐시에는 행 위치만 두고 원본은 참조하지 않음
+    """
+    key = tuple(_frame_key(frame) for frame in frames) + (None if required is None else tuple(required),)
+    if key in _CALENDARS:
+        _CALENDARS.move_to_end(key)
+        return _CALENDARS[key]
+    calendar = build_calendar(frames, required)
+    _CALENDARS[key] = calendar
+    if len(_CALENDARS) > CALENDAR_CACHE:
+        _CALENDARS.popitem(last=False)
+    return calendar
+
+
+def align(*frames, required=None):
+    """
+    원본들을 공통 거래일로 정렬한 DataFrame 목록 (intersection + .loc 대체)
+    예: returns_aligned, ff_aligned, mega_aligned = align(returns_df, ff_df, mega_factors_df)
+    """
+    calendar = calendar_for(*frames, required=required)
+    return [aligned(calendar, frame, i) for i, frame in enumerate(frames)]
@@ -0,0 +1,207 @@
+"""
+시점 기준(point-in-time) 유니버스 색인: 리밸런싱 날짜별 시가총액 상위 N 순위표
+(R x depth) 정렬 배열 하나로 보관, "날짜 기준 구성 종목"·"날짜 기준 티커 순위"를 O(log n) 조회
+depth 이하의 임의 N(top 50/100/200/500)과 순위 구간(101-200위 등)을 같은 색인에서 사용
+"""
+
+import os
+
+import pandas as pd
+import numpy as np
+
+UNIVERSE_DEPTH = 500    # 리밸런싱마다 보관하는 최대 순위
+STATIC_DATE = pd.Timestamp('1900-01-01')    # 정적 table0 유니버스의 편입 날짜 (전 기간 적용)
+
+
+def build_universe_index(cap_panel, frequency='M', depth=UNIVERSE_DEPTH):
+    """
+    시가총액 패널 (날짜 x 티커 DataFrame)로 유니버스 색인 생성
+
+    각 기간 마지막 거래일의 시가총액으로 순위를 매기고 다음 거래일부터 적용
+    (sort_factors.rebalance_schedule과 같은 규칙), 결측 시가총액은 순위에서 제외
+    """
+    from sort_factors import rebalance_schedule
+
+    ends, _ = rebalance_schedule(cap_panel.index, frequency)
+    caps = cap_panel.to_numpy(dtype=float)[ends]
+
+    # 모든 리밸런싱 날짜를 한 번의 argsort로 (결측은 맨 뒤)
+    order = np.where(np.isfinite(caps), -caps, np.inf).argsort(axis=1, kind='stable')[:, :depth]
+    counts = np.minimum(np.isfinite(caps).sum(axis=1), depth)
+    ranked = np.where(np.arange(order.shape[1])[None, :] < counts[:, None], order, -1)
+
+    return _index(cap_panel.index[ends], pd.Index(cap_panel.columns), ranked)
+
+
+def from_static(stocks_df, date=STATIC_DATE):
+    """
+    table0_top200_stocks.csv (시가총액 순 정렬) 를 단일 리밸런싱 색인으로 감싸기
+    date 이후 전 기간에 같은 순위를 적용하므로 기존 정적 분석과 동일한 결과
+    """
+    tickers = pd.Index(stocks_df['ticker'])
+    ranked = np.arange(len(tickers))[None, :]
+    return _index(pd.DatetimeIndex([date]), tickers, ranked)
+
+
+def _index(dates, tickers, ranked):
+    """
+    순위표 (R x depth, 티커 번호, -1 패딩)와 순위 조회용 정렬 사본
+    sorted_codes: 행마다 티커 번호 오름차순 (searchsorted 대상), sorted_ranks: 그 순위 (0부터)
+    """
+    ranked = np.asarray(ranked, dtype=np.int32)
+    keys = np.where(ranked >= 0, ranked, np.iinfo(np.int32).max)
+    by_code = keys.argsort(axis=1, kind='stable')
+    return {
+        'dates': pd.DatetimeIndex(dates),
+        'tickers': tickers,
+        'ranked': ranked,
+        'sorted_codes': np.take_along_axis(keys, by_code, axis=1),
+        'sorted_ranks': by_code.astype(np.int32),
+        'counts': (ranked >= 0).sum(axis=1)
+    }
+
+
+def as_of(index, date):
+    """date에 적용 중인 리밸런싱 행 번호 (편입 날짜 < date 중 마지막, 없으면 -1)"""
+    return int(index['dates'].searchsorted(pd.Timestamp(date), side='left')) - 1
+
+
+def members(index, date, n=None, start=0):
+    """date 기준 순위 start+1 ~ n 위 티커 목록 (예: n=200, start=100 → 101-200위)"""
+    row = as_of(index, date)
+    if row < 0:
+        return []
+    stop = index['counts'][row] if n is None else min(n, index['counts'][row])
+    return index['tickers'][index['ranked'][row, start:stop]].tolist()
+
+
+def ever_members(index, n=None, start=0, dates=None):
+    """
+    리밸런싱 중 한 번이라도 순위 start+1 ~ n위였던 티커 (색인 티커 순, 생존 종목만이 아닌 전체 이력)
+    dates: 주면 그 날짜들에 적용되는 리밸런싱만 (표본 기간)
+    """
+    ranked = index['ranked']
+    if dates is not None:
+        rows = np.unique(holding_periods(index, dates))
+        ranked = ranked[rows[rows >= 0]]
+    codes = np.unique(ranked[:, start:n])
+    return index['tickers'][codes[codes >= 0]].tolist()
+
+
+def ticker_rank(index, ticker, date):
+    """date 기준 티커 순위 (1부터), 유니버스 밖이면 None"""
+    row = as_of(index, date)
+    code = index['tickers'].get_indexer([ticker])[0]
+    if row < 0 or code < 0:
+        return None
+    codes = index['sorted_codes'][row]
+    pos = codes.searchsorted(code)
+    if pos == len(codes) or codes[pos] != code:
+        return None
+    return int(index['sorted_ranks'][row, pos]) + 1
+
+
+def rank_panel(index, tickers):
+    """
+    리밸런싱별 티커 순위 (R x N, 0부터, 유니버스 밖은 -1)
+    tickers: 결과 열 순서 (수익률 패널 열)
+    """
+    cols = index['tickers'].get_indexer(tickers)
+    ranks = np.full((len(index['dates']), len(index['tickers']) + 1), -1, dtype=np.int32)
+    rows = np.repeat(np.arange(len(index['dates'])), index['ranked'].shape[1])
+    codes = index['ranked'].ravel()
+    ok = codes >= 0
+    ranks[rows[ok], codes[ok]] = np.tile(np.arange(index['ranked'].shape[1]), len(index['dates']))[ok]
+    return ranks[:, np.where(cols >= 0, cols, len(index['tickers']))]
+
+
+def holding_periods(index, dates, inclusive=False):
+    """
+    날짜별 적용 리밸런싱 행 번호 (T,, 첫 편입 이전은 -1)
+    inclusive=True면 그날 형성된 리밸런싱도 포함 (그날 종가로 정렬할 때)
+    장중 시각은 거래일로 내림 (D일 종가 형성 구성은 D+1일 첫 봉부터 적용)
+    """
+    side = 'right' if inclusive else 'left'
+    return index['dates'].searchsorted(pd.DatetimeIndex(dates).normalize(), side=side) - 1
+
+
+def band_memberships(index, tickers, bands):
+    """
+    순위 구간별 소속 마스크 스택 (R x N x P)
+    bands: {이름: (시작, 끝)} 0부터 시작하는 반개구간 (예: 'Small_50': (100, 200))
+    """
+    ranks = rank_panel(index, tickers)
+    masks = [(ranks >= lo) & (ranks < hi) for lo, hi in bands.values()]
+    return np.stack(masks, axis=-1), list(bands)
+
+
+def band_portfolios(index, returns_df, bands, validity=None):
+    """
+    순위 구간별 동일가중 포트폴리오 수익률 (날짜 x 구간 DataFrame)
+    리밸런싱마다 바뀌는 구성을 period_masked_means로 수익률 패널 한 번 통과에 계산
+    """
+    from panel_validity import build_validity_mask, align_validity, period_masked_means
+
+    if validity is None:
+        validity = build_validity_mask(returns_df)
+    else:
+        validity = align_validity(validity, returns_df.index, returns_df.columns)
+
+    masks, names = band_memberships(index, returns_df.columns, bands)
+    means = period_masked_means(returns_df.to_numpy(), validity, masks,
+                                holding_periods(index, returns_df.index), returns_df.to_numpy().dtype)
+    return pd.DataFrame(means, index=returns_df.index, columns=names)
+
+
+def universe_mask(index, dates, tickers, n=None, inclusive=False):
+    """(T x N) 날짜별 상위 n 유니버스 소속 여부 (n=None이면 색인 전체 깊이)"""
+    ranks = rank_panel(index, tickers)
+    inside = (ranks >= 0) if n is None else (ranks >= 0) & (ranks < n)
+    holding = holding_periods(index, dates, inclusive)
+    return np.where(holding[:, None] >= 0, inside[np.maximum(holding, 0)], False)
+
+
+def load_universe(stocks_df, returns_df=None, path=None, frequency='M', depth=UNIVERSE_DEPTH):
+    """
+    분석용 유니버스 색인
+    시점 기준 시가총액 파일 (data3_market_cap.csv) 이 있으면 리밸런싱별 순위,
+    없으면 정적 table0 순위로 대체 (from_static)
+    """
+    from characteristic_regression import MARKET_CAP_PATH
+
+    path = MARKET_CAP_PATH if path is None else path
+    if not os.path.exists(path):
+        return from_static(stocks_df)
+    cap_panel = pd.read_csv(path, index_col=0)
+    cap_panel.index = pd.to_datetime(cap_panel.index)
+    if returns_df is not None:
+        cap_panel = cap_panel.loc[cap_panel.index <= returns_df.index[-1]]
+    return build_universe_index(cap_panel, frequency, depth)
+
+
+def save_universe_index(index, path):
+    """순위표를 .npz로 저장 (조회용 정렬 사본은 로드 시 재계산)"""
+    np.savez_compressed(path, dates=index['dates'].to_numpy(), tickers=index['tickers'].to_numpy(dtype=str),
+                        ranked=index['ranked'])
+
+
+def load_universe_index(path):
+    """저장된 .npz 유니버스 색인 로드"""
+    with np.load(path, allow_pickle=False) as data:
+        return _index(data['dates'], pd.Index(data['tickers']), data['ranked'])
+
+
+def summarize_universe(index):
+    """유니버스 색인 요약 출력"""
+    counts = index['counts']
+    print(f"\n🗂️ 유니버스 색인:")
+    if index['dates'][0] == STATIC_DATE:
+        print(f"   - 정적 table0 순위 (시점 기준 시가총액 파일 없음): {counts[0]}개 종목")
+        return
+    print(f"   - 리밸런싱 {len(index['dates'])}회 "
+          f"({index['dates'][0].strftime('%Y-%m')} ~ {index['dates'][-1].strftime('%Y-%m')}), "
+          f"깊이 {index['ranked'].shape[1]}, 전체 티커 {len(index['tickers'])}개")
+    if len(index['dates']) > 1:
+        changes = [len(set(index['ranked'][r][:200]) ^ set(index['ranked'][r - 1][:200])) // 2
+                   for r in range(1, len(index['dates']))]
+        print(f"   - top-200 월평균 교체: {np.mean(changes):.1f}개")